@@ -0,0 +1,69 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import io
+import os
+
+class ArWriter:
+    """Writes an ar archive the way GNU 'ar rcD' (deterministic mode,
+       the default on Debian) lays it out: GNU style member names
+       ending in '/', zero timestamps and owners, and mode 644.
+       Members are streamed into the archive, and digests (objects with
+       an update method, like hashlib's or a signer) can be given to
+       see the contents of a member as it is written"""
+
+    MAGIC=b'!<arch>\n'
+    COPY_SIZE=1024*1024
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.fileobj.write(ArWriter.MAGIC)
+
+    @staticmethod
+    def header(name, size):
+        if len(name) > 15 or '/' in name:
+            raise ValueError("ar member name '%s' can't be used" % name)
+        return ("%-16s%-12s%-6s%-6s%-8s%-10s`\n" % (
+            name + '/',
+            '0',
+            '0',
+            '0',
+            '644',
+            str(size) )).encode('ascii')
+
+    def addMember(self, name, contents, digests=[]):
+        """Adds a member called name.  contents is bytes or a file
+           object to read the member from, from where it is to the end"""
+        if type(contents) is bytes:
+            contents = io.BytesIO(contents)
+        start = contents.tell()
+        size = contents.seek(0, os.SEEK_END) - start
+        contents.seek(start)
+        self.fileobj.write(ArWriter.header(name, size))
+        copied = 0
+        while True:
+            block = contents.read(ArWriter.COPY_SIZE)
+            if not block:
+                break
+            for digest in digests:
+                digest.update(block)
+            self.fileobj.write(block)
+            copied = copied + len(block)
+        if copied != size:
+            raise IOError(
+                "ar member '%s' changed size while it was archived" % name)
+        if size % 2 == 1:
+            self.fileobj.write(b'\n')
@@ -69,6 +69,12 @@ from .ProgramResult import ProgramResult
 from .AspectResult import AspectResult
 from .AspectFlowControl import AspectFlowControl
 from .ParallelLaunchStack import ParallelLaunchStack
+from .StepScheduler import StepScheduler
+from .StepCache import StepCache
+from .FileSystemCache import FileSystemCache
+from .DigestDatabase import DigestDatabase
+from .ModuleIndex import ModuleIndex
+from .SectionIndex import SectionIndex
 from .MetadataManager import DefaultMetadataModule
 from .OutputTee import OutputTee
 from . import phases
@@ -97,6 +103,8 @@ class CliDriver(object):
         self.scriptName = name
         self.scriptVersion = version
         self.modulePathConstruct = None
+        self.moduleIndex = ModuleIndex(None)
+        self.sectionTypes = {}
         #This will be replaced with a "Results" type object
         logging.basicConfig()
         self.log = logging.getLogger("%s.%s" % (
@@ -117,11 +125,16 @@ class CliDriver(object):
         self.environment = Environment(self)
         self.launchStack = ParallelLaunchStack()
         self.launchStack.append(self)
+        self.stepScheduler = None
+        self.stepCache = None
+        self.rebuildCheck = 'mtime'
+        self.digestDatabase = None
         self.results = []
         self.stackDumps = []
         self.buildspecLock = threading.Lock()
         self.buildspec = configparser.RawConfigParser()
         self.buildspec.optionxform = str
+        self.sectionIndex = SectionIndex()
         self.outBuildspec = configparser.RawConfigParser()
         self.outBuildspec.optionxform = str
         self.phasesDecl = None
@@ -150,6 +163,8 @@ class CliDriver(object):
         #This need to be invoked at the end of every phase
         #  Each phase will go through the same environment setup and tracking
         #  steps - saving state would compromise this
+        self._saveDigestDatabase()
+        self._saveModuleIndex()
         self.environment.flushAll()
         defaultMetadata = DefaultMetadataModule(
                 self.log,
@@ -159,6 +174,20 @@ class CliDriver(object):
             defaultMetadata )
 
 
+    def _saveDigestDatabase(self):
+        if self.digestDatabase is None:
+            return
+        try:
+            self.digestDatabase.save()
+        except (IOError, OSError) as e:
+            self.log.warning("Rebuild digests could not be saved: %s", str(e))
+
+    def _saveModuleIndex(self):
+        try:
+            self.moduleIndex.save()
+        except (IOError, OSError) as e:
+            self.log.info("The module index could not be saved: %s", str(e))
+
     def find_spec(self, fullname, path, target=None):
         """Python 3.4+ meta path finder API (replaces find_module)."""
         nameparts = fullname.split('.')
@@ -541,6 +570,15 @@ class CliDriver(object):
         else:
             self.logfile = sys.stdout
         OutputTee.subsumeStream(self.logfile)
+        try:
+            resultLimit = int(self.settings['result-output-limit'])
+        except KeyError:
+            resultLimit = None
+        except ValueError:
+            self.log.critical("--result-output-limit '%s' is not a number of bytes", self.settings['result-output-limit'])
+            sys.exit(2)
+        if resultLimit is not None and resultLimit > 0:
+            OutputTee.setResultLimit(resultLimit)
         try:
             capture_fd = self.settings['capture-fd']
         except KeyError:
@@ -598,6 +636,53 @@ class CliDriver(object):
 
         self.environment.addTransPhase('WORKING', cwd)
 
+        try:
+            jobs = self.settings['jobs']
+        except KeyError:
+            jobs = None
+        if jobs is not None:
+            try:
+                self.stepScheduler = StepScheduler(int(jobs))
+            except ValueError as e:
+                self.log.critical("--jobs '%s' is not valid: %s", jobs, str(e))
+                sys.exit(2)
+
+        try:
+            stepCacheDir = self.settings['step-cache']
+        except KeyError:
+            stepCacheDir = None
+        if stepCacheDir is not None:
+            try:
+                self.stepCache = StepCache(stepCacheDir, CSMAKE_LIBRARY_VERSION)
+            except OSError as e:
+                self.log.critical("--step-cache '%s' could not be used: %s", stepCacheDir, str(e))
+                sys.exit(2)
+
+        try:
+            useFileSystemCache = self.settings['filesystem-cache']
+        except KeyError:
+            useFileSystemCache = False
+        if useFileSystemCache:
+            self.environment.fileSystemCache = FileSystemCache()
+
+        try:
+            self.rebuildCheck = self.settings['rebuild-check']
+        except KeyError:
+            pass
+        if self.rebuildCheck not in ['mtime', 'digest']:
+            self.log.critical("--rebuild-check '%s' is not valid: use mtime or digest", self.rebuildCheck)
+            sys.exit(2)
+
+        try:
+            moduleIndexPath = self.settings['module-index']
+        except KeyError:
+            moduleIndexPath = None
+        if moduleIndexPath is None:
+            moduleIndexPath = ModuleIndex.defaultPath()
+        elif moduleIndexPath == 'none':
+            moduleIndexPath = None
+        self.moduleIndex = ModuleIndex(moduleIndexPath)
+
         if self.settings['version']:
             self.showVersion()
             self.log.forceQuiet()
@@ -640,24 +725,29 @@ class CliDriver(object):
 
     def _lookupAspects(self, step):
         stepId = step
-        result = []
         if '@' in step:
             stepId = step.split('@')[1]
-        sections = None
         self.buildspecLock.acquire()
         try:
-            sections = self.buildspec.sections()
+            return self.sectionIndex.lookupAspects(stepId)
+        finally:
+            self.buildspecLock.release()
+
+    def getSectionOption(self, section, option):
+        """Returns the raw (unsubstituted) value of option in section
+           or None if it isn't defined"""
+        self.buildspecLock.acquire()
+        try:
+            if self.buildspec.has_option(section, option):
+                return self.buildspec.get(section, option)
+            return None
         finally:
             self.buildspecLock.release()
-        for section in sections:
-            if section[0] != '&':
-                continue
-            parts = section.split('@')
-            if len(parts) == 2:
-                cutsParts = parts[1].split(' ')
-                if cutsParts[0] == stepId:
-                    result.append(section)
-        return result
+
+    def getStepScheduler(self):
+        """Returns the scheduler command sections use to run steps
+           with --jobs, or None when --jobs isn't specified"""
+        return self.stepScheduler
 
     def lookupSection(self, step):
         #TODO: Detect ambiguity
@@ -666,19 +756,11 @@ class CliDriver(object):
                 return step
             else:
                 return None
-        sections = None
         self.buildspecLock.acquire()
         try:
-            sections = self.buildspec.sections()
+            return self.sectionIndex.lookupSection(step)
         finally:
             self.buildspecLock.release()
-        for section in sections:
-            if section[0] == '&':
-                continue
-            parts = section.split('@')
-            if len(parts) == 2 and parts[1] == step:
-                return section
-        return None
 
     def launchAspects(
         self,
@@ -862,6 +944,20 @@ class CliDriver(object):
                 aspects.append((aspectInstance,aspectDict))
 
             execinstance._setAspects(aspects)
+            stepCacheKey = None
+            if self.stepCache is not None:
+                stepCacheKey = self.stepCache.stepKey(
+                    execinstance,
+                    section,
+                    execinstance._lookupPhaseShift(phase, stepdict),
+                    stepdict )
+                self.log.devdebug("Step cache key: %s", stepCacheKey)
+                if stepCacheKey is not None \
+                    and self.stepCache.restore(stepCacheKey, execinstance):
+                    resultObject.notice("Outputs of section '%s' restored from the step cache", section)
+                    resultObject.cached()
+                    execinstance._absorbNewMappedFiles()
+                    return execinstance
             self.launchAspects(
                 aspects,
                 'start',
@@ -896,6 +992,11 @@ class CliDriver(object):
                             phase )
                         if execinstance.log.didPass():
                             launchPassed = True
+                            if stepCacheKey is not None:
+                                try:
+                                    self.stepCache.store(stepCacheKey, execinstance)
+                                except (IOError, OSError) as e:
+                                    resultObject.warning("Step cache could not record '%s': %s", section, str(e))
                             self.launchAspects(
                                 aspects,
                                 'passed',
@@ -980,6 +1081,14 @@ class CliDriver(object):
                 self.log.devdebug("-----------------------------------------")
                 if resultObject is not None:
                     resultObject.finished()
+                    #Only the output of the failures dumped at the end
+                    #  is repeated
+                    dumped = [ dump[1] for dump in list(self.stackDumps) ]
+                    if not any(x is resultObject for x in dumped):
+                        resultObject.release()
+                        for child in resultObject.childResults:
+                            if isinstance(child, AspectResult):
+                                child.release()
 
     def includeBuildspec(self, spec):
         if not os.path.isfile(spec):
@@ -990,6 +1099,7 @@ class CliDriver(object):
             try:
                 self.buildspec.read([spec])
                 self.outBuildspec.read([spec])
+                self.sectionIndex.add(self.buildspec.sections())
             finally:
                 self.buildspecLock.release()
             return True
@@ -1032,6 +1142,8 @@ class CliDriver(object):
                 self.log.error("XXX Execution of csmake failed")
                 returncode = 1
             self.log.finished()
+            if self.stepScheduler is not None:
+                self.stepScheduler.shutdown()
             OutputTee.endAll()
             sys.stdout.flush()
             if self.tty is not None:
@@ -1078,6 +1190,8 @@ class CliDriver(object):
 
 
         self.environment.addTransPhase('RESULTS', target)
+        if self.rebuildCheck == 'digest':
+            self.digestDatabase = DigestDatabase(target)
 
         defaultMetadata = DefaultMetadataModule(
                 self.log,
@@ -1109,6 +1223,7 @@ class CliDriver(object):
             self.usage(None, True)
             self.chat( "")
             self.buildspec = configparser.RawConfigParser()
+            self.sectionIndex = SectionIndex()
             self._loadBuildspec()
             self.dumpTypes()
             self.dumpActions()
@@ -1144,6 +1259,7 @@ class CliDriver(object):
                     sys.exit(99)
                 self.buildspec.add_section(newcommand)
                 self.buildspec.set(newcommand, '0', rawcommand.strip())
+                self.sectionIndex.add([newcommand])
                 #TODO: OUTSPEC: need restructuring...
                 self.outBuildspec.add_section(newcommand)
                 self.outBuildspec.set(newcommand, '0', rawcommand.strip())
@@ -1295,6 +1411,8 @@ class CliDriver(object):
                 callback()
             except:
                 self.log.exception("Build Exit Callback '%s' failed on exception", str(callback))
+        self._saveDigestDatabase()
+        self._saveModuleIndex()
 
         if buildExitsExist:
             self.log.chat("""
@@ -1365,25 +1483,11 @@ class CliDriver(object):
                     #Avoid local path here
                     if len(syspath) == 0 or syspath == '.':
                         continue
-                    #Append the actual path
-                    if os.path.isdir(os.path.join(
-                        syspath,
-                        'CsmakeModules') ):
-                        allPaths.append((path, syspath))
-
-                    #Now look at all the subdirectories
-                    try:
-                        syspathdirs = os.listdir(syspath)
-                        for syssubpath in syspathdirs:
-                            if os.path.isdir(os.path.join(
-                                syspath,
-                                syssubpath,
-                                'CsmakeModules' )):
-                                allPaths.append((path, os.path.join(
-                                    syspath,
-                                    syssubpath )))
-                    except:
-                        pass
+                    #Append the actual path and then all the
+                    #subdirectories, as they were when the index
+                    #last looked
+                    for found in self.moduleIndex.searchPath(syspath):
+                        allPaths.append((path, found))
             else:
                 if os.path.isdir(os.path.join(
                     path,
@@ -1405,8 +1509,23 @@ class CliDriver(object):
            write fragile package path patching code that could break
            the normal functioning of csmake.
 
-           returns [(path, name, module)], [warnings]"""
+           returns [(path, name, module, class)], [warnings]"""
+
+        if target is None or len(target) == 0:
+            return self._searchModules('')
+        if target in self.sectionTypes:
+            return ([self.sectionTypes[target]], [])
+        modules, warnings = self._searchModules(target)
+        if len(modules) == 0 and len(warnings) == 0:
+            #The module may have appeared where the index can't tell
+            self.moduleIndex.forget(force=True)
+            self.modulePathConstruct = None
+            modules, warnings = self._searchModules(target)
+        if len(modules) != 0 and len(warnings) == 0:
+            self.sectionTypes[target] = modules[0]
+        return (modules, warnings)
 
+    def _searchModules(self, target):
         allPaths = self._constructModulePaths()
 
         modules = []
@@ -1428,16 +1547,18 @@ class CliDriver(object):
             #If there's a specific target, optimize by seeking the module
             #in the current directory
             found = False
-            if target is not None and len(target) != 0:
+            packageNames = self.moduleIndex.packageModules(packagePath)
+            if len(target) != 0:
+                if target not in packageNames:
+                    continue
                 packageFiles = ["%s.py"%target]
                 stopOnFoundOrFail = True
             else:
                 stopOnFoundOrFail = False
-                try:
-                    packageFiles = os.listdir(packagePath)
-                except Exception as e:
+                if len(packageNames) == 0:
                     self.log.devdebug("No modules in '%s'", packagePath)
                     continue
+                packageFiles = [ "%s.py" % name for name in packageNames ]
 
             for packageFile in packageFiles:
                 modulePath = "%s/%s" % (
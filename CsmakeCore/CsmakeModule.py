@@ -23,6 +23,8 @@ import hashlib
 import re
 import threading
 import base64
+from CsmakeCore.FileManager import FileManager
+from CsmakeCore.FileSystemCache import FileSystem
 
 class CsmakeModule:
 
@@ -47,6 +49,8 @@ class CsmakeModule:
         self.outOptions = None
         self.calledId = None
         self.aspects = []
+        #(source, target) pairs checked with --rebuild-check=digest
+        self.rebuildChecks = set()
 
     def __del__(self):
         try:
@@ -267,14 +271,28 @@ class CsmakeModule:
         if fileWorking in ignore:
             self.log.devdebug("Ignoring file: %s", fileWorking)
             return False
-        if os.path.isfile(fileWorking):
+        fileSystem = self._getFileSystem()
+        if fileSystem.isfile(fileWorking):
+            database = self._getDigestDatabase()
+            if database is not None:
+                self.rebuildChecks.add((fileWorking, fileTarget))
+                upToDate = self._digestsUpToDate(
+                    database,
+                    fileSystem,
+                    fileWorking,
+                    fileTarget )
+                if upToDate is not None:
+                    self.log.devdebug('(digest up to date: %s) %s',
+                        str(upToDate),
+                        fileWorking )
+                    return not upToDate
             try:
                 workingM = datetime.datetime.fromtimestamp(
-                    os.path.getmtime(
+                    fileSystem.getmtime(
                         fileWorking))
                 workingM = workingM.replace(microsecond = 0)
                 targetM = datetime.datetime.fromtimestamp(
-                    os.path.getmtime(
+                    fileSystem.getmtime(
                         fileTarget))
                 self.log.devdebug('(%s  W: %s  T: %s) %s',
                     str(workingM >targetM),
@@ -287,11 +305,11 @@ class CsmakeModule:
                     fileWorking,
                     fileTarget )
                 self.log.info("The 'rebuild' comparison failed (%s)", repr(e))
-        elif os.path.isdir(fileWorking):
-            if not os.path.isdir(fileTarget):
+        elif fileSystem.isdir(fileWorking):
+            if not fileSystem.isdir(fileTarget):
                 self.log.info("Directory/File mismatch, 'rebuild' comparison failed")
                 return True
-            for item in os.listdir(fileWorking):
+            for item in fileSystem.listdir(fileWorking):
                 if self._needRebuild(
                     os.path.join(
                         fileWorking,
@@ -306,6 +324,68 @@ class CsmakeModule:
             return True
         return True
 
+    def _getDigestDatabase(self):
+        #Returns the DigestDatabase with --rebuild-check=digest, or None
+        return getattr(self.engine, 'digestDatabase', None)
+
+    def _rebuildDigest(self, database, fileSystem, path):
+        #Returns the digest of the file at path, or None if it isn't there
+        stat = fileSystem.stat(path)
+        if stat is None:
+            return None
+        def digester(path):
+            with open(path, 'rb') as fileobj:
+                return self._fileDigestList([hashlib.sha256], fileobj)[0]
+        return database.digest(path, stat, digester)
+
+    def _digestsUpToDate(self, database, fileSystem, fileWorking, fileTarget):
+        #Returns None when the digests can't say, the mtimes decide then
+        try:
+            sourceDigest = self._rebuildDigest(
+                database,
+                fileSystem,
+                fileWorking )
+            targetDigest = self._rebuildDigest(
+                database,
+                fileSystem,
+                fileTarget )
+        except (IOError, OSError) as e:
+            self.log.info("The 'rebuild' digest failed (%s)", repr(e))
+            return None
+        return database.isUpToDate(
+            fileTarget,
+            fileWorking,
+            sourceDigest,
+            targetDigest )
+
+    def _recordRebuildDigests(self):
+        #Called when the step passed: the targets checked are now
+        #  built from what their sources are now
+        database = self._getDigestDatabase()
+        if database is None:
+            return
+        fileSystem = FileSystem()
+        for fileWorking, fileTarget in self.rebuildChecks:
+            try:
+                sourceDigest = self._rebuildDigest(
+                    database,
+                    fileSystem,
+                    fileWorking )
+                targetDigest = self._rebuildDigest(
+                    database,
+                    fileSystem,
+                    fileTarget )
+            except (IOError, OSError) as e:
+                self.log.info("The 'rebuild' digest failed (%s)", repr(e))
+                continue
+            if sourceDigest is not None and targetDigest is not None:
+                database.record(
+                    fileTarget,
+                    fileWorking,
+                    sourceDigest,
+                    targetDigest )
+        self.rebuildChecks.clear()
+
     def _canAvoid(self, fileWorking, fileTarget):
         #Specialized modules may want to do something different here
         return not self._needRebuild(fileWorking, fileTarget)
@@ -317,6 +397,7 @@ class CsmakeModule:
             directory = path
         if len(directory) > 0 and not os.path.lexists(directory):
             os.makedirs(directory)
+            self._invalidateFileSystemCache(directory)
 
     def _cleanEnsuredDirectory(self, path, isdirectory=False):
         if not isdirectory:
@@ -327,6 +408,21 @@ class CsmakeModule:
             os.removedirs(directory)
         except Exception as e:
             self.log.info("Directory not removed (%s): %s", directory, str(e))
+        self._invalidateFileSystemCache(directory)
+
+    def _getFileSystem(self):
+        #Returns the phase's file system cache (--filesystem-cache)
+        #  or a FileSystem that isn't cached
+        fileSystem = getattr(self.env, 'fileSystemCache', None)
+        if fileSystem is None:
+            fileSystem = FileSystem()
+        return fileSystem
+
+    def _invalidateFileSystemCache(self, path):
+        #Modules that change files they don't declare as outputs
+        #  should call this for those files when --filesystem-cache is used
+        if len(path) > 0:
+            self._getFileSystem().invalidate(path)
 
     def _listSubCommands(self, options):
         """Returns a list of subcommands this module will execute, in order of
@@ -385,19 +481,48 @@ class CsmakeModule:
                                    statement)
             self.log.devdebug("Yielding: %s", self.yieldsfiles)
 
+    def _invalidateDeclaredOutputs(self):
+        fileSystem = self._getFileSystem()
+        if self.yieldsfiles is not None:
+            for yielded in self.yieldsfiles:
+                if not yielded.get('location'):
+                    continue
+                spec = {}
+                FileManager.fixupLocationWithBase(
+                    self.env.env['RESULTS'],
+                    yielded['location'],
+                    spec )
+                fileSystem.invalidateSpec(
+                    spec['location'],
+                    bool(yielded.get('useRE')) )
+        if self.mapping is not None:
+            for froms, tos in self.mapping.iterfiles():
+                for location in tos:
+                    fileSystem.invalidate(location)
+
     def _absorbNewMappedFiles(self):
+        if self._didPass():
+            self._invalidateDeclaredOutputs()
+            self._recordRebuildDigests()
         fileManager = self._getFileManager()
-        if self.yieldsfiles is not None and self._didPass():
-            fileManager.addFileIndexes(
-                self.yieldsfiles,
-                self.env.env['RESULTS'],
-                self.deletingFiles,
-                self.validateFiles )
-        if self.mapping is not None and self._didPass():
-            fileManager.absorbMappings(
-                self.mapping,
-                self.deletingFiles,
-                self.validateFiles)
+        if fileManager is None:
+            return
+        #Apply all of the step's tracking changes in one write
+        fileManager.lock.startBatch()
+        try:
+            if self.yieldsfiles is not None and self._didPass():
+                fileManager.addFileIndexes(
+                    self.yieldsfiles,
+                    self.env.env['RESULTS'],
+                    self.deletingFiles,
+                    self.validateFiles )
+            if self.mapping is not None and self._didPass():
+                fileManager.absorbMappings(
+                    self.mapping,
+                    self.deletingFiles,
+                    self.validateFiles)
+        finally:
+            fileManager.lock.endBatch()
 
     #Implement default or other build phases
     #  the name of the build phase is dispatched to the module
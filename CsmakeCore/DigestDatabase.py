@@ -0,0 +1,104 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import json
+import os
+import os.path
+import tempfile
+import threading
+
+class DigestDatabase:
+    """Digests of files used to decide whether a target needs rebuilding
+       (--rebuild-check=digest).
+
+       A file's digest is kept with the size and mtime it had when it was
+       digested, so a file is only read again when one of those changes.
+       For each target built, the digests of its source and of the
+       target itself are recorded; the target is up to date as long as
+       both digests stay the same, no matter what happened to the mtimes.
+
+       The database lives in the results directory and is saved at the
+       end of each phase"""
+
+    FILENAME='.csmake-digests.json'
+    VERSION=1
+
+    def __init__(self, resultsDir):
+        self.path = os.path.join(resultsDir, DigestDatabase.FILENAME)
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.files = {}
+        self.targets = {}
+        try:
+            with open(self.path) as databaseFile:
+                database = json.load(databaseFile)
+            if database.get('version') == DigestDatabase.VERSION:
+                self.files = database['files']
+                self.targets = database['targets']
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+
+    def digest(self, path, stat, digester):
+        """Returns the digest of the file at path.
+           stat - the os.stat of the file
+           digester - called with path to compute the digest when the
+                      size or mtime changed since the file was last digested"""
+        path = os.path.abspath(path)
+        key = [stat.st_size, stat.st_mtime_ns]
+        with self.lock:
+            known = self.files.get(path)
+        if known is not None and known[:2] == key:
+            return known[2]
+        result = digester(path)
+        with self.lock:
+            self.files[path] = key + [result]
+            self.dirty = True
+        return result
+
+    def isUpToDate(self, target, source, sourceDigest, targetDigest):
+        """Returns True or False if target was recorded as built from source,
+           or None if the target has no record for source"""
+        with self.lock:
+            record = self.targets.get(os.path.abspath(target))
+            if record is None or os.path.abspath(source) not in record:
+                return None
+            return record[os.path.abspath(source)] == \
+                [sourceDigest, targetDigest]
+
+    def record(self, target, source, sourceDigest, targetDigest):
+        """Records that target, with targetDigest, was built from source
+           when source had sourceDigest"""
+        with self.lock:
+            target = os.path.abspath(target)
+            if target not in self.targets:
+                self.targets[target] = {}
+            self.targets[target][os.path.abspath(source)] = \
+                [sourceDigest, targetDigest]
+            self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            directory = os.path.dirname(self.path)
+            fd, temp = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, 'w') as databaseFile:
+                json.dump({
+                    'version' : DigestDatabase.VERSION,
+                    'files' : self.files,
+                    'targets' : self.targets }, databaseFile)
+            os.rename(temp, self.path)
+            self.dirty = False
@@ -95,6 +95,8 @@ class Environment:
         # caching, and re-authentication strategies.
         # Not cleared by flushAll — secrets are build-lifetime.
         self.secret_namespaces = {}
+        # FileSystemCache for the phase when --filesystem-cache is used
+        self.fileSystemCache = None
 
     def __repr__(self):
         return "Env: %s" % str(self.env)
@@ -106,6 +108,8 @@ class Environment:
     def flushAll(self):
         self.env = self.transPhase.copy()
         self.metadata = MetadataManager(self.engine.log, self)
+        if self.fileSystemCache is not None:
+            self.fileSystemCache.clear()
         # secret_namespaces intentionally preserved across phase flush
 
     def update(self, dictionary):
@@ -21,6 +21,7 @@ import os.path
 import os
 import glob
 import threading
+import concurrent.futures
 
 # A file spec is a specification of a set of instances
 #  consisting of search axes - primarily id, type, intent, and location
@@ -334,12 +335,487 @@ class NonValidatedFileInstance(FileInstance):
     def __init__(self, **keywords):
         FileSpec.__init__(self, **keywords)
 
+class FileTrackingLock:
+    """Reader-writer lock shared by file managers and their records.
+       Any number of threads may look up files at the same time, adding
+       files to the indexes is exclusive.  Both kinds of acquisitions
+       are reentrant, a thread holding the write lock may also read.
+       A thread holding only the read lock may not take the write lock.
+
+       Writes to the indexes may be batched: between startBatch and
+       endBatch, index writes made by the thread are queued by deferWrite
+       and applied under a single write acquisition at the end of the
+       outermost batch"""
+
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = {}
+        self.writer = None
+        self.writes = 0
+        self.waitingWriters = 0
+        self.batches = threading.local()
+
+    def acquireRead(self):
+        me = threading.get_ident()
+        self.condition.acquire()
+        try:
+            if self.writer == me:
+                self.writes = self.writes + 1
+            elif me in self.readers:
+                self.readers[me] = self.readers[me] + 1
+            else:
+                while self.writer is not None or self.waitingWriters > 0:
+                    self.condition.wait()
+                self.readers[me] = 1
+        finally:
+            self.condition.release()
+
+    def releaseRead(self):
+        me = threading.get_ident()
+        self.condition.acquire()
+        try:
+            if self.writer == me:
+                self.writes = self.writes - 1
+            else:
+                self.readers[me] = self.readers[me] - 1
+                if self.readers[me] == 0:
+                    del self.readers[me]
+                    self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def acquireWrite(self):
+        me = threading.get_ident()
+        self.condition.acquire()
+        try:
+            if self.writer == me:
+                self.writes = self.writes + 1
+                return
+            if me in self.readers:
+                raise RuntimeError(
+                    "File tracking read lock can't be upgraded to write")
+            self.waitingWriters = self.waitingWriters + 1
+            try:
+                while self.writer is not None or len(self.readers) > 0:
+                    self.condition.wait()
+            finally:
+                self.waitingWriters = self.waitingWriters - 1
+            self.writer = me
+            self.writes = 1
+        finally:
+            self.condition.release()
+
+    def releaseWrite(self):
+        self.condition.acquire()
+        try:
+            self.writes = self.writes - 1
+            if self.writes == 0:
+                self.writer = None
+                self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def startBatch(self):
+        if getattr(self.batches, 'depth', 0) == 0:
+            self.batches.depth = 0
+            self.batches.pending = []
+        self.batches.depth = self.batches.depth + 1
+
+    def endBatch(self):
+        self.batches.depth = self.batches.depth - 1
+        if self.batches.depth > 0:
+            return
+        pending = self.batches.pending
+        self.batches.pending = None
+        if len(pending) == 0:
+            return
+        self.acquireWrite()
+        try:
+            for function, args in pending:
+                function(*args)
+        finally:
+            self.releaseWrite()
+
+    def deferWrite(self, function, *args):
+        """Queues the write if the thread is in a batch, returns False
+           if the write should be done immediately"""
+        if getattr(self.batches, 'depth', 0) == 0 \
+                or self.writer == threading.get_ident():
+            return False
+        self.batches.pending.append((function, args))
+        return True
+
+class PathIndexNode:
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.children = {}
+        self.key = None
+
+class PathIndex:
+    """Indexes the keys of a location axis by path segment so that
+       a regex search against the keys only needs to test the keys that
+       contain the regex's literal prefix.
+       The search semantics are preserved: a key is a candidate if the
+       literal prefix appears anywhere in the key, not just at the start"""
+
+    #Characters that end the literal part of a regex
+    REGEX_SPECIAL = '.^$*+?{}[]|()\\'
+
+    def __init__(self):
+        self.root = PathIndexNode(None, None)
+        #Interior nodes (those with children) by segment name
+        self.directories = {}
+        self.size = 0
+
+    @staticmethod
+    def literalRegexPrefix(regex):
+        """Returns the text every match of the regex must start with.
+           This is conservative - anything not understood ends the prefix"""
+        if '|' in regex:
+            return ''
+        prefix = []
+        groups = []
+        i = 0
+        while i < len(regex):
+            c = regex[i]
+            if c == '(':
+                if regex.startswith('(?P<', i):
+                    end = regex.find('>', i)
+                    if end < 0:
+                        break
+                    i = end + 1
+                elif regex.startswith('(?:', i):
+                    i = i + 3
+                elif regex.startswith('(?', i):
+                    break
+                else:
+                    i = i + 1
+                groups.append(len(prefix))
+                continue
+            if c == ')':
+                if len(groups) == 0:
+                    break
+                start = groups.pop()
+                i = i + 1
+                if i < len(regex) and regex[i] in '?*{':
+                    del prefix[start:]
+                    break
+                if i < len(regex) and regex[i] == '+':
+                    break
+                continue
+            if c == '\\':
+                if i + 1 >= len(regex) or regex[i+1].isalnum() \
+                                      or regex[i+1] == '_':
+                    break
+                c = regex[i+1]
+                i = i + 2
+            elif c in PathIndex.REGEX_SPECIAL:
+                break
+            else:
+                i = i + 1
+            if i < len(regex) and regex[i] in '?*{':
+                break
+            prefix.append(c)
+            if i < len(regex) and regex[i] == '+':
+                break
+        return ''.join(prefix)
+
+    def add(self, key):
+        if type(key) is not str:
+            return
+        node = self.root
+        for segment in key.split('/'):
+            if segment not in node.children:
+                if len(node.children) == 0 and node.name is not None:
+                    if node.name not in self.directories:
+                        self.directories[node.name] = []
+                    self.directories[node.name].append(node)
+                node.children[segment] = PathIndexNode(segment, node)
+            node = node.children[segment]
+        if node.key is None:
+            node.key = key
+            self.size = self.size + 1
+
+    def _collectKeys(self, nodes, result):
+        pending = list(nodes)
+        while len(pending) > 0:
+            node = pending.pop()
+            if node.key is not None:
+                result.append(node.key)
+            pending.extend(node.children.values())
+
+    def candidates(self, regex):
+        """Returns the keys that could match a search with the regex,
+           or None if the regex can't be narrowed by the index"""
+        segments = PathIndex.literalRegexPrefix(regex).split('/')
+        if len(segments) < 2:
+            return None
+        first = segments[0]
+        middle = segments[1:-1]
+        last = segments[-1]
+        if len(middle) == 0:
+            #The prefix is 'first/last' - first must end a directory name
+            if len(first) == 0:
+                return None
+            starts = []
+            for name, nodes in self.directories.items():
+                if name.endswith(first):
+                    starts.extend(nodes)
+        else:
+            #The node for middle[0] must have a parent segment
+            #  that ends with first
+            starts = [ node for node in self.directories.get(middle[0], []) \
+                       if node.parent.name is not None \
+                           and node.parent.name.endswith(first) ]
+            for segment in middle[1:]:
+                starts = [ node.children[segment] for node in starts \
+                           if segment in node.children ]
+        tops = [ child for node in starts \
+                 for name, child in node.children.items() \
+                 if name.startswith(last) ]
+        result = []
+        self._collectKeys(tops, result)
+        return result
+
+class RegexPathScanner:
+    """Finds the files and directories on disk that could match an
+       absolute path regex (a ~~ file declaration).
+
+       The regex is split into path components on its top level slashes.
+       While the components can't match a '/', a directory at a given
+       depth can only lead to a match if its name matches the component
+       for that depth, so other directories aren't descended.  Anything
+       below a component that can match a '/' (like .*) is listed in full.
+       This returns more than actually matches, the caller still needs to
+       match the regex against the results.
+
+       Directories are listed with listDirectory(path), which returns
+       (name, isDirectory) for each entry, so that listings may be
+       cached.  Levels with many directories are listed on a thread pool"""
+
+    PARALLEL_THRESHOLD = 16
+    THREADS = 8
+
+    def __init__(self, regex, listDirectory=None):
+        self.components = RegexPathScanner.splitComponents(regex)
+        if listDirectory is None:
+            listDirectory = RegexPathScanner.scanDirectory
+        self.listDirectory = listDirectory
+
+    @staticmethod
+    def scanDirectory(path):
+        try:
+            with os.scandir(path) as entries:
+                return [ (entry.name, entry.is_dir(follow_symlinks=False)) \
+                         for entry in entries ]
+        except OSError:
+            return []
+
+    @staticmethod
+    def _classCanMatchSlash(regex, start):
+        #Returns (index after the class, True if the class could match '/')
+        #  or (None, True) if the class doesn't end
+        i = start + 1
+        negated = False
+        if i < len(regex) and regex[i] == '^':
+            negated = True
+            i = i + 1
+        items = []
+        first = True
+        while i < len(regex):
+            c = regex[i]
+            if c == ']' and not first:
+                break
+            first = False
+            if c == '\\':
+                escaped = regex[i+1:i+2]
+                i = i + 2
+                if escaped in ['D', 'W', 'S']:
+                    items.append(('/', '/'))
+                elif escaped.isalnum():
+                    items.append(None)
+                else:
+                    items.append((escaped, escaped))
+                continue
+            if c == '-' and len(items) > 0 and items[-1] is not None \
+                    and i + 1 < len(regex) and regex[i+1] != ']':
+                low = items.pop()[0]
+                high = regex[i+1]
+                if high == '\\':
+                    high = regex[i+2:i+3]
+                    i = i + 1
+                items.append((low, high))
+                i = i + 2
+                continue
+            items.append((c, c))
+            i = i + 1
+        else:
+            return (None, True)
+        slash = False
+        for item in items:
+            if item is not None and item[0] <= '/' <= item[1]:
+                slash = True
+        return (i + 1, slash != negated)
+
+    @staticmethod
+    def splitComponents(regex):
+        """Returns a list of (component regex, safe) for each top level
+           path component of the regex, where safe means the component
+           can't match a '/'"""
+        components = []
+        current = []
+        safe = True
+        depth = 0
+        i = 0
+        while i < len(regex):
+            c = regex[i]
+            split = False
+            if c == '\\':
+                escaped = regex[i+1:i+2]
+                if escaped == '/' and depth == 0:
+                    split = True
+                    i = i + 2
+                else:
+                    if escaped == '' or escaped.isdigit() \
+                                     or escaped in 'DWSbBAZ':
+                        safe = False
+                    current.append(regex[i:i+2])
+                    i = i + 2
+                    continue
+            elif c == '/':
+                if depth == 0:
+                    split = True
+                    i = i + 1
+                else:
+                    safe = False
+            elif c == '[':
+                end, slash = RegexPathScanner._classCanMatchSlash(regex, i)
+                if end is None:
+                    end = len(regex)
+                if slash:
+                    safe = False
+                current.append(regex[i:end])
+                i = end
+                continue
+            elif c == '(':
+                if regex.startswith('(?', i) \
+                        and not regex.startswith('(?:', i) \
+                        and not regex.startswith('(?P<', i):
+                    safe = False
+                depth = depth + 1
+            elif c == ')':
+                depth = depth - 1
+            elif c == '.' or (c == '|' and depth == 0):
+                safe = False
+            if split:
+                components.append([''.join(current), safe])
+                current = []
+                safe = True
+                if i < len(regex) and regex[i] in '?*+{':
+                    #The slash itself is optional or repeated
+                    components[-1][1] = False
+                continue
+            current.append(c)
+            i = i + 1
+        components.append([''.join(current), safe and depth == 0])
+        return [ tuple(component) for component in components ]
+
+    @staticmethod
+    def literalComponent(component):
+        """Returns the text the component matches if it is literal,
+           or None"""
+        result = []
+        i = 0
+        while i < len(component):
+            c = component[i]
+            if c == '\\':
+                escaped = component[i+1:i+2]
+                if escaped == '' or escaped.isalnum() or escaped == '_':
+                    return None
+                result.append(escaped)
+                i = i + 2
+                continue
+            if c in PathIndex.REGEX_SPECIAL:
+                return None
+            result.append(c)
+            i = i + 1
+        return ''.join(result)
+
+    def _listChunk(self, paths):
+        return [ (path, self.listDirectory(path)) for path in paths ]
+
+    def _listDirectories(self, paths):
+        if len(paths) < RegexPathScanner.PARALLEL_THRESHOLD \
+                or RegexPathScanner.THREADS < 2:
+            return [ (path, self.listDirectory(path)) for path in paths ]
+        #One chunk of directories per thread keeps the pool overhead low
+        threads = RegexPathScanner.THREADS
+        chunks = [ paths[start::threads] for start in range(threads) ]
+        result = []
+        with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+            for listed in pool.map(self._listChunk, chunks):
+                result.extend(listed)
+        return result
+
+    def _everythingBelow(self, directories, result):
+        while len(directories) > 0:
+            below = []
+            for path, entries in self._listDirectories(directories):
+                for name, isDirectory in entries:
+                    entryPath = os.path.join(path, name)
+                    result.append(entryPath)
+                    if isDirectory:
+                        below.append(entryPath)
+            directories = below
+
+    def candidates(self):
+        result = []
+        if len(self.components) == 0 or self.components[0][0] != '':
+            return result
+        frontier = ['/']
+        for depth, (component, safe) in enumerate(self.components[1:]):
+            if len(frontier) == 0:
+                break
+            last = depth == len(self.components) - 2
+            if not safe or (last and len(component) == 0):
+                self._everythingBelow(frontier, result)
+                return result
+            literal = RegexPathScanner.literalComponent(component)
+            nextFrontier = []
+            if literal is not None and not last:
+                for path in frontier:
+                    entryPath = os.path.join(path, literal)
+                    if os.path.isdir(entryPath):
+                        nextFrontier.append(entryPath)
+            else:
+                try:
+                    test = re.compile(component)
+                except re.error:
+                    self._everythingBelow(frontier, result)
+                    return result
+                for path, entries in self._listDirectories(frontier):
+                    for name, isDirectory in entries:
+                        if last:
+                            if test.match(name):
+                                entryPath = os.path.join(path, name)
+                                result.append(entryPath)
+                                if isDirectory:
+                                    nextFrontier.append(entryPath)
+                        elif isDirectory and test.fullmatch(name):
+                            nextFrontier.append(os.path.join(path, name))
+            frontier = nextFrontier
+        else:
+            #A regex match only needs to match the start of a path
+            self._everythingBelow(frontier, result)
+        return result
+
 class FileManager:
     """This is an unordered, searchable record container"""
 
     #We need to have a file manager global lock to prevent deadlocking
-    #  across subclasses of filemanager.
-    FILE_MANAGER_LOCK=threading.RLock()
+    #  across subclasses of filemanager.  Lookups only take the read side
+    FILE_MANAGER_LOCK=FileTrackingLock()
 
     AXES = ['id','type','intent', 'location', 'relLocation']
     NON_AXES = ['useRE']
@@ -360,12 +836,18 @@ class FileManager:
         '*-1' : 'mapFilesManyToOne',
         '1-*' : 'mapFilesOneToMany',
         '*-*' : 'mapFilesManyToMany' }
+
+    #Location axes get a PathIndex once they track this many locations
+    PATH_INDEX_AXES = ['location', 'relLocation']
+    PATH_INDEX_THRESHOLD = 64
+
     def __init__(self, parents=[]):
         #TODO: Consider throwing exceptions instead erroring on
         #      Parse failures - would yield a way to communicate
         #      where the parsing blew up.
         self.lock = FileManager.FILE_MANAGER_LOCK
         self.index = {}
+        self.pathIndexes = {}
         self.log = None #TODO: Should be a good default logger
         self.working = None
         self.metadata = None
@@ -383,7 +865,7 @@ class FileManager:
         self.records = []
 
     def __repr__(self, offset=0, terse=False):
-        self.lock.acquire()
+        self.lock.acquireRead()
         try:
             space = ' ' * offset
             result = [
@@ -403,7 +885,7 @@ class FileManager:
             result.append("%s++++++++++++++++++++++++++++++++++++++++++++" % space)
             result.append("")
         finally:
-            self.lock.release()
+            self.lock.releaseRead()
         return '\n'.join(result)
 
     def __str__(self, offset=0, terse=False):
@@ -553,50 +1035,16 @@ class FileManager:
         return result
 
     @staticmethod
-    def findDiskPrunedPossibleMatchingRegexFiles(pathparts, curpath = '/'):
-        #This will pruposely return more than what actually matches pathparts
-        #You can't actually break a regex into path parts and sample each
-        #Without rewriting regex parsing and grocking in a way that is
-        #Sensitive to the way a directory structure works.
-        if len(pathparts) == 0:
-            return []
-        if len(pathparts[0]) == len(re.escape(pathparts[0])):
-            newpath = os.path.join(
-                curpath,
-                pathparts[0] )
-            if os.path.exists(newpath):
-                return FileManager.findDiskPrunedPossibleMatchingRegexFiles(
-                    pathparts[1:],
-                    newpath)
-            else:
-                return []
-        else:
-            result = []
-            for base, dirs, files in os.walk(curpath):
-                for name in files:
-                    result.append(os.path.join(
-                        base,
-                        name ))
-                for name in dirs:
-                    result.append(os.path.join(
-                        base,
-                        name ))
-            return result
-
-    @staticmethod
-    def findDiskFilesMatchingRegex(repath):
-        pathparts = repath.split('/')
-        if len(pathparts) == 0:
-            return []
-        assert(len(pathparts[0])) == 0
-        pathparts = pathparts[1:]
-        candidates = FileManager.findDiskPrunedPossibleMatchingRegexFiles(
-            pathparts )
+    def findDiskFilesMatchingRegex(repath, listDirectory=None):
+        assert repath.startswith('/')
+        candidates = RegexPathScanner(repath, listDirectory).candidates()
         repathCompiled = re.compile(repath)
         return [ f for f in candidates if repathCompiled.match(f) ]
 
     @staticmethod
-    def findDiskFilesMatchingStarred(path):
+    def findDiskFilesMatchingStarred(path, fileSystem=None):
+        if fileSystem is not None:
+            return fileSystem.glob(path)
         return glob.glob(path)
 
     @staticmethod
@@ -672,32 +1120,36 @@ class FileManager:
 
 
     def absorbMappings(self, mappingResult, deleting=False, validate=True):
-        FileInstanceClass = FileManager.fileInstanceCorrectTracking(deleting, validate)
-        for frominstances, tospecs in mappingResult.itermappings():
-            newid = []
-            fromrecords = []
-            for frominstance in frominstances:
-                newid.append(frominstance.recordId())
-                record = frominstance.getRecord()
-                fromrecords.append(record)
-
-            absorbtion = []
-
-            for tospec in tospecs:
-                containingRecord = None
-                if 'id' not in tospec:
-                    tospec['id'] = '+'.join(newid)
-                if tospec['id'] in newid:
-                    containingRecord = fromrecords[newid.index(tospec['id'])]
-                    instance = FileInstanceClass(**tospec)
-                    containingRecord.addAnotherInstance(instance.index, instance)
-                if containingRecord is None:
-                    containingRecord = FileRecord(fromrecords, deleting, validate, **tospec)
-                    instance = containingRecord.getSourceInstance()
-                absorbtion.append((containingRecord, instance))
-                self.log.devdebug("Adding mapping: %s", str(tospec))
-            for record in fromrecords:
-                record.absorbNewFiles(absorbtion)
+        self.lock.startBatch()
+        try:
+            FileInstanceClass = FileManager.fileInstanceCorrectTracking(deleting, validate)
+            for frominstances, tospecs in mappingResult.itermappings():
+                newid = []
+                fromrecords = []
+                for frominstance in frominstances:
+                    newid.append(frominstance.recordId())
+                    record = frominstance.getRecord()
+                    fromrecords.append(record)
+
+                absorbtion = []
+
+                for tospec in tospecs:
+                    containingRecord = None
+                    if 'id' not in tospec:
+                        tospec['id'] = '+'.join(newid)
+                    if tospec['id'] in newid:
+                        containingRecord = fromrecords[newid.index(tospec['id'])]
+                        instance = FileInstanceClass(**tospec)
+                        containingRecord.addAnotherInstance(instance.index, instance)
+                    if containingRecord is None:
+                        containingRecord = FileRecord(fromrecords, deleting, validate, **tospec)
+                        instance = containingRecord.getSourceInstance()
+                    absorbtion.append((containingRecord, instance))
+                    self.log.devdebug("Adding mapping: %s", str(tospec))
+                for record in fromrecords:
+                    record.absorbNewFiles(absorbtion)
+        finally:
+            self.lock.endBatch()
 
     def parseFileMap(self, statement):
         result = FileMapping()
@@ -743,20 +1195,40 @@ class FileManager:
     def findRecordsOnREAxis(self, axis, revalue):
         locked = False
         try:
-            self.lock.acquire()
+            self.lock.acquireRead()
             locked = True
             test = re.compile(revalue)
+            keys = None
+            pathIndex = self._pathIndex(axis)
+            if pathIndex is not None:
+                keys = pathIndex.candidates(revalue)
+            if keys is None:
+                keys = self.index[axis].keys()
+            axisIndex = self.index[axis]
             return [value \
-               for key, values in self.index[axis].items() \
+               for key in keys \
                if test.search(key) \
-                   for value in values ]
+                   for value in axisIndex[key] ]
         except re.error:
             raise
         except Exception:
             return []
         finally:
             if locked:
-                self.lock.release()
+                self.lock.releaseRead()
+
+    def _pathIndex(self, axis):
+        #Lock must be held
+        if axis not in FileManager.PATH_INDEX_AXES:
+            return None
+        if axis not in self.pathIndexes:
+            if len(self.index[axis]) < FileManager.PATH_INDEX_THRESHOLD:
+                return None
+            pathIndex = PathIndex()
+            for key in self.index[axis].keys():
+                pathIndex.add(key)
+            self.pathIndexes[axis] = pathIndex
+        return self.pathIndexes[axis]
 
     def findRecordsOnLocationSpec(self, spec):
         if 'location' not in spec.index:
@@ -782,7 +1254,7 @@ class FileManager:
         resultSet = None
         locked = False
         try:
-            self.lock.acquire()
+            self.lock.acquireRead()
             locked = True
             for axis, value in spec.index.items():
                 if axis in FileManager.NON_AXES:
@@ -811,13 +1283,13 @@ class FileManager:
                 return list(resultSet)
         finally:
             if locked:
-                self.lock.release()
+                self.lock.releaseRead()
 
     def findRecords(self, spec):
         resultSet = None
         locked = False
         try:
-            self.lock.acquire()
+            self.lock.acquireRead()
             locked = True
             if 'id' in spec.index:
                 #If the id is called out in the spec, this takes
@@ -830,7 +1302,7 @@ class FileManager:
                     return []
         finally:
             if locked:
-                self.lock.release()
+                self.lock.releaseRead()
         return self._standardAxesIndexLookup(spec)
 
     def _getFileDeclarationList(self, statement):
@@ -860,51 +1332,61 @@ class FileManager:
         return filematch
 
     def addFileIndexes(self, filematches, defaultPath=None, deleting=False, validate=True):
-        if defaultPath is None:
-            defaultPath = self.working
-        addedResults = []
-        for filematch in filematches:
-
-            if 'location' not in filematch or not filematch['location']:
-                self.log.error("File declarations require a location, but none was provided")
-            FileManager.fixupLocationWithBase(
-                defaultPath,
-                filematch['location'],
-                filematch )
-            newPaths = []
-            if 'useRE' in filematch and filematch['useRE']:
-                newPaths = FileManager.findDiskFilesMatchingRegex(
-                    filematch['location'] )
-            else:
-                newPaths = FileManager.findDiskFilesMatchingStarred(
-                    filematch['location'] )
-
-            if len(newPaths) == 0 and not deleting and validate:
-                self.log.error("No files were found for specification: %s",
-                    str(filematch) )
-                #raise ValueError(
-                #    "No files were found for specification: %s" % str(filematch))
-            if len(newPaths) > 0 and deleting and validate:
-                self.log.error("Files specified were found on cleaning: %s",
-                    str(filematch) )
-                raise ValueError(
-                    "Files were found that were supposed to be cleaned" )
-
-            ftemplate = filematch
-            records = []
-            result = []
-            for new in newPaths:
+        self.lock.startBatch()
+        try:
+            if defaultPath is None:
+                defaultPath = self.working
+            fileSystem = None
+            if self.env is not None:
+                fileSystem = getattr(self.env, 'fileSystemCache', None)
+            addedResults = []
+            for filematch in filematches:
+
+                if 'location' not in filematch or not filematch['location']:
+                    self.log.error("File declarations require a location, but none was provided")
                 FileManager.fixupLocationWithBase(
                     defaultPath,
-                    new,
-                    ftemplate )
-                self.log.devdebug("Adding file record: %s", str(ftemplate))
-                record = FileRecord([self], deleting, validate, **ftemplate)
-                result.append(record.getSourceInstance())
-                records.append(record)
-            self.addRecords(records)
-            addedResults.extend(result)
-        return addedResults
+                    filematch['location'],
+                    filematch )
+                newPaths = []
+                if 'useRE' in filematch and filematch['useRE']:
+                    newPaths = FileManager.findDiskFilesMatchingRegex(
+                        filematch['location'],
+                        None if fileSystem is None \
+                            else fileSystem.scanDirectory )
+                else:
+                    newPaths = FileManager.findDiskFilesMatchingStarred(
+                        filematch['location'],
+                        fileSystem )
+
+                if len(newPaths) == 0 and not deleting and validate:
+                    self.log.error("No files were found for specification: %s",
+                        str(filematch) )
+                    #raise ValueError(
+                    #    "No files were found for specification: %s" % str(filematch))
+                if len(newPaths) > 0 and deleting and validate:
+                    self.log.error("Files specified were found on cleaning: %s",
+                        str(filematch) )
+                    raise ValueError(
+                        "Files were found that were supposed to be cleaned" )
+
+                ftemplate = filematch
+                records = []
+                result = []
+                for new in newPaths:
+                    FileManager.fixupLocationWithBase(
+                        defaultPath,
+                        new,
+                        ftemplate )
+                    self.log.devdebug("Adding file record: %s", str(ftemplate))
+                    record = FileRecord([self], deleting, validate, **ftemplate)
+                    result.append(record.getSourceInstance())
+                    records.append(record)
+                self.addRecords(records)
+                addedResults.extend(result)
+            return addedResults
+        finally:
+            self.lock.endBatch()
 
     def addFileDeclaration(self, parseableFileEntry):
         """Call this to add a file declaration from a specification"""
@@ -912,19 +1394,23 @@ class FileManager:
         return self.addFileIndexes([filematch])
 
     def addIndicies(self, indicies, item):
+        if self.lock.deferWrite(FileManager.addIndicies, self, indicies, item):
+            return
         locked = False
         try:
-            self.lock.acquire()
+            self.lock.acquireWrite()
             locked = True
             for axis, value in indicies.items():
                 if axis not in self.index:
                     self.index[axis] = {}
                 if value not in self.index[axis]:
                     self.index[axis][value] = []
+                    if axis in self.pathIndexes:
+                        self.pathIndexes[axis].add(value)
                 self.index[axis][value].append(item)
         finally:
             if locked:
-                self.lock.release()
+                self.lock.releaseWrite()
 
     def addRecords(self, records):
         if len(records) > 0:
@@ -1225,9 +1711,11 @@ class FileRecord(FileManager, IndexedFileEntry):
         FileManager.addIndicies(self, instanceInfo, instance)
 
     def addIndicies(self, instanceInfo, item):
+        if self.lock.deferWrite(self.addIndicies, instanceInfo, item):
+            return
         locked = False
         try:
-            self.lock.acquire()
+            self.lock.acquireWrite()
             locked = True
             FileManager.addIndicies(self, instanceInfo, item)
             self.index['id'][instanceInfo['id']].append(item)
@@ -1235,7 +1723,7 @@ class FileRecord(FileManager, IndexedFileEntry):
                 parent.addIndicies(instanceInfo, item)
         finally:
             if locked:
-                self.lock.release()
+                self.lock.releaseWrite()
 
     def addRecords(self, records):
         FileManager.addRecords(self, records)
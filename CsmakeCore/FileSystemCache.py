@@ -0,0 +1,249 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import errno
+import fnmatch
+import glob
+import os
+import os.path
+import stat
+import threading
+from CsmakeCore.FileManager import RegexPathScanner
+
+class FileSystem:
+    """The file system queries csmake makes while looking for files
+       and deciding what to rebuild.  This version goes straight to
+       the file system, FileSystemCache remembers the answers"""
+
+    def stat(self, path):
+        """Returns the os.stat of the path, or None if it can't be stat'ed"""
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    def lstat(self, path):
+        try:
+            return os.lstat(path)
+        except OSError:
+            return None
+
+    def listDirectory(self, path):
+        """Returns a list of (name, isDirectory) for the entries of the
+           directory, where isDirectory doesn't follow symlinks,
+           or None if the directory can't be listed"""
+        try:
+            with os.scandir(path) as entries:
+                return [ (entry.name, entry.is_dir(follow_symlinks=False)) \
+                         for entry in entries ]
+        except OSError:
+            return None
+
+    def isfile(self, path):
+        result = self.stat(path)
+        return result is not None and stat.S_ISREG(result.st_mode)
+
+    def isdir(self, path):
+        result = self.stat(path)
+        return result is not None and stat.S_ISDIR(result.st_mode)
+
+    def exists(self, path):
+        return self.stat(path) is not None
+
+    def lexists(self, path):
+        return self.lstat(path) is not None
+
+    def getmtime(self, path):
+        result = self.stat(path)
+        if result is None:
+            raise FileNotFoundError(
+                errno.ENOENT,
+                os.strerror(errno.ENOENT),
+                path )
+        return result.st_mtime
+
+    def listdir(self, path):
+        entries = self.listDirectory(path)
+        if entries is None:
+            raise FileNotFoundError(
+                errno.ENOENT,
+                os.strerror(errno.ENOENT),
+                path )
+        return [ name for name, isDirectory in entries ]
+
+    def scanDirectory(self, path):
+        """listDirectory for RegexPathScanner, which wants an empty
+           list for a directory that can't be listed"""
+        entries = self.listDirectory(path)
+        if entries is None:
+            return []
+        return entries
+
+    def glob(self, pathname):
+        """glob.glob (not recursive) using listdir and lexists"""
+        return list(self._iglob(pathname))
+
+    def _iglob(self, pathname):
+        dirname, basename = os.path.split(pathname)
+        if not glob.has_magic(pathname):
+            if basename:
+                if self.lexists(pathname):
+                    yield pathname
+            elif self.isdir(dirname):
+                yield pathname
+            return
+        if not dirname:
+            for name in self._glob1(dirname, basename):
+                yield name
+            return
+        if dirname != pathname and glob.has_magic(dirname):
+            dirs = self._iglob(dirname)
+        else:
+            dirs = [dirname]
+        if glob.has_magic(basename):
+            globber = self._glob1
+        else:
+            globber = self._glob0
+        for directory in dirs:
+            for name in globber(directory, basename):
+                yield os.path.join(directory, name)
+
+    def _glob1(self, dirname, pattern):
+        try:
+            names = self.listdir(dirname or os.curdir)
+        except OSError:
+            return []
+        if pattern[0] != '.':
+            names = [ name for name in names if name[0] != '.' ]
+        return fnmatch.filter(names, pattern)
+
+    def _glob0(self, dirname, basename):
+        if not basename:
+            if self.isdir(dirname):
+                return [basename]
+        elif self.lexists(os.path.join(dirname, basename)):
+            return [basename]
+        return []
+
+    def invalidate(self, path):
+        """Forgets anything known about the path and what is below it"""
+        pass
+
+    def invalidateSpec(self, location, isRegex=False):
+        """Forgets anything known about the files a (starred or regex)
+           file declaration location could refer to"""
+        pass
+
+    def clear(self):
+        pass
+
+class FileSystemCache(FileSystem):
+    """Remembers stats and directory listings until they are invalidated.
+       Environment keeps one of these for a phase (--filesystem-cache),
+       it is cleared at the end of each phase and the outputs declared by
+       a step are invalidated when the step is done.  A step that changes
+       other files should invalidate them, see
+       CsmakeModule._invalidateFileSystemCache"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.stats = {}
+            self.lstats = {}
+            self.listings = {}
+            #Directory -> the paths below it with anything cached
+            self.children = {}
+            #Answers looked up across an invalidation aren't kept
+            self.generation = getattr(self, 'generation', 0) + 1
+
+    def _remember(self, path):
+        #Lock must be held
+        while True:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return
+            if parent not in self.children:
+                self.children[parent] = set()
+            if path in self.children[parent]:
+                return
+            self.children[parent].add(path)
+            path = parent
+
+    def _cached(self, table, path, lookup):
+        path = os.path.abspath(path)
+        with self.lock:
+            if path in table:
+                return table[path]
+            generation = self.generation
+        result = lookup(self, path)
+        with self.lock:
+            if generation == self.generation:
+                table[path] = result
+                self._remember(path)
+        return result
+
+    def stat(self, path):
+        return self._cached(self.stats, path, FileSystem.stat)
+
+    def lstat(self, path):
+        return self._cached(self.lstats, path, FileSystem.lstat)
+
+    def listDirectory(self, path):
+        return self._cached(self.listings, path, FileSystem.listDirectory)
+
+    def invalidate(self, path):
+        path = os.path.abspath(path)
+        parent = os.path.dirname(path)
+        with self.lock:
+            self.generation = self.generation + 1
+            #The parent's listing and times change when entries come or go
+            for table in [self.stats, self.lstats, self.listings]:
+                table.pop(parent, None)
+            if parent in self.children:
+                self.children[parent].discard(path)
+            pending = [path]
+            while len(pending) > 0:
+                current = pending.pop()
+                for table in [self.stats, self.lstats, self.listings]:
+                    table.pop(current, None)
+                pending.extend(self.children.pop(current, []))
+
+    def invalidateSpec(self, location, isRegex=False):
+        #Invalidate the deepest directory that is spelled out literally
+        if isRegex:
+            if '|' in location:
+                self.clear()
+                return
+            parts = []
+            for component, safe in \
+                    RegexPathScanner.splitComponents(location)[:-1]:
+                literal = RegexPathScanner.literalComponent(component)
+                if literal is None:
+                    break
+                parts.append(literal)
+        else:
+            parts = location.split('/')
+            for index, part in enumerate(parts):
+                if glob.has_magic(part):
+                    parts = parts[:index]
+                    break
+        path = '/'.join(parts)
+        if len(path) == 0:
+            path = '/'
+        self.invalidate(path)
@@ -0,0 +1,182 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import json
+import os
+import os.path
+import tempfile
+import threading
+import time
+
+class ModuleIndex:
+    """An index of where csmake modules are (see --module-index), kept
+       so the module paths don't have to be searched on every run.
+
+       Two kinds of directory listings are kept, each with the mtime
+       the directory had when it was listed:
+           searches - for a sys.path entry, the entry and the
+                      subdirectories of it that have a CsmakeModules
+                      directory
+           packages - for a CsmakeModules directory, the names of the
+                      modules in it
+       A listing is used as long as the directory's mtime is the same,
+       so checking the index costs a stat per directory.
+       A listing taken in the same moment the directory changed
+       can't be trusted and is taken again the next time.
+
+       Only a directory's own entries change its mtime: an existing
+       subdirectory of a sys.path entry that gets a CsmakeModules
+       directory isn't found until the sys.path entry changes,
+       or until forget(force=True) is used.
+
+       path - the json file the index is kept in, None keeps it only
+              for this run"""
+
+    FILENAME='module-index.json'
+    VERSION=1
+
+    #A listing of a directory changed less than this many nanoseconds
+    #before it was taken may have missed a change in the same mtime tick
+    SETTLE_NS=2000000000
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.checked = {}
+        self.searches = {}
+        self.packages = {}
+        if path is None:
+            return
+        try:
+            with open(path) as indexFile:
+                index = json.load(indexFile)
+            if index.get('version') == ModuleIndex.VERSION:
+                self.searches = index['searches']
+                self.packages = index['packages']
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+
+    @staticmethod
+    def defaultPath():
+        """Returns where the index is kept when --module-index isn't given:
+           csmake/module-index.json in the user's cache directory"""
+        cacheDir = os.environ.get('XDG_CACHE_HOME')
+        if cacheDir is None or len(cacheDir) == 0:
+            cacheDir = os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(cacheDir, 'csmake', ModuleIndex.FILENAME)
+
+    def _listing(self, kind, path, lister):
+        path = os.path.abspath(path)
+        with self.lock:
+            if (kind, path) in self.checked:
+                return self.checked[(kind, path)]
+            listings = getattr(self, kind)
+            known = listings.get(path)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if known is not None and known[0] == mtime \
+           and known[1] - known[0] >= ModuleIndex.SETTLE_NS:
+            result = known[2]
+        else:
+            listed = time.time_ns()
+            result = lister(path)
+            with self.lock:
+                if mtime is None:
+                    listings.pop(path, None)
+                else:
+                    listings[path] = [mtime, listed, result]
+                self.dirty = True
+        with self.lock:
+            self.checked[(kind, path)] = result
+        return result
+
+    @staticmethod
+    def _searchPath(syspath):
+        found = []
+        if os.path.isdir(os.path.join(syspath, 'CsmakeModules')):
+            found.append(syspath)
+        try:
+            for subpath in os.listdir(syspath):
+                if os.path.isdir(os.path.join(
+                    syspath,
+                    subpath,
+                    'CsmakeModules' )):
+                    found.append(os.path.join(syspath, subpath))
+        except OSError:
+            pass
+        return found
+
+    @staticmethod
+    def _packageModules(packagePath):
+        try:
+            packageFiles = os.listdir(packagePath)
+        except OSError:
+            return []
+        names = []
+        for packageFile in packageFiles:
+            name, ext = os.path.splitext(packageFile)
+            if ext == '.py' and os.path.isfile(
+                os.path.join(packagePath, packageFile) ):
+                names.append(name)
+        return names
+
+    def searchPath(self, syspath):
+        """Returns syspath, if it has a CsmakeModules directory,
+           followed by its subdirectories that do, as absolute paths"""
+        return self._listing('searches', syspath, self._searchPath)
+
+    def packageModules(self, packagePath):
+        """Returns the names of the modules in the
+           CsmakeModules directory packagePath"""
+        return self._listing(
+            'packages',
+            packagePath,
+            self._packageModules )
+
+    def forget(self, force=False):
+        """Makes every listing be checked against its directory again
+           force - list every directory again, even when its mtime
+                   hasn't changed (e.g., when a module isn't found
+                   where the index says)"""
+        with self.lock:
+            self.checked = {}
+            if force:
+                self.searches = {}
+                self.packages = {}
+                self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty or self.path is None:
+                return
+            directory = os.path.dirname(self.path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as indexFile:
+                    json.dump({
+                        'version' : ModuleIndex.VERSION,
+                        'searches' : self.searches,
+                        'packages' : self.packages }, indexFile)
+                os.replace(temp, self.path)
+            except:
+                os.remove(temp)
+                raise
+            self.dirty = False
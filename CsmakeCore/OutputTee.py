@@ -1,5 +1,5 @@
 # <copyright>
-# (c) Copyright 2020-2021,24 Autumn Patterson
+# (c) Copyright 2020-2021,24,26 Autumn Patterson
 # (c) Copyright 2021 Cardinal Peak Technologies, LLC
 #
 # This program is free software: you can redistribute it and/or modify it
@@ -16,30 +16,190 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # </copyright>
 
-import io
+import codecs
+import mmap
 import os
-import subprocess
+import selectors
+import shutil
 import sys
 import tempfile
-import time
 import threading
 
+class OutputChannel:
+    """The output of a single writing thread.
+
+       Everything written is appended to the channel's segment files,
+       which is what result offsets refer to.  Python level writes are
+       recorded directly by the writing thread.  Subprocesses are handed the
+       write end of a pipe (see fileno), which is recorded as it is read,
+       either by the OutputTee consumer or by a thread that needs the record
+       to be current.
+
+       When a result limit is set, only the first and last limit/2 bytes of
+       each result are kept, segments that no result needs are removed as
+       the channel moves on to a new segment.  Results that are released
+       (see OutputTee.releaseResult) need nothing."""
+
+    READ_SIZE = 65536
+    SEGMENT_SIZE = 4*1024*1024
+
+    def __init__(self, tempdir, name, limit, segmentSize=None):
+        self.directory = tempfile.mkdtemp(prefix="%s-" % name, dir=tempdir)
+        if segmentSize is None:
+            segmentSize = OutputChannel.SEGMENT_SIZE
+        self.segmentSize = segmentSize
+        self.segments = {}
+        self.segmentIndex = None
+        self.segmentfd = None
+        self.limit = limit
+        self.results = []
+        self.lock = threading.Lock()
+        self.readfd, self.writefd = os.pipe()
+        os.set_blocking(self.readfd, False)
+        self.size = 0
+        self.decoder = codecs.getincrementaldecoder('utf8')('replace')
+        self.closed = False
+
+    def _openSegment(self, index):
+        if self.segmentfd is not None:
+            os.close(self.segmentfd)
+        path = os.path.join(self.directory, "%08d" % index)
+        self.segmentfd = os.open(
+            path,
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+            0o600 )
+        self.segmentIndex = index
+        self.segments[index] = path
+        self._expireSegments()
+
+    def _retainedRanges(self):
+        ranges = []
+        for location in self.results:
+            start = location[1]
+            if len(location) >= 3:
+                stop = location[-1]
+            else:
+                stop = self.size
+            if self.limit is None or stop - start <= self.limit:
+                ranges.append((start, stop))
+            else:
+                head = self.limit // 2
+                ranges.append((start, start + head))
+                ranges.append((stop - (self.limit - head), stop))
+        return ranges
+
+    def _expireSegments(self):
+        #Removes the segments before the current one that no result needs
+        ranges = self._retainedRanges()
+        for index in list(self.segments.keys()):
+            if index >= self.segmentIndex:
+                continue
+            low = index * self.segmentSize
+            high = low + self.segmentSize
+            needed = False
+            for start, stop in ranges:
+                if start < high and stop > low:
+                    needed = True
+                    break
+            if not needed:
+                os.remove(self.segments[index])
+                del self.segments[index]
+
+    def append(self, data):
+        #Must be called holding lock
+        view = memoryview(data)
+        while len(view):
+            index, offset = divmod(self.size, self.segmentSize)
+            if index != self.segmentIndex:
+                self._openSegment(index)
+            written = os.write(
+                self.segmentfd,
+                view[:self.segmentSize - offset] )
+            view = view[written:]
+            self.size += written
+
+    def _readRange(self, start, stop):
+        parts = []
+        position = start
+        while position < stop:
+            index, offset = divmod(position, self.segmentSize)
+            count = min(stop - position, self.segmentSize - offset)
+            with open(self.segments[index], 'rb') as fp:
+                with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    parts.append(mapped[offset:offset+count])
+            position += count
+        return b''.join(parts)
+
+    def read(self, start, stop):
+        """Returns the bytes recorded from start to stop, if there are more
+           than the limit, the middle is replaced with a note of how much was
+           left out.  Must be called holding lock"""
+        if self.limit is None or stop - start <= self.limit:
+            return self._readRange(start, stop)
+        head = self.limit // 2
+        tailStart = stop - (self.limit - head)
+        return b''.join([
+            self._readRange(start, start + head),
+            ("\n... %d bytes of output omitted ...\n" % (
+                tailStart - start - head)).encode('utf8'),
+            self._readRange(tailStart, stop) ])
+
+    def closeSegments(self):
+        #Must be called holding lock
+        if self.segmentfd is not None:
+            os.close(self.segmentfd)
+            self.segmentfd = None
+
+class _ChannelWriter:
+    #Held by the writing thread, when the thread goes away the write
+    #  end of the pipe is closed so the channel can be finished off.
+    #  This may happen during garbage collection in any thread, possibly
+    #  one holding the channel's lock, so the consumer does the closing
+    def __init__(self, tee, channel):
+        self.tee = tee
+        self.channel = channel
+
+    def __del__(self):
+        try:
+            self.tee.closingChannels.append(self.channel)
+            self.tee._wake()
+        except Exception:
+            pass
+
 class OutputTee:
     def __init__(self):
-        self.tempdir = tempfile.mkdtemp(prefix='csmake-temp')
-        self.executing = True
+        self.tempdir = None
+        self.resultLimit = None
+        self.segmentSize = None
+        self.executing = False
         self.lock = threading.Lock()
+        self.outputLock = threading.Lock()
         self.resultIds = {}
-        self.writers = []
         self.captureStreams = []
-        self.threadsOpen = {}
-        self.threads = []
+        self.channels = []
+        self.pendingChannels = []
+        self.closingChannels = []
+        self.consumer = None
+        self.selector = None
+        self.wakeRead = None
+        self.wakeWrite = None
         self._locals = threading.local()
         self.actual = sys.stdout
 
     def subsumeStream(self, stream):
         self.actual = stream
 
+    def setResultLimit(self, limit):
+        """Limits the output kept for each result to limit bytes,
+           the first and last half of the limit are kept.
+           None keeps all output"""
+        with self.lock:
+            self.resultLimit = limit
+            channels = list(self.channels)
+        for channel in channels:
+            with channel.lock:
+                channel.limit = limit
+
     def addCaptureStream(self, stream):
         with self.lock:
             self.captureStreams.append(stream)
@@ -52,82 +212,226 @@ class OutputTee:
                 pass
 
     def _writeToAll(self, buf):
-        try:
-            self.actual.write(buf)
-            self.actual.flush()
-        except Exception as e:
-            sys.stderr.write("Couldn't write actual: " + buf + "\n")
-            sys.stderr.write(str(e))
-            sys.stderr.flush()
         with self.lock:
             captures = list(self.captureStreams)
-        for cap in captures:
+        with self.outputLock:
             try:
-                cap.write(buf)
-                cap.flush()
-            except Exception:
-                pass
+                self.actual.write(buf)
+                self.actual.flush()
+            except Exception as e:
+                sys.stderr.write("Couldn't write actual: " + buf + "\n")
+                sys.stderr.write(str(e))
+                sys.stderr.flush()
+            for cap in captures:
+                try:
+                    cap.write(buf)
+                    cap.flush()
+                except Exception:
+                    pass
+
+    def _record(self, channel, data):
+        #Must be called holding channel.lock
+        channel.append(data)
+        self._writeToAll(channel.decoder.decode(data))
+
+    def _drainLocked(self, channel):
+        #Records whatever is waiting in the channel's pipe
+        #  Returns False when every writer to the pipe has closed
+        while not channel.closed:
+            try:
+                data = os.read(channel.readfd, OutputChannel.READ_SIZE)
+            except BlockingIOError:
+                return True
+            if len(data) == 0:
+                self._finishChannel(channel)
+                return False
+            self._record(channel, data)
+        return False
+
+    def _drain(self, channel):
+        with channel.lock:
+            return self._drainLocked(channel)
 
-    def _consumerThread(self, myfilename):
-        buf = ""
-        with io.TextIOWrapper(open(myfilename, 'rb', 0), write_through=0) as myfd:
-            myfd.seek(0)
-            while (self.threadsOpen[myfilename] and self.executing) or len(buf):
-                buf = myfd.read(2048)
-                if len(buf) == 0:
-                    time.sleep(.1)
+    def _finishChannel(self, channel):
+        #Must be called holding channel.lock
+        tail = channel.decoder.decode(b'', True)
+        if len(tail):
+            self._writeToAll(tail)
+        channel.closed = True
+        channel.closeSegments()
+        try:
+            os.close(channel.readfd)
+        except OSError:
+            pass
+
+    def _closeWriter(self, channel):
+        with channel.lock:
+            if channel.writefd is not None:
+                os.close(channel.writefd)
+                channel.writefd = None
+        self._wake()
+
+    def _wake(self):
+        try:
+            os.write(self.wakeWrite, b'x')
+        except (OSError, TypeError):
+            pass
+
+    def _ensureConsumer(self):
+        with self.lock:
+            if self.consumer is not None and self.consumer.is_alive():
+                return
+            if self.wakeRead is None:
+                self.wakeRead, self.wakeWrite = os.pipe()
+                os.set_blocking(self.wakeRead, False)
+                os.set_blocking(self.wakeWrite, False)
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.wakeRead, selectors.EVENT_READ)
+            self.pendingChannels = [
+                channel for channel in self.channels if not channel.closed ]
+            self.executing = True
+            self.consumer = threading.Thread(
+                target=self._consumerThread,
+                name="csmake-output-consumer" )
+            self.consumer.daemon = True
+            self.consumer.start()
+
+    def _consumerThread(self):
+        #Multiplexes the pipes of every channel, the consumer is woken
+        #  through the wake pipe when channels are added or closed,
+        #  or when the tee is ending
+        while True:
+            with self.lock:
+                pending = self.pendingChannels
+                self.pendingChannels = []
+                executing = self.executing
+            while len(self.closingChannels):
+                self._closeWriter(self.closingChannels.pop())
+            #Channels may be finished by other threads, their pipes
+            #  have to be forgotten before the descriptors are reused
+            for key in list(self.selector.get_map().values()):
+                if key.data is not None and key.data.closed:
+                    self.selector.unregister(key.fileobj)
+            for channel in pending:
+                with channel.lock:
+                    if not channel.closed:
+                        self.selector.register(
+                            channel.readfd,
+                            selectors.EVENT_READ,
+                            channel )
+            if not executing:
+                break
+            for key, events in self.selector.select():
+                if key.data is None:
+                    try:
+                        while len(os.read(self.wakeRead, 4096)):
+                            pass
+                    except BlockingIOError:
+                        pass
                     continue
-                self._writeToAll(buf)
-            else:
-                buf = myfd.read(2048)
-                while len(buf):
-                    self._writeToAll(buf)
-                    buf = myfd.read(2048)
+                channel = key.data
+                with channel.lock:
+                    if not self._drainLocked(channel):
+                        self.selector.unregister(key.fileobj)
+        for key in list(self.selector.get_map().values()):
+            if key.data is not None:
+                self._drain(key.data)
+        self.selector.close()
 
     def _init_thread_local(self):
-        self._locals.filename = "{}/{}".format(self.tempdir, threading.currentThread().getName())
-        self._locals.filebuf = io.TextIOWrapper(open(self._locals.filename, 'wb', 0), write_through=True)
+        with self.lock:
+            if self.tempdir is None:
+                self.tempdir = tempfile.mkdtemp(prefix='csmake-temp')
+            channel = OutputChannel(
+                self.tempdir,
+                threading.currentThread().getName(),
+                self.resultLimit,
+                self.segmentSize )
+        self._locals.channel = channel
+        self._locals.writer = _ChannelWriter(self, channel)
         self._locals.currentResult = None
-        self._locals.readerThread = threading.Thread(
-            target=self._consumerThread,
-            args=(self._locals.filename, ))
         with self.lock:
-            self.threadsOpen[self._locals.filename] = True
-            self.threads.append(self._locals.readerThread)
-        self._locals.readerThread.start()
+            self.channels = [ x for x in self.channels if not x.closed ]
+            self.channels.append(channel)
+            self.pendingChannels.append(channel)
+        self._ensureConsumer()
+        self._wake()
 
-    def startResult(self, result, repeat=True):
+    def _currentChannel(self):
         try:
-            cr = self._locals.currentResult
-            pos = self._locals.filebuf.tell()
-            with self.lock:
-                if cr is not None:
-                    self.resultIds[cr].append(pos)
-                self.resultIds[result] = [self._locals.filename, pos]
+            channel = self._locals.channel
         except AttributeError:
-            if not repeat:
-                raise
+            channel = None
+        if channel is None or channel.writefd is None:
+            #First output from the thread, or the thread closed its channel
             self._init_thread_local()
-            self.startResult(result, False)
+            channel = self._locals.channel
+        return channel
+
+    def startResult(self, result, repeat=True):
+        channel = self._currentChannel()
+        with channel.lock:
+            self._drainLocked(channel)
+            pos = channel.size
+        cr = self._locals.currentResult
+        location = [channel, pos]
+        with self.lock:
+            if cr is not None:
+                self.resultIds[cr].append(pos)
+            self.resultIds[result] = location
+        with channel.lock:
+            channel.results.append(location)
 
     def endResult(self, result):
         try:
-            self.flush()
+            channel = self._currentChannel()
+            with channel.lock:
+                self._drainLocked(channel)
+                pos = channel.size
             with self.lock:
-                self.resultIds[result].append(self._locals.filebuf.tell())
+                self.resultIds[result].append(pos)
         except:
             pass
 
+    def releaseResult(self, result):
+        """Forgets the output of a result that has ended and won't be
+           asked for again, so segments only it needed can be removed"""
+        with self.lock:
+            location = self.resultIds.pop(result, None)
+        if location is None:
+            return
+        channel = location[0]
+        with channel.lock:
+            channel.results = [
+                x for x in channel.results if x is not location ]
+
     def endAll(self):
-        for f in self.writers:
+        with self.lock:
+            consumer = self.consumer
+            self.executing = False
+        self._wake()
+        if consumer is not None:
             try:
-                f.close()
+                consumer.join()
             except:
                 pass
-        self.executing = False
-        for t in self.threads:
+        with self.lock:
+            channels = list(self.channels)
+            self.channels = []
+            self.pendingChannels = []
+            self.resultIds = {}
+            tempdir = self.tempdir
+            self.tempdir = None
+        for channel in channels:
             try:
-                t.join()
+                with channel.lock:
+                    self._drainLocked(channel)
+                    #Threads still writing will start new channels
+                    if channel.writefd is not None:
+                        os.close(channel.writefd)
+                        channel.writefd = None
+                    if not channel.closed:
+                        self._finishChannel(channel)
             except:
                 pass
         try:
@@ -135,17 +439,14 @@ class OutputTee:
                 self.actual.close()
         except:
             pass
-        try:
-            "subprocess.call(['rm', '-rf', self.tempdir])"
-        except:
-            pass
+        if tempdir is not None:
+            shutil.rmtree(tempdir, ignore_errors=True)
 
     def close(self):
         try:
-            self.threadsOpen[self._locals.filename] = False
-            self._locals.filebuf.close()
-            with self.lock:
-                f.remove(self._locals.filebuf)
+            channel = self._locals.channel
+            self._drain(channel)
+            self._closeWriter(channel)
         except:
             pass
         try:
@@ -154,39 +455,38 @@ class OutputTee:
             pass
 
     def flush(self):
-        try:
-            self._locals.filebuf.flush()
-        except AttributeError:
-            self._init_thread_local()
+        channel = self._currentChannel()
+        self._drain(channel)
 
     def write(self, out, retry=True):
-        try:
-            return self._locals.filebuf.write(out)
-        except AttributeError:
-            if retry:
-                self._init_thread_local()
-                self.write(out, False)
+        channel = self._currentChannel()
+        with channel.lock:
+            #Anything a subprocess wrote first goes first
+            self._drainLocked(channel)
+            if not channel.closed:
+                self._record(channel, out.encode('utf8'))
+        return len(out)
 
     def fileno(self):
-        return self._locals.filebuf.fileno()
+        channel = self._currentChannel()
+        self._ensureConsumer()
+        return channel.writefd
 
     def getResult(self, result):
         with self.lock:
             location = self.resultIds[result]
+        channel = location[0]
+        with channel.lock:
+            if not channel.closed:
+                self._drainLocked(channel)
+            start = location[1]
             if len(location) >= 3:
-                f = location[0]
-                start = location[1]
                 stop = location[-1]
             else:
-                f, start = location
-                stop = 9999999
-        with open(f, 'r+b') as fp:
-            fp.seek(start)
-            #TODO: Ensure all is read
-            return fp.read(stop-start)
+                stop = channel.size
+            return channel.read(start, stop)
 
     def __del__(self):
         self.endAll()
 
 OutputTee = OutputTee()
-
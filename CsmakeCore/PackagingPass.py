@@ -0,0 +1,132 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import collections
+import os
+import os.path
+import threading
+from CsmakeCore.FileSystemCache import FileSystemCache
+
+class PackagingPass:
+    """Shares one packaging pass between the packagers building
+       different formats of a package at the same time (see the
+       'formats' option of Packager).  The installmap steps are run once,
+       directory listings are cached, and every file is read and
+       digested once for all of the packagers.
+
+       The contents of a file are kept until every packager has read it,
+       or until more than CACHE_SIZE bytes are kept, oldest first.
+       Files bigger than FILE_LIMIT are read by each packager."""
+
+    CACHE_SIZE=256*1024*1024
+    FILE_LIMIT=32*1024*1024
+
+    class FileContents:
+        def __init__(self, key):
+            self.key = key
+            self.lock = threading.Lock()
+            self.data = None
+            self.digests = {}
+            self.readers = 0
+            #True once the contents count against the CACHE_SIZE
+            self.counted = False
+
+        def read(self, path, methods):
+            with self.lock:
+                if self.data is None:
+                    with open(path, 'rb') as fileobj:
+                        self.data = fileobj.read()
+                result = []
+                for method in methods:
+                    digest = method()
+                    if digest.name not in self.digests:
+                        digest.update(self.data)
+                        self.digests[digest.name] = digest.hexdigest()
+                    result.append(self.digests[digest.name])
+                return (self.data, result)
+
+    def __init__(self, packagers):
+        self.packagers = packagers
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.fileSystem = FileSystemCache()
+        self.mapSteps = {}
+        self.files = collections.OrderedDict()
+        self.cached = 0
+        self.started = set()
+
+    def formatStarted(self, step):
+        with self.condition:
+            self.started.add(step)
+            self.condition.notify_all()
+
+    def waitForFormats(self, steps):
+        """Waits until every step in steps called formatStarted"""
+        with self.condition:
+            while not self.started.issuperset(steps):
+                self.condition.wait()
+
+    def mapDefinitions(self, step, launch):
+        """Returns what launch(step) returns, launching step only once
+           for all of the packagers"""
+        with self.lock:
+            if step not in self.mapSteps:
+                self.mapSteps[step] = [threading.Lock(), False, None]
+            entry = self.mapSteps[step]
+        with entry[0]:
+            if not entry[1]:
+                entry[2] = launch(step)
+                entry[1] = True
+            return entry[2]
+
+    def _forget(self, path):
+        #Lock must be held
+        entry = self.files.pop(path)
+        if entry.counted:
+            self.cached = self.cached - len(entry.data)
+
+    def contents(self, path, methods=[]):
+        """Returns (contents, hexdigests) of the file at path, the
+           hexdigests in the order of the hashlib methods given,
+           or None when the file is too big to keep"""
+        path = os.path.abspath(path)
+        fileStat = os.stat(path)
+        if fileStat.st_size > PackagingPass.FILE_LIMIT:
+            return None
+        key = (fileStat.st_size, fileStat.st_mtime_ns)
+        with self.lock:
+            entry = self.files.get(path)
+            if entry is not None and entry.key != key:
+                self._forget(path)
+                entry = None
+            if entry is None:
+                entry = PackagingPass.FileContents(key)
+                self.files[path] = entry
+            else:
+                self.files.move_to_end(path)
+        result = entry.read(path, methods)
+        with self.lock:
+            if path not in self.files or self.files[path] is not entry:
+                return result
+            if not entry.counted:
+                entry.counted = True
+                self.cached = self.cached + len(entry.data)
+            entry.readers = entry.readers + 1
+            if entry.readers >= self.packagers:
+                self._forget(path)
+            while self.cached > PackagingPass.CACHE_SIZE:
+                self._forget(next(iter(self.files)))
+        return result
@@ -0,0 +1,310 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import concurrent.futures
+import lzma
+import struct
+import tarfile
+import zlib
+
+class ParallelCompressor:
+    """A write-only file object that cuts what is written to it into
+       blocks, compresses the blocks on a pool of threads (lzma and zlib
+       release the GIL while they compress) and writes the compressed
+       blocks, in order, to fileobj as one compressed stream.
+
+       The blocks don't depend on the number of threads, so the same
+       input compresses to the same output with any number of threads."""
+
+    BLOCK_SIZE=1024*1024
+
+    def __init__(self, fileobj, threads, level, blockSize=None):
+        self.fileobj = fileobj
+        self.threads = threads
+        self.level = level
+        if blockSize is None:
+            blockSize = self.BLOCK_SIZE
+        self.blockSize = blockSize
+        self.buffer = []
+        self.buffered = 0
+        self.pending = []
+        self.closed = False
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=threads )
+        self._writeHeader()
+
+    @staticmethod
+    def create(path, compression, threads, level=None, blockSize=None):
+        """Opens path for writing with the compressor for compression,
+           'gz' or 'xz' (as in tarfile modes)"""
+        compressors = {
+            'gz' : ParallelGzipCompressor,
+            'xz' : ParallelXZCompressor }
+        if compression not in compressors:
+            raise ValueError(
+                "Compression '%s' can't be done in parallel" % compression)
+        fileobj = open(path, 'wb')
+        try:
+            return compressors[compression](
+                fileobj,
+                threads,
+                level,
+                blockSize )
+        except:
+            fileobj.close()
+            raise
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed compressor")
+        written = len(data)
+        self._update(data)
+        self.buffer.append(bytes(data))
+        self.buffered = self.buffered + written
+        if self.buffered >= self.blockSize:
+            buffered = b''.join(self.buffer)
+            start = 0
+            while len(buffered) - start >= self.blockSize:
+                self._submit(buffered[start:start+self.blockSize], False)
+                start = start + self.blockSize
+            self.buffer = [buffered[start:]]
+            self.buffered = len(buffered) - start
+        return written
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._submit(b''.join(self.buffer), True)
+            self.buffer = []
+            while len(self.pending) > 0:
+                self._writeOldest()
+            self._writeTrailer()
+        finally:
+            self.executor.shutdown()
+            self.fileobj.close()
+
+    def _submit(self, block, final):
+        self.pending.append(
+            self.executor.submit(
+                self._compressBlock,
+                block,
+                final,
+                self._blockContext(block) ) )
+        #Keep enough blocks going to keep the threads busy without
+        #  holding the whole archive in memory
+        while len(self.pending) > self.threads + 1:
+            self._writeOldest()
+
+    def _writeOldest(self):
+        compressed = self.pending.pop(0).result()
+        self._recordBlock(compressed)
+        self.fileobj.write(compressed[0])
+
+    def _update(self, data):
+        #Called with the uncompressed data as it is written
+        pass
+
+    def _blockContext(self, block):
+        #Returns what _compressBlock needs from before the block
+        return None
+
+    def _recordBlock(self, compressed):
+        pass
+
+    def _writeHeader(self):
+        pass
+
+    def _writeTrailer(self):
+        pass
+
+    def _compressBlock(self, block, final, context):
+        """Returns a tuple that starts with the compressed block"""
+        raise NotImplementedError()
+
+class ParallelGzipCompressor(ParallelCompressor):
+    """Writes one gzip member the way pigz does: every block is deflated
+       separately, primed with the 32K of data before it, and ends on a
+       byte boundary (a sync flush) so the blocks join into one
+       deflate stream"""
+
+    BLOCK_SIZE=128*1024
+    DICTIONARY_SIZE=32*1024
+
+    def __init__(self, fileobj, threads, level, blockSize=None):
+        if level is None:
+            level = 9
+        self.crc = 0
+        self.size = 0
+        self.dictionary = b''
+        ParallelCompressor.__init__(self, fileobj, threads, level, blockSize)
+
+    def _writeHeader(self):
+        #No name, no mtime, so the output only depends on the data
+        if self.level == 9:
+            extraFlags = 2
+        elif self.level == 1:
+            extraFlags = 4
+        else:
+            extraFlags = 0
+        self.fileobj.write(
+            b'\x1f\x8b\x08\x00' + struct.pack('<L', 0)
+            + bytes([extraFlags, 255]) )
+
+    def _update(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size = self.size + len(data)
+
+    def _blockContext(self, block):
+        dictionary = self.dictionary
+        self.dictionary = block[-self.DICTIONARY_SIZE:]
+        return dictionary
+
+    def _compressBlock(self, block, final, dictionary):
+        if len(dictionary) > 0:
+            compressor = zlib.compressobj(
+                self.level,
+                zlib.DEFLATED,
+                -zlib.MAX_WBITS,
+                zlib.DEF_MEM_LEVEL,
+                zlib.Z_DEFAULT_STRATEGY,
+                dictionary )
+        else:
+            compressor = zlib.compressobj(
+                self.level,
+                zlib.DEFLATED,
+                -zlib.MAX_WBITS )
+        if final:
+            mode = zlib.Z_FINISH
+        else:
+            mode = zlib.Z_SYNC_FLUSH
+        return (compressor.compress(block) + compressor.flush(mode),)
+
+    def _writeTrailer(self):
+        self.fileobj.write(struct.pack(
+            '<LL',
+            self.crc & 0xffffffff,
+            self.size & 0xffffffff ))
+
+class ParallelXZCompressor(ParallelCompressor):
+    """Writes one xz stream with a block for every block of input.
+       Every block is compressed as an xz stream of its own, and its block
+       is taken out of that stream and indexed in the stream written"""
+
+    #Dictionary size for each preset, xz uses blocks three times this
+    PRESET_DICTIONARY_SIZES=[
+        256*1024, 1024*1024, 2*1024*1024, 4*1024*1024, 4*1024*1024,
+        8*1024*1024, 8*1024*1024, 16*1024*1024, 32*1024*1024,
+        64*1024*1024 ]
+
+    def __init__(self, fileobj, threads, level, blockSize=None):
+        if level is None:
+            level = 6
+        if blockSize is None:
+            blockSize = 3 * self.PRESET_DICTIONARY_SIZES[level]
+        self.records = []
+        self.streamHeader = None
+        ParallelCompressor.__init__(self, fileobj, threads, level, blockSize)
+
+    @staticmethod
+    def _encodeNumber(number):
+        result = bytearray()
+        while number >= 0x80:
+            result.append((number & 0x7f) | 0x80)
+            number = number >> 7
+        result.append(number)
+        return bytes(result)
+
+    @staticmethod
+    def _decodeNumber(data, offset):
+        number = 0
+        shift = 0
+        while True:
+            byte = data[offset]
+            offset = offset + 1
+            number = number | ((byte & 0x7f) << shift)
+            shift = shift + 7
+            if byte & 0x80 == 0:
+                return number, offset
+
+    def _compressBlock(self, block, final, context):
+        stream = lzma.compress(
+            block,
+            format=lzma.FORMAT_XZ,
+            check=lzma.CHECK_CRC64,
+            preset=self.level )
+        #Stream footer: crc32, backward size, flags, 'YZ'
+        backwardSize = struct.unpack('<L', stream[-8:-4])[0]
+        indexStart = len(stream) - 12 - (backwardSize + 1) * 4
+        count, offset = self._decodeNumber(stream, indexStart + 1)
+        records = []
+        for record in range(count):
+            unpadded, offset = self._decodeNumber(stream, offset)
+            uncompressed, offset = self._decodeNumber(stream, offset)
+            records.append((unpadded, uncompressed))
+        return (stream[12:indexStart], records, stream[:12])
+
+    def _recordBlock(self, compressed):
+        self.records.extend(compressed[1])
+        if self.streamHeader is None:
+            self.streamHeader = compressed[2]
+            self.fileobj.write(self.streamHeader)
+
+    def _writeTrailer(self):
+        index = bytearray(b'\x00')
+        index.extend(self._encodeNumber(len(self.records)))
+        for unpadded, uncompressed in self.records:
+            index.extend(self._encodeNumber(unpadded))
+            index.extend(self._encodeNumber(uncompressed))
+        index.extend(b'\x00' * ((4 - len(index) % 4) % 4))
+        index.extend(struct.pack('<L', zlib.crc32(index) & 0xffffffff))
+        flags = self.streamHeader[6:8]
+        backward = struct.pack('<L', len(index) // 4 - 1) + flags
+        self.fileobj.write(bytes(index))
+        self.fileobj.write(
+            struct.pack('<L', zlib.crc32(backward) & 0xffffffff)
+            + backward + b'YZ' )
+
+class CompressedTarFile(tarfile.TarFile):
+    """A TarFile written through a ParallelCompressor"""
+
+    @classmethod
+    def create(cls, path, compression, threads, level=None, **kwargs):
+        compressor = ParallelCompressor.create(
+            path,
+            compression,
+            threads,
+            level )
+        try:
+            archive = cls.open(fileobj=compressor, mode='w|', **kwargs)
+        except:
+            compressor.close()
+            raise
+        archive.compressor = compressor
+        return archive
+
+    def close(self):
+        try:
+            tarfile.TarFile.close(self)
+        finally:
+            self.compressor.close()
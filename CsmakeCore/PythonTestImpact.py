@@ -0,0 +1,198 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import hashlib
+import json
+import os
+import os.path
+import tempfile
+import unittest
+
+class PythonTestImpact:
+    """Keeps which source lines each python unit test covered for
+       TestPython (see the 'select' option of TestPython), so a run
+       can be limited to the tests affected by changes to the sources.
+
+       The map is kept as json in the file given:
+           tests - the source lines each test covered by file
+           files - the sha256 of each file measured when it was recorded
+           failed - the tests that didn't pass
+           coverage - the total percentage covered and the attributes of
+                      each class reported the last time every test ran
+
+       A test is affected when it covered a file whose contents changed,
+       when it is new, or when it didn't pass the last time it was run.
+       Every test is affected when a file changed that was only run
+       outside of the tests (e.g., when it was imported)."""
+
+    #Changes when what is kept in the map changes
+    VERSION = 2
+
+    def __init__(self, path, sourceDir):
+        self.path = path
+        self.sourceDir = os.path.realpath(sourceDir)
+        self.hashes = {}
+        self.selected = None
+        self.testIds = None
+        self.baseline = None
+        try:
+            with open(path) as mapFile:
+                baseline = json.load(mapFile)
+            if baseline.get('version') == PythonTestImpact.VERSION:
+                self.baseline = baseline
+        except (IOError, ValueError):
+            pass
+
+    @staticmethod
+    def allTestIds(suite):
+        """Yields the id of every test in suite"""
+        for test in suite:
+            if hasattr(test, "_tests"):
+                for testId in PythonTestImpact.allTestIds(test):
+                    yield testId
+            else:
+                yield test.id()
+
+    @staticmethod
+    def filter(suite, testIds):
+        """Returns suite with only the tests in testIds
+           Every suite is kept, so the top level suites keep their indexes"""
+        result = unittest.TestSuite()
+        for test in suite:
+            if hasattr(test, "_tests"):
+                result.addTest(PythonTestImpact.filter(test, testIds))
+            elif test.id() in testIds:
+                result.addTest(test)
+        return result
+
+    def hasBaseline(self):
+        return self.baseline is not None
+
+    def selectedEverything(self):
+        """Returns True when the last select chose every test"""
+        return self.selected == self.testIds
+
+    def lastCoverage(self):
+        """Returns (percent, classes), the coverage recorded the last
+           time every test ran, or None if it wasn't recorded"""
+        if self.baseline is None or self.baseline.get('coverage') is None:
+            return None
+        return tuple(self.baseline['coverage'])
+
+    def fileHash(self, path):
+        """Returns the sha256 of the contents of path
+           or None if it can't be read"""
+        if path not in self.hashes:
+            try:
+                hasher = hashlib.sha256()
+                with open(path, 'rb') as sourceFile:
+                    for chunk in iter(lambda: sourceFile.read(65536), b''):
+                        hasher.update(chunk)
+                self.hashes[path] = hasher.hexdigest()
+            except (IOError, OSError):
+                self.hashes[path] = None
+        return self.hashes[path]
+
+    def changedFiles(self):
+        """Returns the files recorded in the map that have changed"""
+        if self.baseline is None:
+            return set()
+        return set([
+            path for path, digest in self.baseline['files'].items()
+            if self.fileHash(path) != digest ])
+
+    def select(self, testIds, everything=False):
+        """Returns the ids in testIds of the tests affected by changes
+           since the map was recorded, or all of them when everything
+           is True or there is no map to go by"""
+        self.testIds = set(testIds)
+        if everything or self.baseline is None:
+            self.selected = set(self.testIds)
+            return self.selected
+        tests = self.baseline['tests']
+        changed = self.changedFiles()
+        covered = set()
+        for files in tests.values():
+            covered.update(files)
+        if len(changed - covered) > 0:
+            self.selected = set(self.testIds)
+            return self.selected
+        failed = set(self.baseline['failed'])
+        self.selected = set([
+            testId for testId in self.testIds
+            if testId not in tests
+               or testId in failed
+               or len(changed.intersection(tests[testId])) > 0 ])
+        return self.selected
+
+    def _isSource(self, path):
+        path = os.path.realpath(path)
+        return path == self.sourceDir \
+            or path.startswith(self.sourceDir + os.sep)
+
+    def record(self, data, failedIds, coverage=None):
+        """Updates the map with the coverage measured for the selected
+           tests in data (a CoverageData with a context for each test)
+           failedIds are the ids of the tests that didn't pass
+           coverage is (percent, classes) reported for a run of every
+           test, otherwise the coverage recorded earlier is kept"""
+        tests = {}
+        files = set()
+        if coverage is None:
+            coverage = self.lastCoverage()
+        if self.baseline is not None:
+            tests = dict([
+                (testId, covered) for testId, covered
+                in self.baseline['tests'].items()
+                if testId in self.testIds and testId not in self.selected ])
+            files.update(self.baseline['files'])
+        for testId in self.selected:
+            tests[testId] = {}
+        for path in data.measured_files():
+            if not self._isSource(path):
+                continue
+            files.add(path)
+            for lineno, contexts in data.contexts_by_lineno(path).items():
+                if lineno <= 0:
+                    continue
+                for context in contexts:
+                    if context in self.selected:
+                        tests[context].setdefault(path, []).append(lineno)
+        for covered in tests.values():
+            for path in covered:
+                covered[path] = sorted(set(covered[path]))
+        hashes = {}
+        for path in files:
+            digest = self.fileHash(path)
+            if digest is not None:
+                hashes[path] = digest
+        self.baseline = {
+            'version' : PythonTestImpact.VERSION,
+            'tests' : tests,
+            'files' : hashes,
+            'failed' : sorted(set(failedIds).intersection(self.testIds)),
+            'coverage' : coverage }
+        directory = os.path.dirname(self.path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as mapFile:
+                json.dump(self.baseline, mapFile, sort_keys=True)
+            os.replace(temp, self.path)
+        except:
+            os.remove(temp)
+            raise
@@ -0,0 +1,193 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import os
+import os.path
+import pickle
+import subprocess
+import sys
+import unittest
+try:
+    import CsmakeCore._vendor.coverage as coverage
+except ImportError:
+    coverage = None
+from CsmakeCore import OutputTee
+from CsmakeCore.PythonTestImpact import PythonTestImpact
+from CsmakeCore.Result import Result
+
+class PythonTestWorker:
+    """Runs a shard of the python unit tests for TestPython in
+       another process (see the 'workers' option of TestPython).
+
+       The worker discovers the tests again and runs the top level
+       suites (one for each test module) at the indexes it is given,
+       measuring coverage into its own suffixed coverage data file.
+       When it is given the ids of the tests selected, only those tests
+       are run, each measured in a coverage context of its id.
+       Everything the worker writes is returned with the results
+       so the step can write it to its log in order."""
+
+    #Runs the worker given in the file named by the first argument,
+    #  the results are written to the file named by the second
+    COMMAND = '''from CsmakeCore.PythonTestWorker import PythonTestWorker
+PythonTestWorker.main()'''
+
+    #The settings a worker's log is made with
+    LOG_SETTINGS = [
+        'dev-output', 'file-tracking', 'debug', 'verbose', 'quiet',
+        'no-chatter' ]
+
+    class Environment:
+        def __init__(self, settings):
+            self.settings = settings
+
+    class Context:
+        """Stands in for the TestPython step as the tests' csmake_test"""
+        def __init__(self, options, log):
+            self.options = options
+            self.log = log
+
+    @staticmethod
+    def contextResultClass(cover):
+        """Returns a TextTestResult class that measures each test
+           in a coverage context of the test's id"""
+        class ContextResult(unittest.TextTestResult):
+            def startTest(self, test):
+                cover.switch_context(test.id())
+                unittest.TextTestResult.startTest(self, test)
+
+            def stopTest(self, test):
+                unittest.TextTestResult.stopTest(self, test)
+                cover.switch_context('')
+        return ContextResult
+
+    def __init__(self, options, settings, resultInfo, dataFile, selected=None):
+        self.options = dict([
+            (key, value) for key, value in options.items()
+            if type(value) is str ])
+        self.settings = dict([
+            (key, settings[key]) for key in PythonTestWorker.LOG_SETTINGS ])
+        self.resultInfo = dict(resultInfo)
+        self.dataFile = dataFile
+        self.selected = selected
+
+    @staticmethod
+    def discover(options):
+        return unittest.TestLoader().discover(
+            options['test-dir'],
+            options['test'],
+            options['source-dir'] )
+
+    @staticmethod
+    def shard(suite, workers):
+        """Returns the indexes of the top level suites in suite split
+           into at most workers lists with about as many tests in each
+           Suites without any tests are left out"""
+        counts = [
+            (test.countTestCases(), index)
+            for index, test in enumerate(suite)
+            if test.countTestCases() > 0 ]
+        shards = [ [0, []] for worker in range(min(workers, len(counts))) ]
+        for count, index in sorted(counts, key=lambda x: (-x[0], x[1])):
+            shard = min(shards, key=lambda x: x[0])
+            shard[0] = shard[0] + count
+            shard[1].append(index)
+        return [ sorted(indexes) for count, indexes in shards ]
+
+    def _giveTestsCsmakeContext(self, tests, context):
+        for test in tests:
+            if hasattr(test, "_tests"):
+                self._giveTestsCsmakeContext(test._tests, context)
+            else:
+                test.csmake_test = context
+
+    def run(self, indexes):
+        """Runs the top level suites at indexes, returns
+           (tests run, successful, errors, failures)
+           errors and failures are lists of (test id, traceback)"""
+        cover = None
+        if coverage is not None and self.dataFile is not None:
+            cover = coverage.Coverage(
+                branch=True,
+                data_file=self.dataFile,
+                data_suffix=True )
+            cover.start()
+        try:
+            suite = PythonTestWorker.discover(self.options)
+            tests = unittest.TestSuite([
+                test for index, test in enumerate(suite)
+                if index in indexes ])
+            runner = unittest.TextTestRunner(sys.stdout, True, 3)
+            if self.selected is not None:
+                tests = PythonTestImpact.filter(tests, self.selected)
+                if cover is not None:
+                    runner.resultclass = \
+                        PythonTestWorker.contextResultClass(cover)
+            resultInfo = dict(self.resultInfo)
+            resultInfo['Out'] = sys.stdout
+            context = PythonTestWorker.Context(
+                self.options,
+                Result(
+                    PythonTestWorker.Environment(self.settings),
+                    resultInfo ) )
+            self._giveTestsCsmakeContext(tests, context)
+            result = runner.run(tests)
+        finally:
+            if cover is not None:
+                cover.stop()
+                cover.save()
+            OutputTee.OutputTee.endAll()
+        return (
+            result.testsRun,
+            result.wasSuccessful(),
+            [ (test.id(), trace) for test, trace in result.errors ],
+            [ (test.id(), trace) for test, trace in result.failures ] )
+
+    def start(self, indexes, workFile):
+        """Runs the top level suites at indexes in a new python process,
+           returns (output, tests run, successful, errors, failures)
+           workFile is a path for the worker to keep its files at"""
+        with open(workFile + '.in', 'wb') as workerIn:
+            pickle.dump((sys.path, self, indexes), workerIn)
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+            + [ path for path in [env.get('PYTHONPATH')] if path ] )
+        process = subprocess.run(
+            [ sys.executable, '-c', PythonTestWorker.COMMAND,
+              workFile + '.in', workFile + '.out' ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=env )
+        output = process.stdout.decode('utf-8', 'replace')
+        if process.returncode != 0 or not os.path.exists(workFile + '.out'):
+            raise RuntimeError(
+                "Test worker exited with %d:\n%s" % (
+                    process.returncode, output ) )
+        with open(workFile + '.out', 'rb') as workerOut:
+            return (output,) + pickle.load(workerOut)
+
+    @staticmethod
+    def main():
+        with open(sys.argv[1], 'rb') as workerIn:
+            path, worker, indexes = pickle.load(workerIn)
+        sys.path[:] = path + [ x for x in sys.path if x not in path ]
+        sys.stderr = sys.stdout
+        results = worker.run(indexes)
+        sys.stdout.flush()
+        with open(sys.argv[2], 'wb') as workerOut:
+            pickle.dump(results, workerOut)
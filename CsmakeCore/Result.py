@@ -139,6 +139,14 @@ class Result:
     def skipped(self):
         self.params['status'] = 'Skipped'
 
+    def cached(self):
+        #The step's outputs were restored from the step cache
+        self.params['cached'] = True
+        self.skipped()
+
+    def wasCached(self):
+        return 'cached' in self.params and self.params['cached']
+
     def executing(self):
         self.params['status'] = 'Executing'
 
@@ -148,6 +156,14 @@ class Result:
         except:
             pass
 
+    def release(self):
+        """Called when the output of a finished result
+           won't be repeated"""
+        try:
+            OutputTee.OutputTee.releaseResult(self)
+        except:
+            pass
+
     def err(self):
         result = self.params['Err']
         result.flush()
@@ -270,7 +286,7 @@ class Result:
         try:
             actualResult = OutputTee.OutputTee.getResult(self)
             if actualResult is not None:
-                fobj.write(actualResult.decode("utf8"))
+                fobj.write(actualResult.decode("utf8", "replace"))
         except:
             self.exception("Failed to get output")
         return None
@@ -0,0 +1,56 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+
+class SectionIndex:
+    """Indexes the sections of a build specification by id so that steps
+       and the aspects that cut them can be found without scanning
+       every section in the specification.
+
+       Sections are added in specification order, the first section
+       with a given id is the one a step by that id resolves to.
+       Sections are never removed from a specification, so sections that
+       have already been indexed are ignored when they are seen again."""
+
+    def __init__(self):
+        self.indexed = set()
+        self.sectionsById = {}
+        self.aspectsByCut = {}
+
+    def add(self, sections):
+        """Indexes any of the given sections not already indexed"""
+        for section in sections:
+            if section in self.indexed:
+                continue
+            self.indexed.add(section)
+            parts = section.split('@')
+            if len(parts) != 2:
+                continue
+            if section[0] == '&':
+                cuts = parts[1].split(' ')[0]
+                if cuts not in self.aspectsByCut:
+                    self.aspectsByCut[cuts] = []
+                self.aspectsByCut[cuts].append(section)
+            elif parts[1] not in self.sectionsById:
+                self.sectionsById[parts[1]] = section
+
+    def lookupSection(self, stepId):
+        """Returns the section for the step id, or None"""
+        return self.sectionsById.get(stepId)
+
+    def lookupAspects(self, stepId):
+        """Returns the list of aspect sections that cut the step id"""
+        return list(self.aspectsByCut.get(stepId, []))
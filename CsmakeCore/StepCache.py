@@ -0,0 +1,239 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import copy
+import hashlib
+import inspect
+import json
+import os
+import os.path
+import shutil
+import tempfile
+import threading
+
+from CsmakeCore.Environment import ProtectedString
+from CsmakeCore.FileManager import FileManager
+
+class StepCache:
+    """A build-wide, content addressed cache of step results.
+
+       A step's key is a digest of its (substituted) options, the contents
+       of the files it consumes through **files and **maps, and the source of
+       the module that implements it.  When a step with the same key passed
+       before, the files it declared as outputs (the results of its **maps
+       and its **yields-files) are restored from the cache instead of
+       executing the step.
+
+       Only steps that declare outputs and have no aspects are cached.
+       A section may opt out with **cache=False, and a module may opt out
+       by setting STEP_CACHEABLE = False on its class.
+
+       Layout of the cache directory:
+           objects/<xx>/<sha256> - file contents
+           steps/<key>.json      - manifest of outputs for a step key"""
+
+    BLOCK_SIZE=1024*1024
+
+    def __init__(self, cacheDir, version):
+        self.cacheDir = os.path.abspath(cacheDir)
+        self.objectsDir = os.path.join(self.cacheDir, 'objects')
+        self.stepsDir = os.path.join(self.cacheDir, 'steps')
+        self.version = version
+        self.sourceDigests = {}
+        self.lock = threading.Lock()
+        for directory in [self.objectsDir, self.stepsDir]:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+
+    def _fileDigest(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as fileobj:
+            while True:
+                block = fileobj.read(StepCache.BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _walkFiles(self, path):
+        #Returns the list of files represented by path
+        if os.path.isdir(path):
+            result = []
+            for base, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    result.append(os.path.join(base, name))
+            return result
+        return [path]
+
+    def _moduleSourceDigest(self, module):
+        digests = []
+        for cls in type(module).__mro__:
+            if cls is object:
+                continue
+            try:
+                sourceFile = inspect.getfile(cls)
+            except TypeError:
+                continue
+            self.lock.acquire()
+            try:
+                if sourceFile not in self.sourceDigests:
+                    self.sourceDigests[sourceFile] = self._fileDigest(sourceFile)
+                digests.append(self.sourceDigests[sourceFile])
+            finally:
+                self.lock.release()
+        return digests
+
+    def _inputLocations(self, module):
+        locations = []
+        if module.newfiles is not None:
+            for instance in module.newfiles:
+                locations.append(instance.index['location'])
+        if module.mapping is not None:
+            for froms, tos in module.mapping.iterfiles():
+                locations.extend(froms)
+        return sorted(set(locations))
+
+    def _outputLocations(self, module):
+        #Returns the outputs the module declared, if a declaration
+        #  cannot be resolved to a location, None is returned
+        locations = []
+        if module.mapping is not None:
+            for froms, tos in module.mapping.iterfiles():
+                locations.extend(tos)
+        if module.yieldsfiles is not None:
+            for yieldsfile in module.yieldsfiles:
+                spec = copy.copy(yieldsfile)
+                if 'location' not in spec or not spec['location']:
+                    return None
+                FileManager.fixupLocationWithBase(
+                    module.env.env['RESULTS'],
+                    spec['location'],
+                    spec )
+                if 'useRE' in spec and spec['useRE']:
+                    found = FileManager.findDiskFilesMatchingRegex(
+                        spec['location'] )
+                else:
+                    found = FileManager.findDiskFilesMatchingStarred(
+                        spec['location'] )
+                locations.extend(found)
+        return sorted(set(locations))
+
+    def isCacheable(self, module, stepdict):
+        if not getattr(module.__class__, 'STEP_CACHEABLE', True):
+            return False
+        if '**cache' in stepdict \
+            and stepdict['**cache'].strip().lower() in ['false', 'no', '0']:
+            return False
+        if len(module.aspects) != 0:
+            return False
+        return module.yieldsfiles is not None \
+            or (module.mapping is not None and len(module.mapping) > 0)
+
+    def stepKey(self, module, section, phase, stepdict):
+        """Returns the cache key for the step or None if the step cannot
+           be cached"""
+        if not self.isCacheable(module, stepdict):
+            return None
+        digest = hashlib.sha256()
+        options = {}
+        for key, value in stepdict.items():
+            if isinstance(value, ProtectedString):
+                value = value._raw()
+            options[key] = str(value)
+        inputs = []
+        try:
+            for location in self._inputLocations(module):
+                for path in self._walkFiles(location):
+                    inputs.append((path, self._fileDigest(path)))
+            sources = self._moduleSourceDigest(module)
+        except (IOError, OSError) as e:
+            module.log.devdebug("Step cannot be cached: %s", str(e))
+            return None
+        digest.update(json.dumps([
+            self.version,
+            section,
+            phase,
+            options,
+            inputs,
+            sources ], sort_keys=True).encode('utf8'))
+        return digest.hexdigest()
+
+    def _manifestPath(self, key):
+        return os.path.join(self.stepsDir, "%s.json" % key)
+
+    def _objectPath(self, digest):
+        return os.path.join(self.objectsDir, digest[:2], digest)
+
+    def restore(self, key, module):
+        """Puts the outputs recorded for key back in place.
+           Returns True if the step's outputs were restored"""
+        try:
+            with open(self._manifestPath(key)) as manifestFile:
+                manifest = json.load(manifestFile)
+        except (IOError, OSError, ValueError):
+            return False
+        outputs = manifest['outputs']
+        for output in outputs:
+            if not os.path.isfile(self._objectPath(output['digest'])):
+                module.log.info(
+                    "Step cache entry %s is missing content for '%s'",
+                    key,
+                    output['location'] )
+                return False
+        for output in outputs:
+            location = output['location']
+            module._ensureDirectoryExists(location)
+            if os.path.lexists(location):
+                os.remove(location)
+            shutil.copyfile(self._objectPath(output['digest']), location)
+            os.chmod(location, output['mode'])
+        return True
+
+    def store(self, key, module):
+        """Records the outputs of a step that passed for key"""
+        locations = self._outputLocations(module)
+        if locations is None:
+            return False
+        outputs = []
+        for location in locations:
+            for path in self._walkFiles(location):
+                if not os.path.isfile(path):
+                    module.log.devdebug(
+                        "Step output '%s' is missing, not caching", path)
+                    return False
+                digest = self._fileDigest(path)
+                objectPath = self._objectPath(digest)
+                if not os.path.exists(objectPath):
+                    module._ensureDirectoryExists(objectPath)
+                    fd, temp = tempfile.mkstemp(
+                        dir=os.path.dirname(objectPath))
+                    os.close(fd)
+                    shutil.copyfile(path, temp)
+                    os.rename(temp, objectPath)
+                outputs.append({
+                    'location' : path,
+                    'digest' : digest,
+                    'mode' : os.stat(path).st_mode & 0o7777 })
+        if len(outputs) == 0:
+            return False
+        fd, temp = tempfile.mkstemp(dir=self.stepsDir)
+        with os.fdopen(fd, 'w') as manifestFile:
+            json.dump({
+                'section' : module.calledId,
+                'outputs' : outputs }, manifestFile, indent=1)
+        os.rename(temp, self._manifestPath(key))
+        return True
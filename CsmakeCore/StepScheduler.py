@@ -0,0 +1,255 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import collections
+import threading
+
+class StepWorker(threading.Thread):
+    """A pooled thread that launches steps on behalf of the thread that
+       scheduled them.  ParallelLaunchStack finds the stack of the
+       scheduling thread through parent(), so the worker takes on the
+       parent of whatever task it is currently running."""
+
+    def __init__(self, scheduler, number):
+        threading.Thread.__init__(
+            self,
+            name="csmake-step-worker-%d" % number )
+        self.daemon = True
+        self.scheduler = scheduler
+        self._parent = None
+
+    def parent(self):
+        return self._parent
+
+    def run(self):
+        while True:
+            task = self.scheduler._nextTask(self)
+            if task is None:
+                return
+            self._parent = task.parent
+            try:
+                task.execute()
+            finally:
+                self._parent = None
+                self.scheduler._workerDone()
+
+class StepTask:
+    QUEUED = 0
+    RUNNING = 1
+    DONE = 2
+
+    def __init__(self, graphRun, index, step):
+        self.graphRun = graphRun
+        self.index = index
+        self.step = step
+        self.parent = threading.currentThread()
+        self.state = StepTask.QUEUED
+        self.result = None
+
+    def execute(self):
+        result = None
+        try:
+            result = self.graphRun.launch(self.step)
+        finally:
+            self.graphRun.scheduler._taskDone(self, result)
+
+class StepGraphRun:
+    """Tracks the execution of a single dependency graph.
+       The thread that calls StepScheduler.runGraph drives the graph,
+       handing ready steps to the pool.  A worker driving a nested graph
+       (a command section inside a command section) lends its place in
+       the pool while it waits, so nested graphs cannot starve the pool.
+
+       The driving thread only runs a step itself when it is the only
+       step of the graph that can run, steps started by the pool find
+       their parent's launch stack through the driving thread, so it must
+       not be in the middle of another step while they run."""
+
+    def __init__(self, scheduler, launch):
+        self.scheduler = scheduler
+        self.launch = launch
+        self.queued = []
+        self.completed = collections.deque()
+        self.outstanding = 0
+
+class StepScheduler:
+    """Runs the steps of command sections on a fixed size pool of threads.
+
+       A graph is given as a list of step names and, for each step, the
+       set of indexes of the steps it depends on.  A step is started as
+       soon as every step it depends on has completed."""
+
+    def __init__(self, jobs):
+        if jobs < 1:
+            raise ValueError("The number of jobs must be at least 1")
+        self.jobs = jobs
+        self.condition = threading.Condition()
+        self.queue = collections.deque()
+        self.workers = []
+        self.busy = 0
+        self.blocked = 0
+        self.workerCount = 0
+        self.shuttingDown = False
+
+    def _startWorkers(self):
+        #Workers are started the first time a step is handed to the pool
+        #  Workers waiting on a nested graph don't count against the jobs
+        while len(self.workers) < self.jobs + self.blocked:
+            worker = StepWorker(self, self.workerCount)
+            self.workerCount += 1
+            self.workers.append(worker)
+            worker.start()
+
+    def _nextTask(self, worker):
+        self.condition.acquire()
+        try:
+            while True:
+                while len(self.queue) == 0 and not self.shuttingDown:
+                    if len(self.workers) > self.jobs + self.blocked:
+                        #A worker that was lent to the pool is no
+                        #  longer needed
+                        self.workers.remove(worker)
+                        return None
+                    self.condition.wait()
+                if self.shuttingDown:
+                    return None
+                task = self.queue.popleft()
+                #The scheduling thread may have already claimed the task
+                if task.state == StepTask.QUEUED:
+                    task.state = StepTask.RUNNING
+                    task.graphRun.queued.remove(task)
+                    self.busy += 1
+                    #A graph waiting on a saturated pool may now need
+                    #  to run its own steps
+                    self.condition.notify_all()
+                    return task
+        finally:
+            self.condition.release()
+
+    def _workerDone(self):
+        self.condition.acquire()
+        try:
+            self.busy -= 1
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def _taskDone(self, task, result):
+        self.condition.acquire()
+        try:
+            task.state = StepTask.DONE
+            task.result = result
+            task.graphRun.completed.append(task)
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def shutdown(self):
+        self.condition.acquire()
+        try:
+            self.shuttingDown = True
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def runGraph(self, steps, dependencies, launch, failed, keepGoing=False):
+        """Executes the graph, steps is a list of step names,
+           dependencies is a list of sets of indexes into steps.
+           launch(step) is called to run a step and returns its result,
+           failed(step, result) is called to determine whether the step
+           failed - it may also log the failure.
+           Steps are started in the order given when multiple steps
+           become ready at the same time.
+           When keepGoing is False, no further steps are started after the
+           first failure.
+           Returns a list of the results indexed like steps, None for any
+           step that was not run, and whether any step failed"""
+        count = len(steps)
+        results = [None] * count
+        waitingOn = [ len(deps) for deps in dependencies ]
+        dependents = [ [] for x in range(count) ]
+        for index, deps in enumerate(dependencies):
+            for dependency in deps:
+                dependents[dependency].append(index)
+        ready = [ index for index in range(count) if waitingOn[index] == 0 ]
+        graphRun = StepGraphRun(self, launch)
+        isWorker = isinstance(threading.currentThread(), StepWorker)
+        failure = False
+
+        while True:
+            inlineTask = None
+            self.condition.acquire()
+            try:
+                if not failure or keepGoing:
+                    if len(ready) == 1 and graphRun.outstanding == 0:
+                        #Nothing else can run alongside this step
+                        #  just do the step here
+                        inlineTask = StepTask(graphRun, ready[0], steps[ready[0]])
+                        inlineTask.state = StepTask.RUNNING
+                        graphRun.outstanding += 1
+                    else:
+                        for index in ready:
+                            task = StepTask(graphRun, index, steps[index])
+                            graphRun.queued.append(task)
+                            graphRun.outstanding += 1
+                            self.queue.append(task)
+                        if len(ready) > 0:
+                            self._startWorkers()
+                            self.condition.notify_all()
+                    ready = []
+                else:
+                    #Steps that haven't been picked up yet are not started
+                    for task in graphRun.queued:
+                        task.state = StepTask.DONE
+                        graphRun.outstanding -= 1
+                    graphRun.queued = []
+                if graphRun.outstanding == 0:
+                    break
+                if inlineTask is None and len(graphRun.completed) == 0:
+                    if isWorker:
+                        self.blocked += 1
+                        if len(graphRun.queued) > 0:
+                            self._startWorkers()
+                    try:
+                        self.condition.wait()
+                    finally:
+                        if isWorker:
+                            self.blocked -= 1
+            finally:
+                self.condition.release()
+
+            if inlineTask is not None:
+                inlineTask.execute()
+
+            self.condition.acquire()
+            try:
+                completed = list(graphRun.completed)
+                graphRun.completed.clear()
+                graphRun.outstanding -= len(completed)
+            finally:
+                self.condition.release()
+
+            for task in completed:
+                results[task.index] = task.result
+                if failed(task.step, task.result):
+                    failure = True
+                for dependent in dependents[task.index]:
+                    waitingOn[dependent] -= 1
+                    if waitingOn[dependent] == 0:
+                        ready.append(dependent)
+            ready.sort()
+
+        return results, failure
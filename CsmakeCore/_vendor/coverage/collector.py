@@ -12,6 +12,7 @@ from CsmakeCore._vendor.coverage.debug import short_stack
 from CsmakeCore._vendor.coverage.disposition import FileDisposition
 from CsmakeCore._vendor.coverage.misc import CoverageException, isolate_module
 from CsmakeCore._vendor.coverage.pytracer import PyTracer
+from CsmakeCore._vendor.coverage.sysmontracer import SysMonitorTracer
 
 os = isolate_module(os)
 
@@ -150,9 +151,18 @@ class Collector(object):
             # Being timid: use the simple Python trace function.
             self._trace_class = PyTracer
         else:
-            # Being fast: use the C Tracer if it is available, else the Python
-            # trace function.
+            # Being fast: use the C Tracer if it is available, else the
+            # sys.monitoring tracer if the interpreter has it, else the Python
+            # trace function.  The sys.monitoring tracer can't switch dynamic
+            # contexts or follow greenlets.
             self._trace_class = CTracer or PyTracer
+            if (self._trace_class is PyTracer and SysMonitorTracer.available()
+                    and not self.concur_id_func and not self.should_start_context):
+                self._trace_class = SysMonitorTracer
+
+        # Tracers that trace every thread themselves don't need to be started
+        # on each new thread.
+        self._thread_tracers = not getattr(self._trace_class, 'traces_all_threads', False)
 
         if self._trace_class is CTracer:
             self.file_disposition_class = CFileDisposition
@@ -323,7 +333,7 @@ class Collector(object):
 
         # Install our installation tracer in threading, to jump-start other
         # threads.
-        if self.threading:
+        if self.threading and self._thread_tracers:
             self.threading.settrace(self._installation_trace)
 
     def stop(self):
@@ -361,10 +371,11 @@ class Collector(object):
         """Resume tracing after a `pause`."""
         for tracer in self.tracers:
             tracer.start()
-        if self.threading:
-            self.threading.settrace(self._installation_trace)
-        else:
-            self._start_tracer()
+        if self._thread_tracers:
+            if self.threading:
+                self.threading.settrace(self._installation_trace)
+            else:
+                self._start_tracer()
 
     def _activity(self):
         """Has any activity been traced?
@@ -384,6 +395,10 @@ class Collector(object):
         else:
             context = new_context
         self.covdata.set_context(context)
+        # Tracers that stop reporting what they've seen must see it again.
+        for tracer in self.tracers:
+            if hasattr(tracer, 'restart_events'):
+                tracer.restart_events()
 
     def disable_plugin(self, disposition):
         """Disable the plugin mentioned in `disposition`."""
@@ -207,6 +207,7 @@ class CoverageConfig(object):
         self.report_omit = None
         self.partial_always_list = DEFAULT_PARTIAL_ALWAYS[:]
         self.partial_list = DEFAULT_PARTIAL[:]
+        self.parse_cache = None
         self.precision = 0
         self.report_contexts = None
         self.show_missing = False
@@ -374,6 +375,7 @@ class CoverageConfig(object):
         ('ignore_errors', 'report:ignore_errors', 'boolean'),
         ('partial_always_list', 'report:partial_branches_always', 'regexlist'),
         ('partial_list', 'report:partial_branches', 'regexlist'),
+        ('parse_cache', 'report:parse_cache'),
         ('precision', 'report:precision', 'int'),
         ('report_contexts', 'report:contexts', 'list'),
         ('report_include', 'report:include', 'list'),
@@ -486,6 +488,8 @@ class CoverageConfig(object):
         self.data_file = self.post_process_file(self.data_file)
         self.html_dir = self.post_process_file(self.html_dir)
         self.xml_output = self.post_process_file(self.xml_output)
+        if self.parse_cache:
+            self.parse_cache = self.post_process_file(self.parse_cache)
         self.paths = collections.OrderedDict(
             (k, [self.post_process_file(f) for f in v])
             for k, v in self.paths.items()
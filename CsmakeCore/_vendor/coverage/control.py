@@ -225,6 +225,11 @@ class Coverage(object):
         self._debug = None
         self._file_mapper = None
 
+        # Analyses and file reporters of the current data, so that several
+        # reports made one after another analyze each file only once.
+        self._analyses = {}
+        self._file_reporters = {}
+
         # State machine variables:
         # Have we initialized everything?
         self._inited = False
@@ -424,6 +429,7 @@ class Coverage(object):
         self._post_init()
         if not should_skip:
             self._data.read()
+        self._forget_analyses()
 
     def _init_for_start(self):
         """Initialization for start()"""
@@ -546,6 +552,7 @@ class Coverage(object):
         if self._auto_load:
             self.load()
 
+        self._forget_analyses()
         self._collector.start()
         self._started = True
         self._instances.append(self)
@@ -583,6 +590,7 @@ class Coverage(object):
         self._data.erase(parallel=self.config.parallel)
         self._data = None
         self._inited_for_start = False
+        self._forget_analyses()
 
     def switch_context(self, new_context):
         """Switch to a new dynamic context.
@@ -705,6 +713,7 @@ class Coverage(object):
             strict=strict,
             keep=keep,
         )
+        self._forget_analyses()
 
     def get_data(self):
         """Get the collected data.
@@ -725,10 +734,16 @@ class Coverage(object):
                 self._collector.plugin_was_disabled(plugin)
 
         if self._collector and self._collector.flush_data():
+            self._forget_analyses()
             self._post_save_work()
 
         return self._data
 
+    def _forget_analyses(self):
+        """Forget the analyses of data that has changed."""
+        self._analyses = {}
+        self._file_reporters = {}
+
     def _post_save_work(self):
         """After saving data, look for warnings, post-work, etc.
 
@@ -805,10 +820,22 @@ class Coverage(object):
         if not isinstance(it, FileReporter):
             it = self._get_file_reporter(it)
 
-        return Analysis(data, it, self._file_mapper)
+        # The contexts being queried change the data the analysis sees.
+        contexts = data._query_context_ids
+        if contexts is not None:
+            contexts = tuple(contexts)
+        key = (it.filename, contexts)
+        analysis = self._analyses.get(key)
+        if analysis is None or analysis.file_reporter is not it:
+            analysis = Analysis(data, it, self._file_mapper)
+            self._analyses[key] = analysis
+        return analysis
 
     def _get_file_reporter(self, morf):
         """Get a FileReporter for a module or file name."""
+        if isinstance(morf, string_class) and morf in self._file_reporters:
+            return self._file_reporters[morf]
+
         plugin = None
         file_reporter = "python"
 
@@ -830,6 +857,8 @@ class Coverage(object):
         if file_reporter == "python":
             file_reporter = PythonFileReporter(morf, self)
 
+        if isinstance(morf, string_class):
+            self._file_reporters[morf] = file_reporter
         return file_reporter
 
     def _get_file_reporters(self, morfs=None):
@@ -993,6 +1022,24 @@ class Coverage(object):
         ):
             return render_report(self.config.xml_output, XmlReporter(self), morfs)
 
+    def xml_class_attributes(
+        self, morfs=None, ignore_errors=None, omit=None, include=None,
+        contexts=None, skip_empty=None,
+    ):
+        """Get the attributes of the "class" elements of an XML report.
+
+        Returns a list of dicts, one for each file, in the order the XML
+        report lists them, without writing the report.
+
+        See :meth:`xml_report` for the arguments.
+
+        """
+        with override_config(self,
+            ignore_errors=ignore_errors, report_omit=omit, report_include=include,
+            report_contexts=contexts, skip_empty=skip_empty,
+        ):
+            return XmlReporter(self).class_attributes(morfs)
+
     def json_report(
         self, morfs=None, outfile=None, ignore_errors=None,
         omit=None, include=None, contexts=None, pretty_print=None,
@@ -96,6 +96,7 @@ def combine_parallel_data(data, aliases=None, data_paths=None, strict=False, kee
         raise CoverageException("No data to combine")
 
     files_combined = 0
+    combined_files = []
     for f in files_to_combine:
         if f == data.data_filename():
             # Sometimes we are combining into a file which is one of the
@@ -116,10 +117,16 @@ def combine_parallel_data(data, aliases=None, data_paths=None, strict=False, kee
         else:
             data.update(new_data, aliases=aliases)
             files_combined += 1
-            if not keep:
-                if data._debug.should('dataio'):
-                    data._debug.write("Deleting combined data file %r" % (f,))
-                file_be_gone(f)
+            combined_files.append(f)
+
+    if combined_files and not keep:
+        # The combined data may only be in memory: it has to be in the data
+        # file before the files it came from are deleted.
+        data.write()
+        for f in combined_files:
+            if data._debug.should('dataio'):
+                data._debug.write("Deleting combined data file %r" % (f,))
+            file_be_gone(f)
 
     if strict and not files_combined:
         raise CoverageException("No usable data files")
@@ -206,8 +206,8 @@ class HtmlReporter(object):
             'len': len,
 
             # Constants for this report.
-            '__url__': coverage.__url__,
-            '__version__': coverage.__version__,
+            '__url__': CsmakeCore._vendor.coverage.__url__,
+            '__version__': CsmakeCore._vendor.coverage.__version__,
             'title': title,
             'time_stamp': format_local_datetime(datetime.datetime.now()),
             'extra_css': self.extra_css,
@@ -427,7 +427,7 @@ class IncrementalChecker(object):
             usable = True
             if status['format'] != self.STATUS_FORMAT:
                 usable = False
-            elif status['version'] != coverage.__version__:
+            elif status['version'] != CsmakeCore._vendor.coverage.__version__:
                 usable = False
 
         if usable:
@@ -449,7 +449,7 @@ class IncrementalChecker(object):
 
         status = {
             'format': self.STATUS_FORMAT,
-            'version': coverage.__version__,
+            'version': CsmakeCore._vendor.coverage.__version__,
             'globals': self.globals,
             'files': files,
         }
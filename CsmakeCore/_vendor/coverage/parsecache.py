@@ -0,0 +1,69 @@
+# Licensed under the Apache License: http://www.apache.org/licenses/LICENSE-2.0
+# For details: https://github.com/nedbat/coveragepy/blob/master/NOTICE.txt
+
+"""An on-disk cache of the static analysis of Python source for coverage.py."""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+from CsmakeCore._vendor.coverage.misc import ensure_dir, isolate_module
+from CsmakeCore._vendor.coverage.version import __version__
+
+os = isolate_module(os)
+
+# Change this when what is kept for a file changes.
+CACHE_VERSION = 1
+
+
+class ParseCache(object):
+    """Keeps the results of `PythonParser` in a directory.
+
+    The results are keyed by the source text, the exclusion regex, and the
+    versions of coverage.py and Python, so a file that hasn't changed isn't
+    tokenized, compiled or analyzed again, wherever it is.
+
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, text, exclude):
+        """The file the results for `text` parsed with `exclude` are kept in."""
+        hasher = hashlib.sha256()
+        hasher.update(repr((
+            CACHE_VERSION, __version__, sys.implementation.name,
+            sys.version_info, exclude,
+        )).encode("utf8"))
+        hasher.update(text.encode("utf8", "surrogatepass"))
+        return os.path.join(self.directory, hasher.hexdigest() + ".json")
+
+    def load(self, text, exclude):
+        """Get the results kept for `text`, or None if there aren't any."""
+        try:
+            with open(self._path(text, exclude)) as cached:
+                return json.load(cached)
+        except (IOError, ValueError):
+            return None
+
+    def save(self, text, exclude, results):
+        """Keep the `results` for `text`.
+
+        The file is replaced in one step, so readers never see part of it.
+        A cache that can't be written to is only slower.
+
+        """
+        try:
+            ensure_dir(self.directory)
+            fd, temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as cached:
+                    json.dump(results, cached)
+                os.replace(temp, self._path(text, exclude))
+            except Exception:
+                os.remove(temp)
+                raise
+        except (IOError, OSError):
+            pass
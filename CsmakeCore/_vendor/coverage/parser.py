@@ -28,12 +28,15 @@ class PythonParser(object):
 
     """
     @contract(text='unicode|None')
-    def __init__(self, text=None, filename=None, exclude=None):
+    def __init__(self, text=None, filename=None, exclude=None, cache=None):
         """
         Source can be provided as `text`, the text itself, or `filename`, from
         which the text will be read.  Excluded lines are those that match
         `exclude`, a regex.
 
+        `cache` is an optional `ParseCache` the results are kept in, and
+        taken from when the same text was parsed before.
+
         """
         assert text or filename, "PythonParser needs either text or filename"
         self.filename = filename or "<code>"
@@ -48,6 +51,7 @@ class PythonParser(object):
                 )
 
         self.exclude = exclude
+        self.cache = cache
 
         # The text lines of the parsed code.
         self.lines = self.text.split('\n')
@@ -243,6 +247,12 @@ class PythonParser(object):
         line of multi-line statements.
 
         """
+        if self.cache is not None:
+            results = self.cache.load(self.text, self.exclude)
+            if results is not None:
+                self._use_cached(results)
+                return
+
         try:
             self._raw_parse()
         except (tokenize.TokenError, IndentationError) as err:
@@ -262,6 +272,44 @@ class PythonParser(object):
         starts = self.raw_statements - ignore
         self.statements = self.first_lines(starts) - ignore
 
+        if self.cache is not None:
+            self._save_cached()
+
+    def _use_cached(self, results):
+        """Take the results of parsing from what the cache kept."""
+        self.statements = set(results["statements"])
+        self.excluded = set(results["excluded"])
+        self.raw_statements = set(results["raw_statements"])
+        self.raw_classdefs = set(results["raw_classdefs"])
+        self._multiline = {l: first for l, first in results["multiline"]}
+        if results["arcs"] is not None:
+            self._all_arcs = {tuple(arc) for arc in results["arcs"]}
+            self._missing_arc_fragments = collections.defaultdict(list)
+            for start, end, fragments in results["fragments"]:
+                self._missing_arc_fragments[(start, end)] = [
+                    tuple(fragment) for fragment in fragments
+                ]
+
+    def _save_cached(self):
+        """Give the results of parsing to the cache to keep."""
+        results = {
+            "statements": sorted(self.statements),
+            "excluded": sorted(self.excluded),
+            "raw_statements": sorted(self.raw_statements),
+            "raw_classdefs": sorted(self.raw_classdefs),
+            "multiline": sorted(self._multiline.items()),
+            "arcs": None,
+            "fragments": None,
+        }
+        if self._all_arcs is not None:
+            results["arcs"] = sorted(self._all_arcs)
+            results["fragments"] = [
+                [start, end, fragments]
+                for (start, end), fragments
+                in sorted(self._missing_arc_fragments.items())
+            ]
+        self.cache.save(self.text, self.exclude, results)
+
     def arcs(self):
         """Get information about the arcs available in the code.
 
@@ -291,6 +339,9 @@ class PythonParser(object):
 
         self._missing_arc_fragments = aaa.missing_arc_fragments
 
+        if self.cache is not None:
+            self._save_cached()
+
     def exit_counts(self):
         """Get a count of exits from that each line.
 
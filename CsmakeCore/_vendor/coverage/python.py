@@ -10,6 +10,7 @@ import zipimport
 from CsmakeCore._vendor.coverage import env, files
 from CsmakeCore._vendor.coverage.misc import contract, expensive, isolate_module, join_regex
 from CsmakeCore._vendor.coverage.misc import CoverageException, NoSource
+from CsmakeCore._vendor.coverage.parsecache import ParseCache
 from CsmakeCore._vendor.coverage.parser import PythonParser
 from CsmakeCore._vendor.coverage.phystokens import source_token_lines, source_encoding
 from CsmakeCore._vendor.coverage.plugin import FileReporter
@@ -179,9 +180,13 @@ class PythonFileReporter(FileReporter):
     def parser(self):
         """Lazily create a :class:`PythonParser`."""
         if self._parser is None:
+            cache = None
+            if self.coverage.config.parse_cache:
+                cache = ParseCache(self.coverage.config.parse_cache)
             self._parser = PythonParser(
                 filename=self.filename,
                 exclude=self.coverage._exclude_regex('exclude'),
+                cache=cache,
             )
             self._parser.parse_source()
         return self._parser
@@ -14,6 +14,7 @@ import os
 import re
 import sqlite3
 import sys
+import tempfile
 import zlib
 
 from CsmakeCore._vendor.coverage import env
@@ -170,7 +171,10 @@ class CoverageData(SimpleReprMixin):
     To add a source file without any measured data, use :meth:`touch_file`,
     or :meth:`touch_files` for a list of such files.
 
-    Write the data to its file with :meth:`write`.
+    Write the data to its file with :meth:`write`.  New data is collected in
+    an in-memory database, which :meth:`write` copies to the data file in one
+    step, so it isn't on disk until it has been written.  Data read from an
+    existing data file is used where it is.
 
     You can clear the data in memory with :meth:`erase`.  Two data collections
     can be combined by using :meth:`update` on one :class:`CoverageData`,
@@ -204,8 +208,11 @@ class CoverageData(SimpleReprMixin):
 
         self._choose_filename()
         self._file_map = {}
+        self._context_map = {}
         # Maps thread ids to SqliteDb objects.
         self._dbs = {}
+        # The in-memory SqliteDb new data is collected in, for all threads.
+        self._memory_db = None
         self._pid = os.getpid()
 
         # Are we in sync with the data file?
@@ -234,7 +241,11 @@ class CoverageData(SimpleReprMixin):
             for db in self._dbs.values():
                 db.close()
         self._dbs = {}
+        if self._memory_db is not None:
+            self._memory_db.close(force=True)
+        self._memory_db = None
         self._file_map = {}
+        self._context_map = {}
         self._have_used = False
         self._current_context_id = None
 
@@ -245,7 +256,11 @@ class CoverageData(SimpleReprMixin):
         """
         if self._debug.should('dataio'):
             self._debug.write("Creating data file {!r}".format(self._filename))
-        self._dbs[get_thread_id()] = db = SqliteDb(self._filename, self._debug)
+        if self._no_disk or hasattr(sqlite3.Connection, 'backup'):
+            # Collect in memory, until write() copies it all to the file.
+            self._memory_db = db = SqliteDb(":memory:", self._debug)
+        else:
+            self._dbs[get_thread_id()] = db = SqliteDb(self._filename, self._debug)
         with db:
             db.executescript(SCHEMA)
             db.execute("insert into coverage_schema (version) values (?)", (SCHEMA_VERSION,))
@@ -267,7 +282,7 @@ class CoverageData(SimpleReprMixin):
 
     def _read_db(self):
         """Read the metadata from a database so that we are ready to use it."""
-        with self._dbs[get_thread_id()] as db:
+        with self._connect() as db:
             try:
                 schema_version, = db.execute_one("select version from coverage_schema")
             except Exception as exc:
@@ -291,17 +306,25 @@ class CoverageData(SimpleReprMixin):
             for path, file_id in db.execute("select path, id from file"):
                 self._file_map[path] = file_id
 
+            for context, context_id in db.execute("select context, id from context"):
+                self._context_map[context] = context_id
+
     def _connect(self):
         """Get the SqliteDb object to use."""
+        if self._memory_db is not None:
+            return self._memory_db
         if get_thread_id() not in self._dbs:
             if os.path.exists(self._filename):
                 self._open_db()
             else:
                 self._create_db()
+        if self._memory_db is not None:
+            return self._memory_db
         return self._dbs[get_thread_id()]
 
     def __nonzero__(self):
-        if (get_thread_id() not in self._dbs and not os.path.exists(self._filename)):
+        if (self._memory_db is None and get_thread_id() not in self._dbs
+                and not os.path.exists(self._filename)):
             return False
         try:
             with self._connect() as con:
@@ -370,16 +393,29 @@ class CoverageData(SimpleReprMixin):
                     self._file_map[filename] = cur.lastrowid
         return self._file_map.get(filename)
 
+    def _add_file_ids(self, filenames):
+        """Make sure all of `filenames` have file ids, adding them in one batch."""
+        new_files = [filename for filename in filenames if filename not in self._file_map]
+        if new_files:
+            with self._connect() as con:
+                con.executemany(
+                    "insert or ignore into file (path) values (?)",
+                    ((filename,) for filename in new_files)
+                )
+                for path, file_id in con.execute("select path, id from file"):
+                    self._file_map[path] = file_id
+
     def _context_id(self, context):
         """Get the id for a context."""
         assert context is not None
         self._start_using()
-        with self._connect() as con:
-            row = con.execute_one("select id from context where context = ?", (context,))
-            if row is not None:
-                return row[0]
-            else:
-                return None
+        if context not in self._context_map:
+            with self._connect() as con:
+                row = con.execute_one("select id from context where context = ?", (context,))
+                if row is None:
+                    return None
+                self._context_map[context] = row[0]
+        return self._context_map[context]
 
     def set_context(self, context):
         """Set the current context for future :meth:`add_lines` etc.
@@ -404,7 +440,7 @@ class CoverageData(SimpleReprMixin):
         else:
             with self._connect() as con:
                 cur = con.execute("insert into context (context) values (?)", (context,))
-                self._current_context_id = cur.lastrowid
+                self._current_context_id = self._context_map[context] = cur.lastrowid
 
     def base_filename(self):
         """The base filename for storing data.
@@ -440,19 +476,23 @@ class CoverageData(SimpleReprMixin):
             return
         with self._connect() as con:
             self._set_context_id()
+            self._add_file_ids(line_data)
+            existing = dict(con.execute(
+                "select file_id, numbits from line_bits where context_id = ?",
+                (self._current_context_id,)
+            ))
+            rows = []
             for filename, linenos in iitems(line_data):
                 linemap = nums_to_numbits(linenos)
-                file_id = self._file_id(filename, add=True)
-                query = "select numbits from line_bits where file_id = ? and context_id = ?"
-                existing = list(con.execute(query, (file_id, self._current_context_id)))
-                if existing:
-                    linemap = numbits_union(linemap, existing[0][0])
-
-                con.execute(
-                    "insert or replace into line_bits "
-                    " (file_id, context_id, numbits) values (?, ?, ?)",
-                    (file_id, self._current_context_id, linemap),
-                )
+                file_id = self._file_map[filename]
+                if file_id in existing:
+                    linemap = numbits_union(linemap, existing[file_id])
+                rows.append((file_id, self._current_context_id, linemap))
+            con.executemany(
+                "insert or replace into line_bits "
+                " (file_id, context_id, numbits) values (?, ?, ?)",
+                rows,
+            )
 
     def add_arcs(self, arc_data):
         """Add measured arc data.
@@ -472,14 +512,20 @@ class CoverageData(SimpleReprMixin):
             return
         with self._connect() as con:
             self._set_context_id()
-            for filename, arcs in iitems(arc_data):
-                file_id = self._file_id(filename, add=True)
-                data = [(file_id, self._current_context_id, fromno, tono) for fromno, tono in arcs]
-                con.executemany(
-                    "insert or ignore into arc "
-                    "(file_id, context_id, fromno, tono) values (?, ?, ?, ?)",
-                    data,
-                )
+            self._add_file_ids(arc_data)
+            context_id = self._current_context_id
+            # Other threads' tracers can still be adding to the dicts, so each
+            # is copied in one step before sqlite works through the rows.
+            data = [
+                (self._file_map[filename], context_id, fromno, tono)
+                for filename, arcs in iitems(arc_data)
+                for fromno, tono in list(arcs)
+            ]
+            con.executemany(
+                "insert or ignore into arc "
+                "(file_id, context_id, fromno, tono) values (?, ?, ?, ?)",
+                data,
+            )
 
     def _choose_lines_or_arcs(self, lines=False, arcs=False):
         """Force the data file to choose between lines and arcs."""
@@ -552,8 +598,8 @@ class CoverageData(SimpleReprMixin):
             if not self._has_arcs and not self._has_lines:
                 raise CoverageException("Can't touch files in an empty CoverageData")
 
+            self._add_file_ids(filenames)
             for filename in filenames:
-                self._file_id(filename, add=True)
                 if plugin_name:
                     # Set the tracer for this file
                     self.add_file_tracers({filename: plugin_name})
@@ -579,8 +625,122 @@ class CoverageData(SimpleReprMixin):
         # contexts.
         self._start_using()
 
-        # Collector for all arcs, lines and tracers
         other_data.read()
+        if other_data._memory_db is not None or not self._update_attached(other_data, aliases):
+            self._update_rows(other_data, aliases)
+
+        # Update all internal cache data.
+        self._file_map = {}
+        self._context_map = {}
+        self._current_context_id = None
+        self._read_db()
+
+    def _update_attached(self, other_data, aliases):
+        """Update this data from the data file of `other_data`, in SQL.
+
+        The other data file is attached to our database, so the rows are
+        copied from one to the other without coming through Python, except
+        for the file paths, which are mapped through `aliases`.
+
+        Returns False, having changed nothing, if two of the other file's
+        paths map to one path, which has to be done by `_update_rows`.
+
+        """
+        with self._connect() as conn:
+            conn.execute("attach database ? as other", (other_data._filename,))
+            try:
+                files = [
+                    (file_id, aliases.map(path))
+                    for file_id, path in conn.execute("select id, path from other.file")
+                ]
+                if len(set(path for _, path in files)) != len(files):
+                    return False
+
+                # Fail if a tracer conflicts, before anything is changed.
+                tracers = {path: '' for _, path in files}
+                tracers.update(
+                    (aliases.map(path), tracer)
+                    for path, tracer in conn.execute(
+                        'select file.path, tracer from other.tracer '
+                        'inner join other.file on file.id = tracer.file_id'
+                    )
+                )
+                this_tracers = {path: '' for path, in conn.execute('select path from main.file')}
+                this_tracers.update(conn.execute(
+                    'select file.path, tracer from main.tracer '
+                    'inner join main.file on file.id = tracer.file_id'
+                ))
+                for path, other_tracer in tracers.items():
+                    this_tracer = this_tracers.get(path)
+                    if this_tracer is not None and this_tracer != other_tracer:
+                        raise CoverageException(
+                            "Conflicting file tracer name for '%s': %r vs %r" % (
+                                path, this_tracer, other_tracer
+                            )
+                        )
+
+                conn.execute("create temp table other_file (id integer primary key, path text)")
+                conn.executemany("insert into temp.other_file (id, path) values (?, ?)", files)
+                conn.execute(
+                    "insert or ignore into main.file (path) select path from temp.other_file"
+                )
+                conn.execute(
+                    "insert or ignore into main.context (context) select context from other.context"
+                )
+                # The other file's ids, as ours.
+                conn.execute(
+                    "create temp table file_ids as "
+                    "select other_file.id as other_id, file.id as id from temp.other_file "
+                    "inner join main.file on file.path = other_file.path"
+                )
+                conn.execute(
+                    "create temp table context_ids as "
+                    "select other_context.id as other_id, context.id as id "
+                    "from other.context other_context "
+                    "inner join main.context on context.context = other_context.context"
+                )
+
+                if conn.execute_one("select 1 from other.arc limit 1") is not None:
+                    self._choose_lines_or_arcs(arcs=True)
+                    conn.execute(
+                        "insert or ignore into main.arc (file_id, context_id, fromno, tono) "
+                        "select file_ids.id, context_ids.id, other_arc.fromno, other_arc.tono "
+                        "from other.arc other_arc "
+                        "inner join temp.file_ids on file_ids.other_id = other_arc.file_id "
+                        "inner join temp.context_ids on context_ids.other_id = other_arc.context_id"
+                    )
+
+                if conn.execute_one("select 1 from other.line_bits limit 1") is not None:
+                    self._choose_lines_or_arcs(lines=True)
+                    conn.execute(
+                        "insert or replace into main.line_bits (file_id, context_id, numbits) "
+                        "select file_ids.id, context_ids.id, "
+                        "numbits_union(coalesce(line_bits.numbits, x''), other_bits.numbits) "
+                        "from other.line_bits other_bits "
+                        "inner join temp.file_ids on file_ids.other_id = other_bits.file_id "
+                        "inner join temp.context_ids on context_ids.other_id = other_bits.context_id "
+                        "left join main.line_bits on line_bits.file_id = file_ids.id "
+                        "and line_bits.context_id = context_ids.id"
+                    )
+
+                conn.execute(
+                    "insert or ignore into main.tracer (file_id, tracer) "
+                    "select file_ids.id, coalesce(tracer.tracer, '') from temp.file_ids "
+                    "left join other.tracer on tracer.file_id = file_ids.other_id"
+                )
+                conn.con.commit()
+            except Exception:
+                conn.con.rollback()
+                raise
+            finally:
+                for table in ["other_file", "file_ids", "context_ids"]:
+                    conn.execute("drop table if exists temp." + table)
+                conn.execute("detach database other")
+        return True
+
+    def _update_rows(self, other_data, aliases):
+        """Update this data from `other_data`, a row at a time."""
+        # Collector for all arcs, lines and tracers
         with other_data._connect() as conn:
             # Get files data.
             cur = conn.execute('select path from file')
@@ -609,10 +769,13 @@ class CoverageData(SimpleReprMixin):
                 'inner join file on file.id = line_bits.file_id '
                 'inner join context on context.id = line_bits.context_id'
                 )
-            lines = {
-                (files[path], context): numbits
-                for (path, context, numbits) in cur
-                }
+            # Files that aliases map to one path have their lines joined.
+            lines = {}
+            for (path, context, numbits) in cur:
+                key = (files[path], context)
+                if key in lines:
+                    numbits = numbits_union(lines[key], numbits)
+                lines[key] = numbits
             cur.close()
 
             # Get tracer data.
@@ -722,10 +885,6 @@ class CoverageData(SimpleReprMixin):
                 ((file_ids[filename], tracer) for filename, tracer in tracer_map.items())
             )
 
-        # Update all internal cache data.
-        self._reset()
-        self.read()
-
     def erase(self, parallel=False):
         """Erase the data in this object.
 
@@ -748,14 +907,49 @@ class CoverageData(SimpleReprMixin):
                     self._debug.write("Erasing parallel data file {!r}".format(filename))
                 file_be_gone(filename)
 
+    def close(self):
+        """Close the connections to the database.
+
+        Data collected in memory that hasn't been written is discarded.
+
+        """
+        self._reset()
+
     def read(self):
         """Start using an existing data file."""
         with self._connect():       # TODO: doesn't look right
             self._have_used = True
 
     def write(self):
-        """Ensure the data is written to the data file."""
-        pass
+        """Ensure the data is written to the data file.
+
+        Data collected in memory is copied to the data file in one step: it's
+        written next to it, then put in its place, so the file is always
+        whole.
+
+        """
+        if self._memory_db is None or self._no_disk:
+            return
+        if self._debug.should('dataio'):
+            self._debug.write("Writing data to data file {!r}".format(self._filename))
+        # Not named like a data file, so combining won't find it.
+        fd, temp = tempfile.mkstemp(
+            dir=os.path.dirname(self._filename), prefix=".tmp-", suffix=".coverage"
+        )
+        os.close(fd)
+        try:
+            target = SqliteDb(temp, self._debug)
+            with target, self._memory_db as db:
+                db.con.backup(target.con)
+            # mkstemp makes the file private: give it the mode the data file
+            # would have had if it were created directly.
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp, 0o666 & ~umask)
+            os.replace(temp, self._filename)
+        except Exception:
+            file_be_gone(temp)
+            raise
 
     def _start_using(self):
         """Call this before using the database at all."""
@@ -1018,6 +1212,7 @@ class SqliteDb(SimpleReprMixin):
             self.debug.write("Connecting to {!r}".format(self.filename))
         self.con = sqlite3.connect(filename, check_same_thread=False)
         self.con.create_function('REGEXP', 2, _regexp)
+        self.con.create_function('numbits_union', 2, numbits_union)
 
         # This pragma makes writing faster. It disables rollbacks, but we never need them.
         # PyPy needs the .close() calls here, or sqlite gets twisted up:
@@ -1026,9 +1221,14 @@ class SqliteDb(SimpleReprMixin):
         # This pragma makes writing faster.
         self.execute("pragma synchronous=off").close()
 
-    def close(self):
-        """If needed, close the connection."""
-        if self.con is not None and self.filename != ":memory:":
+    def close(self, force=False):
+        """If needed, close the connection.
+
+        An in-memory database goes away when it's closed, so it's only closed
+        when `force` is true.
+
+        """
+        if self.con is not None and (force or self.filename != ":memory:"):
             self.con.close()
             self.con = None
 
@@ -0,0 +1,373 @@
+# Licensed under the Apache License: http://www.apache.org/licenses/LICENSE-2.0
+# For details: https://github.com/nedbat/coveragepy/blob/master/NOTICE.txt
+
+"""Raw data tracer for coverage.py using sys.monitoring (PEP 669)."""
+
+import bisect
+import dis
+import sys
+
+# sys.monitoring is only in Python 3.12 and later.
+sys_monitoring = getattr(sys, 'monitoring', None)
+
+# Don't trace ourselves when running meta-coverage.
+THIS_FILE = __file__.rstrip("co")
+
+# The name the tool id is registered with.
+TOOL_NAME = "coverage.py SysMonitorTracer"
+
+# Unconditional jumps to follow to find the line a branch really goes to.
+JUMP_OPNAMES = {
+    'JUMP', 'JUMP_FORWARD', 'JUMP_BACKWARD', 'JUMP_NO_INTERRUPT',
+    'JUMP_BACKWARD_NO_INTERRUPT',
+}
+
+# Instructions that can go somewhere other than the next instruction.
+if hasattr(dis, 'hasjump'):
+    JUMP_OPCODES = set(dis.hasjump)
+else:
+    JUMP_OPCODES = set(dis.hasjrel) | set(dis.hasjabs)
+
+# Instructions that never go on to the next instruction.
+EXIT_OPNAMES = {'RETURN_VALUE', 'RETURN_CONST', 'RAISE_VARARGS', 'RERAISE'}
+
+
+class CodeInfo(object):
+    """What a SysMonitorTracer knows about one code object."""
+
+    def __init__(self, code, file_dict):
+        self.code = code
+        # The data dict for the code's file, or None if it isn't traced.
+        self.file_dict = file_dict
+        # Built the first time an event needs offsets mapped to lines.
+        self.line_starts = None
+        self.line_numbers = None
+        self.instructions = None
+        self.indexes = None
+        self.line_predecessors = None
+        self.jump_targets = None
+
+    def _map_offsets(self):
+        """Read the line number table and the instructions of the code."""
+        self.line_starts = []
+        self.line_numbers = []
+        for start, _, lineno in self.code.co_lines():
+            self.line_starts.append(start)
+            self.line_numbers.append(lineno)
+        # (offset, opname, jump target or None) for each instruction.
+        self.instructions = []
+        self.indexes = {}
+        self.jump_targets = set()
+        bytecode = dis.Bytecode(self.code)
+        for instruction in bytecode:
+            target = None
+            if instruction.opcode in JUMP_OPCODES:
+                target = instruction.argval
+                self.jump_targets.add(target)
+            self.indexes[instruction.offset] = len(self.instructions)
+            self.instructions.append((instruction.offset, instruction.opname, target))
+        handlers = set(entry.target for entry in getattr(bytecode, 'exception_entries', ()))
+
+        # The line of the instruction before each instruction that starts a
+        # line, when control can fall through from it.
+        self.line_predecessors = {}
+        previous_line = previous_opname = None
+        for offset, opname, target in self.instructions:
+            lineno = self.line_at(offset)
+            falls_through = (
+                previous_opname is not None
+                and previous_opname not in JUMP_OPNAMES
+                and previous_opname not in EXIT_OPNAMES
+            )
+            if (lineno is not None and previous_line is not None and lineno != previous_line
+                    and falls_through and offset not in handlers):
+                self.line_predecessors[offset] = previous_line
+            previous_line, previous_opname = lineno, opname
+
+    def line_at(self, offset):
+        """The line number of the instruction at `offset`, or None."""
+        if self.line_starts is None:
+            self._map_offsets()
+        index = bisect.bisect_right(self.line_starts, offset) - 1
+        if index < 0:
+            return None
+        return self.line_numbers[index]
+
+    def predecessor(self, offset):
+        """The line falling through to the line starting at `offset`, or None.
+
+        Returns a tuple: the line, and whether control can also jump to
+        `offset`.
+
+        """
+        if self.line_predecessors is None:
+            self._map_offsets()
+        return self.line_predecessors.get(offset), offset in self.jump_targets
+
+    def destination(self, source, offset):
+        """Where control going from line `source` to `offset` reaches.
+
+        Instructions still on the `source` line (like storing a for loop's
+        variable, or a jump back to the loop) are followed up to the next
+        branch.  Returns the line reached, and the offset of the instruction
+        starting it, or None if control stays on `source`.
+
+        """
+        if self.instructions is None:
+            self._map_offsets()
+        index = self.indexes.get(offset)
+        for _ in range(len(self.instructions)):
+            if index is None or index >= len(self.instructions):
+                break
+            offset, opname, target = self.instructions[index]
+            lineno = self.line_at(offset)
+            if lineno is not None and lineno != source:
+                return lineno, offset
+            if opname in JUMP_OPNAMES:
+                index = self.indexes.get(target)
+            elif target is not None or opname in EXIT_OPNAMES:
+                break
+            else:
+                index += 1
+        return source, None
+
+
+class SysMonitorTracer(object):
+    """Raw data tracer using sys.monitoring events.
+
+    Instead of a trace function called for every line of every frame, this
+    asks the interpreter for LINE events in the code objects of traced files
+    only, and returns DISABLE from each event once it's been recorded, so a
+    line costs one callback for the whole run, however often it executes.
+    Switching to a new dynamic context re-enables the events, so each context
+    costs one callback for each line it runs.
+    For branch coverage, arcs are recorded from BRANCH and JUMP events (an
+    instruction and where it went), PY_RETURN events (a line leaving the
+    function), and LINE events for lines that can only be reached from one
+    other line.  Every executed line is also recorded as an arc from the line
+    to itself, which the analysis ignores.
+
+    sys.monitoring is process-wide: one SysMonitorTracer traces every thread,
+    so the collector must not start one per thread.
+
+    """
+
+    # The collector only needs one of these for all of the threads.
+    traces_all_threads = True
+
+    def __init__(self):
+        # Attributes set from the collector:
+        self.data = None
+        self.trace_arcs = False
+        self.should_trace = None
+        self.should_trace_cache = None
+        self.warn = None
+
+        self.tool_id = None
+        # CodeInfos by the id of their code object: equal code objects
+        # (from a module imported twice, say) need events set separately.
+        # The CodeInfo keeps its code object, so the id isn't reused.
+        self.code_infos = {}
+        # Destinations seen for each (code, offset) of a BRANCH event, when
+        # the interpreter can't disable one direction of a branch at a time.
+        self.branch_destinations = {}
+        # The code and offset the last branch or jump recorded in each thread
+        # went to.
+        self.jumps = {}
+        self.get_ident = None
+        self._activity = False
+
+    def __repr__(self):
+        return "<SysMonitorTracer at {}: {} lines in {} files>".format(
+            id(self),
+            sum(len(v) for v in self.data.values()),
+            len(self.data),
+        )
+
+    @staticmethod
+    def available():
+        """Can a SysMonitorTracer be started in this interpreter?
+
+        The coverage tool id has to be free, or used by another
+        SysMonitorTracer, which its collector will stop while this one runs.
+
+        """
+        if sys_monitoring is None:
+            return False
+        return sys_monitoring.get_tool(sys_monitoring.COVERAGE_ID) in (None, TOOL_NAME)
+
+    def _local_events(self):
+        """The events wanted from the code objects of traced files."""
+        events = sys_monitoring.events
+        wanted = events.LINE
+        if self.trace_arcs:
+            wanted |= events.PY_RETURN | events.JUMP
+            if hasattr(events, 'BRANCH_LEFT'):
+                wanted |= events.BRANCH_LEFT | events.BRANCH_RIGHT
+            else:
+                wanted |= events.BRANCH
+        return wanted
+
+    def _callbacks(self):
+        """The (event, callback) pairs to register."""
+        events = sys_monitoring.events
+        callbacks = [
+            (events.PY_START, self._py_start),
+            # Generators started before we were will only resume.
+            (events.PY_RESUME, self._py_start),
+            (events.LINE, self._line),
+        ]
+        if self.trace_arcs:
+            callbacks.append((events.PY_RETURN, self._py_return))
+            callbacks.append((events.JUMP, self._jump))
+            if hasattr(events, 'BRANCH_LEFT'):
+                callbacks.append((events.BRANCH_LEFT, self._branch_direction))
+                callbacks.append((events.BRANCH_RIGHT, self._branch_direction))
+            else:
+                callbacks.append((events.BRANCH, self._branch))
+        return callbacks
+
+    def _py_start(self, code, instruction_offset):
+        """Decide whether to trace a code object the first time it runs."""
+        if id(code) not in self.code_infos:
+            self._activity = True
+            filename = code.co_filename
+            disp = self.should_trace_cache.get(filename)
+            if disp is None:
+                disp = self.should_trace(filename, sys._getframe(1))
+                self.should_trace_cache[filename] = disp
+
+            file_dict = None
+            if disp.trace and THIS_FILE not in filename:
+                tracename = disp.source_filename
+                if tracename not in self.data:
+                    self.data[tracename] = {}
+                file_dict = self.data[tracename]
+                sys_monitoring.set_local_events(
+                    self.tool_id, code, self._local_events()
+                )
+            self.code_infos[id(code)] = CodeInfo(code, file_dict)
+        return sys_monitoring.DISABLE
+
+    def _line(self, code, line_number):
+        """Record an executed line."""
+        file_dict = self.code_infos[id(code)].file_dict
+        if file_dict is not None:
+            self._activity = True
+            if self.trace_arcs:
+                # Record the line, and the arc to it when control fell
+                # through from the line before rather than jumping here.
+                file_dict[(line_number, line_number)] = None
+                offset = sys._getframe(1).f_lasti
+                predecessor, jumped_to = self.code_infos[id(code)].predecessor(offset)
+                if predecessor is not None:
+                    if not jumped_to or self.jumps.get(self.get_ident()) != (id(code), offset):
+                        file_dict[(predecessor, line_number)] = None
+            else:
+                file_dict[line_number] = None
+        return sys_monitoring.DISABLE
+
+    def _record_branch(self, code, instruction_offset, destination_offset):
+        """Record the arc a branch or jump took."""
+        info = self.code_infos[id(code)]
+        if info.file_dict is not None:
+            source = info.line_at(instruction_offset)
+            if source is not None:
+                destination, reached = info.destination(source, destination_offset)
+                self._activity = True
+                info.file_dict[(source, destination)] = None
+                # The LINE event for the line reached comes next, and mustn't
+                # think control fell through to it.
+                self.jumps[self.get_ident()] = (id(code), reached)
+
+    def _jump(self, code, instruction_offset, destination_offset):
+        """Record the arc a jump made."""
+        self._record_branch(code, instruction_offset, destination_offset)
+        return sys_monitoring.DISABLE
+
+    def _branch_direction(self, code, instruction_offset, destination_offset):
+        """Record one direction of a branch (Python 3.14+)."""
+        self._record_branch(code, instruction_offset, destination_offset)
+        return sys_monitoring.DISABLE
+
+    def _branch(self, code, instruction_offset, destination_offset):
+        """Record a branch, disabling it once both directions are seen."""
+        key = (id(code), instruction_offset)
+        destinations = self.branch_destinations.setdefault(key, set())
+        if destination_offset not in destinations:
+            destinations.add(destination_offset)
+            self._record_branch(code, instruction_offset, destination_offset)
+        if len(destinations) > 1:
+            return sys_monitoring.DISABLE
+        return None
+
+    def _py_return(self, code, instruction_offset, retval):
+        """Record an arc leaving the function."""
+        info = self.code_infos[id(code)]
+        if info.file_dict is not None:
+            source = info.line_at(instruction_offset)
+            if source is not None:
+                self._activity = True
+                info.file_dict[(source, -code.co_firstlineno)] = None
+        return sys_monitoring.DISABLE
+
+    def start(self):
+        """Start this Tracer.
+
+        There's no trace function to return, so this returns None.
+
+        """
+        if self.tool_id is not None:
+            return None
+        # Imported here, like the collector does, so gevent can still
+        # monkey-patch threading.
+        import threading
+        self.get_ident = threading.get_ident
+        tool_id = sys_monitoring.COVERAGE_ID
+        sys_monitoring.use_tool_id(tool_id, TOOL_NAME)
+        self.tool_id = tool_id
+        for event, callback in self._callbacks():
+            sys_monitoring.register_callback(tool_id, event, callback)
+        events = sys_monitoring.events
+        sys_monitoring.set_events(tool_id, events.PY_START | events.PY_RESUME)
+        # Events returned DISABLE while we were stopped must fire again.
+        sys_monitoring.restart_events()
+        return None
+
+    def stop(self):
+        """Stop this Tracer."""
+        if self.tool_id is None:
+            return
+        tool_id = self.tool_id
+        self.tool_id = None
+        sys_monitoring.set_events(tool_id, 0)
+        for info in self.code_infos.values():
+            if info.file_dict is not None:
+                sys_monitoring.set_local_events(tool_id, info.code, 0)
+        for event, _ in self._callbacks():
+            sys_monitoring.register_callback(tool_id, event, None)
+        sys_monitoring.free_tool_id(tool_id)
+        # Starting again looks at every code object afresh.
+        self.code_infos = {}
+        self.branch_destinations = {}
+        self.jumps = {}
+
+    def restart_events(self):
+        """Have the events returned DISABLE fire again, for a new context."""
+        if self.tool_id is None:
+            return
+        self.branch_destinations = {}
+        self.jumps = {}
+        sys_monitoring.restart_events()
+
+    def activity(self):
+        """Has there been any activity?"""
+        return self._activity
+
+    def reset_activity(self):
+        """Reset the activity() flag."""
+        self._activity = False
+
+    def get_stats(self):
+        """Return a dictionary of statistics, or None."""
+        return None
@@ -139,15 +139,29 @@ class XmlReporter(object):
             pct = 100.0 * (lhits_tot + bhits_tot) / denom
         return pct
 
-    def xml_file(self, fr, analysis, has_arcs):
-        """Add to the XML report for a single file."""
+    def class_attributes(self, morfs):
+        """Get the attributes of the XML 'class' elements for `morfs`.
 
-        if self.config.skip_empty:
-            if analysis.numbers.n_statements == 0:
-                return
+        Returns a list of dicts, in the order the report would list them,
+        without making the report.
 
-        # Create the 'lines' and 'package' XML elements, which
-        # are populated later.  Note that a package == a directory.
+        """
+        has_arcs = self.coverage.get_data().has_arcs()
+        classes = {}
+        for fr, analysis in get_analysis_to_report(self.coverage, morfs):
+            if self.config.skip_empty:
+                if analysis.numbers.n_statements == 0:
+                    continue
+            dirname, rel_name = self.class_name(fr)
+            attributes, _ = self.class_rates(analysis, has_arcs)
+            attributes["name"] = os.path.relpath(rel_name, dirname)
+            attributes["filename"] = rel_name.replace("\\", "/")
+            attributes["complexity"] = "0"
+            classes[(dirname.replace("/", "."), rel_name)] = attributes
+        return [attributes for _, attributes in sorted(iitems(classes))]
+
+    def class_name(self, fr):
+        """Get the (directory, relative file name) of the class for `fr`."""
         filename = fr.filename.replace("\\", "/")
         for source_path in self.source_paths:
             source_path = files.canonical_filename(source_path)
@@ -160,6 +174,44 @@ class XmlReporter(object):
 
         dirname = os.path.dirname(rel_name) or u"."
         dirname = "/".join(dirname.split("/")[:self.config.xml_package_depth])
+        return dirname, rel_name
+
+    def class_rates(self, analysis, has_arcs):
+        """Get the rate attributes of the class for `analysis`.
+
+        Returns the attributes, and the (line hits, lines, branch hits,
+        branches) counted for the package.
+
+        """
+        branch_stats = analysis.branch_stats()
+        class_lines = len(analysis.statements)
+        class_hits = class_lines - len(analysis.missing)
+
+        if has_arcs:
+            class_branches = sum(t for t, k in branch_stats.values())
+            missing_branches = sum(t - k for t, k in branch_stats.values())
+            class_br_hits = class_branches - missing_branches
+        else:
+            class_branches = 0.0
+            class_br_hits = 0.0
+
+        attributes = {"line-rate": rate(class_hits, class_lines)}
+        if has_arcs:
+            attributes["branch-rate"] = rate(class_br_hits, class_branches)
+        else:
+            attributes["branch-rate"] = "0"
+        return attributes, (class_hits, class_lines, class_br_hits, class_branches)
+
+    def xml_file(self, fr, analysis, has_arcs):
+        """Add to the XML report for a single file."""
+
+        if self.config.skip_empty:
+            if analysis.numbers.n_statements == 0:
+                return
+
+        # Create the 'lines' and 'package' XML elements, which
+        # are populated later.  Note that a package == a directory.
+        dirname, rel_name = self.class_name(fr)
         package_name = dirname.replace("/", ".")
 
         package = self.packages.setdefault(package_name, [{}, 0, 0, 0, 0])
@@ -200,24 +252,11 @@ class XmlReporter(object):
                     xline.setAttribute("missing-branches", ",".join(annlines))
             xlines.appendChild(xline)
 
-        class_lines = len(analysis.statements)
-        class_hits = class_lines - len(analysis.missing)
-
-        if has_arcs:
-            class_branches = sum(t for t, k in branch_stats.values())
-            missing_branches = sum(t - k for t, k in branch_stats.values())
-            class_br_hits = class_branches - missing_branches
-        else:
-            class_branches = 0.0
-            class_br_hits = 0.0
-
         # Finalize the statistics that are collected in the XML DOM.
-        xclass.setAttribute("line-rate", rate(class_hits, class_lines))
-        if has_arcs:
-            branch_rate = rate(class_br_hits, class_branches)
-        else:
-            branch_rate = "0"
-        xclass.setAttribute("branch-rate", branch_rate)
+        attributes, counts = self.class_rates(analysis, has_arcs)
+        class_hits, class_lines, class_br_hits, class_branches = counts
+        xclass.setAttribute("line-rate", attributes["line-rate"])
+        xclass.setAttribute("branch-rate", attributes["branch-rate"])
 
         package[0][rel_name] = xclass
         package[1] += class_hits
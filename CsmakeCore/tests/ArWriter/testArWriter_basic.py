@@ -0,0 +1,87 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import hashlib
+import io
+import os
+import os.path
+import shutil
+import subprocess
+import tempfile
+import unittest
+from ArWriter import ArWriter
+
+class testArWriter_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.members = [
+            ('debian-binary', b'2.0\n'),
+            ('control.tar.xz', b'odd sized control'),
+            ('data.tar.xz', b'\x00\xff' * 5000) ]
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def _write(self, digests=[]):
+        result = io.BytesIO()
+        cut = ArWriter(result)
+        for name, contents in self.members:
+            if name == 'data.tar.xz':
+                contents = io.BytesIO(contents)
+            cut.addMember(name, contents, digests)
+        return result.getvalue()
+
+    def test_layout(self):
+        result = self._write()
+        self.assertEqual(b'!<arch>\n', result[:8])
+        position = 8
+        for name, contents in self.members:
+            header = result[position:position+60]
+            self.assertEqual((name + '/').encode('ascii'), header[:16].rstrip())
+            self.assertEqual(len(contents), int(header[48:58]))
+            self.assertEqual(b'`\n', header[58:])
+            position = position + 60
+            self.assertEqual(contents, result[position:position+len(contents)])
+            position = position + len(contents) + len(contents) % 2
+        self.assertEqual(len(result), position)
+
+    def test_sameAsArCommand(self):
+        if shutil.which('ar') is None:
+            return
+        names = []
+        for name, contents in self.members:
+            with open(os.path.join(self.working, name), 'wb') as member:
+                member.write(contents)
+            names.append(name)
+        subprocess.check_call(
+            ['ar', 'rcD', 'test.deb'] + names,
+            cwd=self.working )
+        with open(os.path.join(self.working, 'test.deb'), 'rb') as arFile:
+            self.assertEqual(arFile.read(), self._write())
+
+    def test_digestsSeeContents(self):
+        digest = hashlib.sha256()
+        self._write([digest])
+        self.assertEqual(
+            hashlib.sha256(
+                b''.join([ contents for name, contents in self.members ])
+            ).hexdigest(),
+            digest.hexdigest() )
+
+    def test_longNamesAreRejected(self):
+        cut = ArWriter(io.BytesIO())
+        self.assertRaises(ValueError, cut.addMember, 'a-very-long-name.tar', b'')
@@ -0,0 +1,228 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import os
+import os.path
+import runpy
+import shutil
+import tempfile
+import unittest
+import CsmakeCore._vendor.coverage as coverage
+from CsmakeCore._vendor.coverage.files import PathAliases
+from CsmakeCore._vendor.coverage.misc import CoverageException
+from CsmakeCore._vendor.coverage.sqldata import CoverageData
+
+SAMPLE = '''
+def choose(flag):
+    if flag:
+        return 1
+    return 2
+
+choose(FLAG)
+'''
+
+class testCoverageData_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.parallel = os.path.join(self.working, 'parallel')
+        os.makedirs(self.parallel)
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def _parallel(self, suffix, arcs=None, lines=None, contexts=[''],
+                  tracers={}):
+        data = CoverageData(
+            os.path.join(self.parallel, '.coverage'),
+            suffix=suffix )
+        self.addCleanup(data.close)
+        for context in contexts:
+            data.set_context(context)
+            if arcs is not None:
+                data.add_arcs(arcs)
+            if lines is not None:
+                data.add_lines(lines)
+        data.add_file_tracers(tracers)
+        data.write()
+        return data
+
+    def _contents(self, data):
+        contents = {}
+        for context in sorted(data.measured_contexts()):
+            data.set_query_context(context)
+            for path in data.measured_files():
+                contents[(context, path)] = (
+                    sorted(data.arcs(path) or []),
+                    sorted(data.lines(path) or []),
+                    data.file_tracer(path) )
+        data.set_query_contexts(None)
+        return contents
+
+    def _combine(self, rows, aliases=None):
+        data = CoverageData(no_disk=True)
+        self.addCleanup(data.close)
+        for name in sorted(os.listdir(self.parallel)):
+            other = CoverageData(os.path.join(self.parallel, name))
+            if rows:
+                data._start_using()
+                other.read()
+                data._update_rows(other, aliases or PathAliases())
+                data._file_map = {}
+                data._context_map = {}
+                data._read_db()
+            else:
+                data.update(other, aliases=aliases)
+        return data
+
+    def test_collectedInMemoryUntilSaved(self):
+        sample = os.path.join(self.working, 'sample.py')
+        with open(sample, 'w') as sampleFile:
+            sampleFile.write(SAMPLE)
+        dataFile = os.path.join(self.working, '.coverage')
+        cover = coverage.Coverage(
+            branch=True,
+            data_file=dataFile,
+            include=[sample] )
+        self.addCleanup(cover.erase)
+        cover.start()
+        try:
+            runpy.run_path(sample, init_globals={'FLAG' : True})
+            cover.switch_context('second')
+            runpy.run_path(sample, init_globals={'FLAG' : False})
+        finally:
+            cover.stop()
+        data = cover.get_data()
+        self.assertTrue(data)
+        self.assertFalse(os.path.exists(dataFile))
+        cover.save()
+        self.assertEqual(
+            ['.coverage', 'parallel', 'sample.py'],
+            sorted(os.listdir(self.working)) )
+        saved = CoverageData(dataFile)
+        self.addCleanup(saved.close)
+        saved.read()
+        self.assertEqual(self._contents(data), self._contents(saved))
+        self.assertEqual(
+            set(['', 'second']),
+            saved.measured_contexts() )
+
+    def test_combinedSameAsRowByRow(self):
+        arcs = dict(
+            ('/src/file%d.py' % index,
+             dict(((line, line + 1), None) for line in range(1, 10 + index)))
+            for index in range(5) )
+        self._parallel('one', arcs=arcs, contexts=['', 'test.one'],
+                       tracers={'/src/file1.py' : 'plugin.Tracer'})
+        self._parallel('two', arcs={'/src/file9.py' : {(-1, 1) : None}},
+                       contexts=['test.two', 'test.one'])
+        self._parallel('three', arcs=arcs, contexts=['test.three'],
+                       tracers={'/src/file1.py' : 'plugin.Tracer'})
+        expected = self._contents(self._combine(True))
+        self.assertEqual(expected, self._contents(self._combine(False)))
+        self.assertEqual(
+            'plugin.Tracer',
+            expected[('test.one', '/src/file1.py')][2] )
+
+    def test_combinedLinesUnioned(self):
+        self._parallel('one', lines={'/src/a.py' : {1 : None, 2 : None}})
+        self._parallel('two', lines={
+            '/src/a.py' : {5 : None},
+            '/src/b.py' : {3 : None} })
+        combined = self._combine(False)
+        self.assertEqual(self._contents(self._combine(True)),
+                         self._contents(combined))
+        self.assertEqual([1, 2, 5], sorted(combined.lines('/src/a.py')))
+        self.assertFalse(combined.has_arcs())
+
+    def test_aliasesJoiningFiles(self):
+        self._parallel('one', lines={
+            '/here/a.py' : {1 : None},
+            '/there/a.py' : {2 : None} })
+        aliases = PathAliases()
+        aliases.add('/there/', '/here/')
+        combined = self._combine(False, aliases)
+        self.assertEqual(['/here/a.py'], list(combined.measured_files()))
+        self.assertEqual([1, 2], sorted(combined.lines('/here/a.py')))
+
+    def test_conflictingTracers(self):
+        self._parallel('one', lines={'/src/a.py' : {1 : None}},
+                       tracers={'/src/a.py' : 'plugin.One'})
+        self._parallel('two', lines={'/src/a.py' : {2 : None}},
+                       tracers={'/src/a.py' : 'plugin.Two'})
+        with self.assertRaises(CoverageException):
+            self._combine(False)
+
+    def test_combineFromUnsavedData(self):
+        other = CoverageData(no_disk=True)
+        self.addCleanup(other.close)
+        other.add_lines({'/src/a.py' : {1 : None}})
+        data = CoverageData(no_disk=True)
+        self.addCleanup(data.close)
+        data.add_lines({'/src/a.py' : {3 : None}})
+        data.update(other)
+        self.assertEqual([1, 3], sorted(data.lines('/src/a.py')))
+
+    def test_combineFilesWithCoverage(self):
+        self._parallel('one', arcs={'/src/a.py' : {(1, 2) : None}})
+        self._parallel('two', arcs={'/src/a.py' : {(2, 3) : None}})
+        dataFile = os.path.join(self.working, '.coverage')
+        cover = coverage.Coverage(data_file=dataFile)
+        self.addCleanup(cover.erase)
+        cover.combine([self.parallel])
+        self.assertEqual([], os.listdir(self.parallel))
+        self.assertEqual(
+            [(1, 2), (2, 3)],
+            sorted(cover.get_data().arcs('/src/a.py')) )
+        #The combined data is on disk before the files are deleted,
+        #without a save()
+        saved = CoverageData(dataFile)
+        self.addCleanup(saved.close)
+        saved.read()
+        self.assertEqual(
+            [(1, 2), (2, 3)],
+            sorted(saved.arcs('/src/a.py')) )
+
+    def test_combineKeepingFiles(self):
+        self._parallel('one', lines={'/src/a.py' : {1 : None}})
+        dataFile = os.path.join(self.working, '.coverage')
+        cover = coverage.Coverage(data_file=dataFile)
+        self.addCleanup(cover.erase)
+        cover.combine([self.parallel], keep=True)
+        self.assertEqual(1, len(os.listdir(self.parallel)))
+        self.assertFalse(os.path.exists(dataFile))
+
+    def test_writtenWithUmaskMode(self):
+        for umask in [0o022, 0o077]:
+            previous = os.umask(umask)
+            try:
+                data = self._parallel(
+                    'umask%o' % umask,
+                    lines={'/src/a.py' : {1 : None}} )
+            finally:
+                os.umask(previous)
+            self.assertEqual(
+                0o666 & ~umask,
+                os.stat(data.data_filename()).st_mode & 0o777 )
+
+    def test_memoryClosedOnErase(self):
+        data = CoverageData(no_disk=True)
+        self.addCleanup(data.close)
+        data.add_lines({'/src/a.py' : {1 : None}})
+        memory = data._memory_db
+        data.erase()
+        self.assertTrue(memory.con is None)
+        self.assertFalse(data)
@@ -0,0 +1,130 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import io
+import os
+import os.path
+import runpy
+import shutil
+import tempfile
+import unittest
+import xml.parsers.expat
+import CsmakeCore._vendor.coverage as coverage
+import CsmakeCore._vendor.coverage.python
+
+SAMPLE = '''
+def choose(flag):
+    if flag:
+        return 1
+    return 2
+
+choose(FLAG)
+'''
+
+OTHER = '''
+def other():
+    return 3
+
+other()
+'''
+
+class testCoverageReports_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.sample = os.path.join(self.working, 'sample.py')
+        self.other = os.path.join(self.working, 'sub', 'other.py')
+        os.makedirs(os.path.dirname(self.other))
+        for path, contents in [(self.sample, SAMPLE), (self.other, OTHER)]:
+            with open(path, 'w') as sourceFile:
+                sourceFile.write(contents)
+        self.cover = coverage.Coverage(
+            branch=True,
+            data_file=None,
+            include=[os.path.join(self.working, '*')] )
+
+    def tearDown(self):
+        self.cover.erase()
+        shutil.rmtree(self.working)
+
+    def _run(self, flag):
+        self.cover.start()
+        try:
+            runpy.run_path(self.sample, init_globals={'FLAG' : flag})
+            runpy.run_path(self.other)
+        finally:
+            self.cover.stop()
+
+    def test_classAttributesMatchXmlReport(self):
+        self._run(True)
+        xmlFile = os.path.join(self.working, 'coverage.xml')
+        self.cover.xml_report(outfile=xmlFile)
+        classes = []
+        def startElement(name, attrs):
+            if name == 'class':
+                classes.append(attrs)
+        parser = xml.parsers.expat.ParserCreate()
+        parser.StartElementHandler = startElement
+        with open(xmlFile, 'rb') as coverageFile:
+            parser.ParseFile(coverageFile)
+        self.assertEqual(classes, self.cover.xml_class_attributes())
+        self.assertEqual(
+            ['sample.py', 'other.py'],
+            [ attrs['name'] for attrs in classes ] )
+
+    def test_classAttributesOmit(self):
+        self._run(False)
+        filename, statements, excluded, missing, formatted = \
+            self.cover.analysis2(self.sample)
+        self.assertEqual(
+            [{'name' : 'sample.py',
+              'filename' : self.sample,
+              'complexity' : '0',
+              'line-rate' : "%.4g" % (
+                  float(len(statements) - len(missing)) / len(statements) ),
+              'branch-rate' : '0.5'}],
+            self.cover.xml_class_attributes(omit=['*/sub/*']) )
+
+    def test_filesAnalyzedOnceForReports(self):
+        parsed = []
+        class CountingParser(CsmakeCore._vendor.coverage.python.PythonParser):
+            def __init__(self, *args, **kwargs):
+                parsed.append(kwargs.get('filename'))
+                super(CountingParser, self).__init__(*args, **kwargs)
+        original = CsmakeCore._vendor.coverage.python.PythonParser
+        CsmakeCore._vendor.coverage.python.PythonParser = CountingParser
+        try:
+            self._run(True)
+            self.cover.report(file=io.StringIO())
+            self.cover.xml_class_attributes()
+            self.cover.xml_report(
+                outfile=os.path.join(self.working, 'coverage.xml') )
+            self.cover.html_report(
+                directory=os.path.join(self.working, 'html') )
+        finally:
+            CsmakeCore._vendor.coverage.python.PythonParser = original
+        self.assertEqual(
+            sorted([self.sample, self.other]),
+            sorted(parsed) )
+
+    def test_newDataIsAnalyzedAgain(self):
+        self._run(False)
+        self.assertIn(4, self.cover.analysis2(self.sample)[3])
+        self._run(True)
+        self.assertNotIn(4, self.cover.analysis2(self.sample)[3])
+        self.cover.erase()
+        self._run(False)
+        self.assertIn(4, self.cover.analysis2(self.sample)[3])
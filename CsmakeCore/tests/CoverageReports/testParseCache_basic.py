@@ -0,0 +1,153 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import io
+import os
+import os.path
+import runpy
+import shutil
+import tempfile
+import unittest
+import CsmakeCore._vendor.coverage as coverage
+import CsmakeCore._vendor.coverage.parser
+from CsmakeCore._vendor.coverage.parsecache import ParseCache
+from CsmakeCore._vendor.coverage.parser import PythonParser
+
+SAMPLE = '''import os
+
+class Sample(object):
+    """A docstring"""
+    def __init__(self, value):
+        self.value = (
+            value +
+            1 )
+
+    def choose(self):
+        if self.value > 2:
+            return 1
+        elif self.value < 0:   # pragma: no cover
+            return 2
+        for item in range(self.value):
+            if item:
+                break
+        return lambda: 3
+
+def unused():   # pragma: no cover
+    return os.sep
+
+Sample(1).choose()
+'''
+
+EXCLUDE = r'#\s*pragma[:\s]?\s*no\s*cover'
+
+class testParseCache_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.cacheDir = os.path.join(self.working, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def _parse(self, text=SAMPLE, exclude=EXCLUDE, cache=True):
+        parser = PythonParser(
+            text=text,
+            exclude=exclude,
+            cache=ParseCache(self.cacheDir) if cache else None )
+        parser.parse_source()
+        return parser
+
+    def _results(self, parser):
+        return (
+            parser.statements,
+            parser.excluded,
+            parser.arcs(),
+            dict(parser.exit_counts()),
+            parser.translate_lines([6, 7, 8]),
+            [ parser.missing_arc_description(start, end)
+              for start, end in sorted(parser.arcs()) ] )
+
+    def _cachedFiles(self):
+        return [ name for name in os.listdir(self.cacheDir)
+                 if name.endswith('.json') ]
+
+    def test_cachedSameAsParsed(self):
+        expected = self._results(self._parse(cache=False))
+        self.assertEqual(expected, self._results(self._parse()))
+        self.assertEqual(expected, self._results(self._parse()))
+        self.assertEqual(1, len(self._cachedFiles()))
+
+    def test_cachedIsNotParsedAgain(self):
+        expected = self._results(self._parse())
+        def notAgain(*args, **kwargs):
+            raise AssertionError("The source was tokenized again")
+        tokenizer = CsmakeCore._vendor.coverage.parser.generate_tokens
+        CsmakeCore._vendor.coverage.parser.generate_tokens = notAgain
+        try:
+            parser = self._parse()
+            self.assertEqual(expected, self._results(parser))
+            self.assertTrue(parser._byte_parser is None)
+        finally:
+            CsmakeCore._vendor.coverage.parser.generate_tokens = tokenizer
+
+    def test_linesThenArcs(self):
+        self.assertEqual(
+            self._parse(cache=False).statements,
+            self._parse().statements )
+        expected = self._results(self._parse(cache=False))
+        self.assertEqual(expected, self._results(self._parse()))
+        self.assertEqual(expected, self._results(self._parse()))
+
+    def test_changesAreParsed(self):
+        self._results(self._parse())
+        changed = SAMPLE.replace('Sample(1)', 'Sample(5)\nSample(1)')
+        self.assertEqual(
+            self._results(self._parse(text=changed, cache=False)),
+            self._results(self._parse(text=changed)) )
+        self.assertEqual(
+            self._parse(exclude=None, cache=False).statements,
+            self._parse(exclude=None).statements )
+        self.assertEqual(3, len(self._cachedFiles()))
+
+    def test_unwritableCacheIsIgnored(self):
+        with open(self.cacheDir, 'w') as blocker:
+            blocker.write('not a directory')
+        self.assertEqual(
+            self._results(self._parse(cache=False)),
+            self._results(self._parse()) )
+
+    def test_coverageUsesCache(self):
+        sample = os.path.join(self.working, 'sample.py')
+        with open(sample, 'w') as sampleFile:
+            sampleFile.write(SAMPLE)
+        reports = []
+        for run in range(2):
+            cover = coverage.Coverage(
+                branch=True,
+                data_file=None,
+                include=[sample] )
+            cover.set_option('report:parse_cache', self.cacheDir)
+            cover.start()
+            try:
+                runpy.run_path(sample)
+            finally:
+                cover.stop()
+            report = io.StringIO()
+            cover.report(file=report, show_missing=True)
+            reports.append(report.getvalue())
+            cover.erase()
+        self.assertEqual(reports[0], reports[1])
+        self.assertEqual(1, len(self._cachedFiles()))
@@ -15,7 +15,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # </copyright>
 import unittest
+import os
+import shutil
+import tempfile
 import CsmakeModule
+from DigestDatabase import DigestDatabase
 from Environment import Environment
 from Result import Result
 from OutputTee import OutputTee
@@ -58,3 +62,58 @@ class testCsmakeModule_basic(unittest.TestCase):
         self.assertEqual("{a{b",p)
 
         OutputTee.endAll()
+
+    def test_needRebuildWithDigests(self):
+        working = tempfile.mkdtemp()
+        try:
+            source = os.path.join(working, 'source.txt')
+            target = os.path.join(working, 'target.txt')
+            for path, content in [(source, 'same'), (target, 'built')]:
+                with open(path, 'w') as fileobj:
+                    fileobj.write(content)
+            os.utime(target, (1000, 1000))
+            os.utime(source, (2000, 2000))
+            cut = self._createaCUT()
+            cut.engine.digestDatabase = DigestDatabase(working)
+
+            #No digests recorded yet, the mtimes decide
+            self.assertTrue(cut._needRebuild(source, target))
+            cut._recordRebuildDigests()
+
+            #A checkout touched the source, but it didn't change
+            os.utime(source, (3000, 3000))
+            self.assertFalse(cut._needRebuild(source, target))
+
+            #The source was rewritten in the same second as the target
+            with open(source, 'w') as fileobj:
+                fileobj.write('diff')
+            os.utime(source, (1000, 1000))
+            self.assertTrue(cut._needRebuild(source, target))
+
+            cut.engine.digestDatabase.save()
+            reloaded = DigestDatabase(working)
+            self.assertEqual(
+                cut.engine.digestDatabase.targets,
+                reloaded.targets )
+        finally:
+            shutil.rmtree(working)
+            OutputTee.endAll()
+
+    def test_digestDatabaseOnlyReadsChangedFiles(self):
+        working = tempfile.mkdtemp()
+        try:
+            path = os.path.join(working, 'file.txt')
+            with open(path, 'w') as fileobj:
+                fileobj.write('content')
+            reads = []
+            def digester(path):
+                reads.append(path)
+                return 'digest%d' % len(reads)
+            cut = DigestDatabase(working)
+            self.assertEqual('digest1', cut.digest(path, os.stat(path), digester))
+            self.assertEqual('digest1', cut.digest(path, os.stat(path), digester))
+            os.utime(path, (5000, 5000))
+            self.assertEqual('digest2', cut.digest(path, os.stat(path), digester))
+            self.assertEqual(2, len(reads))
+        finally:
+            shutil.rmtree(working)
@@ -0,0 +1,151 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+#Contention benchmark for file tracking: N threads each declare and
+#  map their own files into one shared file manager, the way parallel
+#  steps do, with the file tracking lock as it is now and with a single
+#  global RLock (the way file tracking was locked before).  Writes is
+#  the number of times a thread had to take the lock to change indexes
+#  Run with: python3 CsmakeCore/tests/FileManager/benchFileManager.py
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..') )
+import FileManager as FileManagerModule
+from FileManager import FileManager, FileTrackingLock
+
+class CountingLock(FileTrackingLock):
+    def __init__(self):
+        FileTrackingLock.__init__(self)
+        self.acquisitions = 0
+
+    def acquireWrite(self):
+        if self.writer != threading.get_ident():
+            self.acquisitions = self.acquisitions + 1
+        FileTrackingLock.acquireWrite(self)
+
+class GlobalLock:
+    """File tracking locked with one RLock and no write batching"""
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.acquisitions = 0
+        self.depth = threading.local()
+
+    def acquireRead(self):
+        self.lock.acquire()
+
+    def releaseRead(self):
+        self.lock.release()
+
+    def acquireWrite(self):
+        self.lock.acquire()
+        if getattr(self.depth, 'count', 0) == 0:
+            self.acquisitions = self.acquisitions + 1
+            self.depth.count = 0
+        self.depth.count = self.depth.count + 1
+
+    def releaseWrite(self):
+        self.depth.count = self.depth.count - 1
+        self.lock.release()
+
+    def startBatch(self):
+        pass
+
+    def endBatch(self):
+        pass
+
+    def deferWrite(self, function, *args):
+        return False
+
+class QuietLog:
+    filetrack = False
+    def devdebug(self, *args):
+        pass
+    def debug(self, *args):
+        pass
+    def error(self, *args):
+        print(args[0] % args[1:])
+    def exception(self, *args):
+        print(args[0] % args[1:])
+
+def createFiles(working, threads, files):
+    for thread in range(threads):
+        directory = os.path.join(working, 'src%d' % thread)
+        os.makedirs(directory)
+        for number in range(files):
+            open(os.path.join(directory, 'f%d.c' % number), 'w').close()
+
+def mapFiles(manager, thread, rounds, lookups):
+    manager.parseFileDeclaration(
+        "<id%d(c:source)> src%d/*.c" % (thread, thread) )
+    for current in range(rounds):
+        mapping = manager.parseFileMap(
+            "<id%d(c:source)> src%d/*.c -(1-1)-> <(o:object%d)> out%d/*.o" % (
+                thread, thread, current, thread ) )
+        manager.absorbMappings(mapping, validate=False)
+        for lookup in range(lookups):
+            manager.findInstances(FileManagerModule.FileSpec(
+                relLocation="src%d/f%d.c" % (thread, lookup) ))
+
+def run(lock, working, threads, rounds, lookups):
+    FileManager.FILE_MANAGER_LOCK = lock
+    manager = FileManager()
+    manager.working = working
+    manager.results = os.path.join(working, 'target')
+    manager.log = QuietLog()
+    workers = [
+        threading.Thread(
+            target=mapFiles,
+            args=(manager, thread, rounds, lookups))
+        for thread in range(threads) ]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.time() - start, lock.acquisitions)
+
+def main():
+    files = 200
+    rounds = 5
+    lookups = 50
+    working = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        os.chdir(working)
+        createFiles(working, 16, files)
+        print("%8s %10s %10s %14s %14s" % (
+            "threads", "rlock s", "rwlock s", "rlock writes", "rwlock writes"))
+        for threads in [1, 2, 4, 8, 16]:
+            old, oldWrites = run(
+                GlobalLock(), working, threads, rounds, lookups)
+            new, newWrites = run(
+                CountingLock(), working, threads, rounds, lookups)
+            print("%8d %10.3f %10.3f %14d %14d" % (
+                threads, old, new, oldWrites, newWrites))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(working)
+
+if __name__ == '__main__':
+    main()
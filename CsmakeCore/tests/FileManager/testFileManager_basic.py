@@ -16,12 +16,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # </copyright>
 import re
+import threading
 import unittest
 import os.path
 import FileManager
 import importlib
 importlib.reload(FileManager)
-from FileManager import FileManager, MetadataFileTracker, FileSpec
+from FileManager import FileManager, MetadataFileTracker, FileSpec, PathIndex
+from FileManager import FileTrackingLock, RegexPathScanner
 
 class testFileManager_basic(unittest.TestCase):
 
@@ -532,3 +534,136 @@ class testFileManager_basic(unittest.TestCase):
     def test_translateStarsToResultRegex(self):
         result = FileManager.translateStarsToResultRegex('file[~~file~~].mine')
         self.assertEqual(result, r'file\g<file>.mine')
+
+    def test_literalRegexPrefix(self):
+        self.assertEqual(
+            PathIndex.literalRegexPrefix(
+                FileManager.translateStarsToSourceRegex('/a/b-c/*.py') ),
+            '/a/b-c/' )
+        self.assertEqual(PathIndex.literalRegexPrefix(r'src\/x\.py'), 'src/x.py')
+        self.assertEqual(PathIndex.literalRegexPrefix('/abc?/d'), '/ab')
+        self.assertEqual(PathIndex.literalRegexPrefix('/a(/b)?/c'), '/a')
+        self.assertEqual(PathIndex.literalRegexPrefix('/a|/b'), '')
+        self.assertEqual(PathIndex.literalRegexPrefix(r'\d/a'), '')
+
+    def test_pathIndexMatchesFullScan(self):
+        cut = self._createaCUT()
+        keys = []
+        for top in ['/w', '/w/sub', '/other/w']:
+            for directory in ['src', 'mysrc', 'src/pkg', 'docs']:
+                for name in ['a.py', 'b.py', 'c.txt', 'src.py']:
+                    keys.append('%s/%s/%s' % (top, directory, name))
+                    keys.append('%s/%s' % (directory, name))
+        for key in keys:
+            cut.addIndicies({'location' : key, 'relLocation' : key}, key)
+        self.assertTrue(
+            len(cut.index['location']) >= FileManager.PATH_INDEX_THRESHOLD )
+        specs = [
+            '/w/src/*.py', '/w/*/a.py', 'src/*.py', 'src/pkg/*',
+            '*.py', 'rc/a*', 'w/sub/docs/c.txt' ]
+        regexes = [ FileManager.translateStarsToSourceRegex(x) for x in specs ]
+        regexes.extend([r'/w/(src|docs)/a\.py', r'/other/w/src/[ab]\.py'])
+        for axis in ['location', 'relLocation']:
+            for regex in regexes:
+                test = re.compile(regex)
+                expected = set([
+                    key for key in cut.index[axis].keys()
+                    if test.search(key) ])
+                self.assertEqual(
+                    set(cut.findRecordsOnREAxis(axis, regex)),
+                    expected,
+                    regex )
+        self.assertTrue('location' in cut.pathIndexes)
+        self.assertIsNotNone(
+            cut.pathIndexes['location'].candidates(regexes[0]) )
+        cut.addIndicies({'location' : '/w/src/new.py'}, '/w/src/new.py')
+        self.assertTrue(
+            '/w/src/new.py' in cut.findRecordsOnREAxis('location', regexes[0]) )
+
+    def test_trackingLockReadersShareWritersExclude(self):
+        lock = FileTrackingLock()
+        events = []
+        lock.acquireRead()
+        def reader():
+            lock.acquireRead()
+            events.append('read')
+            lock.releaseRead()
+        def writer():
+            lock.acquireWrite()
+            events.append('write')
+            lock.releaseWrite()
+        thread = threading.Thread(target=reader)
+        thread.start()
+        thread.join(10)
+        self.assertEqual(events, ['read'])
+        thread = threading.Thread(target=writer)
+        thread.start()
+        thread.join(0.2)
+        self.assertEqual(events, ['read'])
+        self.assertRaises(RuntimeError, lock.acquireWrite)
+        lock.releaseRead()
+        thread.join(10)
+        self.assertEqual(events, ['read', 'write'])
+        lock.acquireWrite()
+        lock.acquireRead()
+        lock.acquireWrite()
+        lock.releaseWrite()
+        lock.releaseRead()
+        lock.releaseWrite()
+        self.assertIsNone(lock.writer)
+
+    def test_batchedWritesApplyAtEndOfBatch(self):
+        cut = self._createaCUT()
+        cut.lock.startBatch()
+        try:
+            result = cut.parseFileDeclaration("<myid(test:testing)> *.ext")
+            self.assertEqual(len(result), 8)
+            self.assertFalse('myid' in cut.index['id'])
+        finally:
+            cut.lock.endBatch()
+        self.assertEqual(len(cut.index['id']['myid']), 8)
+        self.assertEqual(
+            len(cut.findInstances(FileSpec(relLocation='test_*.ext'))), 5 )
+
+    def test_regexPathComponents(self):
+        self.assertEqual(
+            RegexPathScanner.splitComponents(r'/a/[^/]*/b\.py'),
+            [('', True), ('a', True), ('[^/]*', True), (r'b\.py', True)] )
+        self.assertEqual(
+            RegexPathScanner.splitComponents(r'/a/.*/b'),
+            [('', True), ('a', True), ('.*', False), ('b', True)] )
+        self.assertEqual(
+            RegexPathScanner.splitComponents(r'/a/(b/c|d)/e'),
+            [('', True), ('a', True), ('(b/c|d)', False), ('e', True)] )
+        self.assertEqual(
+            RegexPathScanner.splitComponents(r'/a/?[+-0]'),
+            [('', True), ('a', False), ('?[+-0]', False)] )
+        self.assertFalse(RegexPathScanner.splitComponents(r'/[^a]')[1][1])
+        self.assertEqual(RegexPathScanner.literalComponent(r'a\-b'), 'a-b')
+        self.assertIsNone(RegexPathScanner.literalComponent(r'a\.b*'))
+
+    def test_regexScanMatchesFullWalk(self):
+        listed = []
+        def listDirectory(path):
+            listed.append(path)
+            return RegexPathScanner.scanDirectory(path)
+        for regex in [
+                r'.*[.]ext', r'test_[0-9][.]ext', r'[^/]*/my_1',
+                r'other-fakeworking/.*', r'other\-fake[a-z]*/', r'(dir|zzz)\+',
+                r'other_1\.ext$', r'test_1', r'nothing/here' ]:
+            repath = os.path.join(self.working, regex)
+            test = re.compile(repath)
+            expected = []
+            for base, dirs, files in os.walk(self.working):
+                for name in dirs + files:
+                    path = os.path.join(base, name)
+                    if test.match(path):
+                        expected.append(path)
+            del listed[:]
+            self.assertEqual(
+                sorted(FileManager.findDiskFilesMatchingRegex(
+                    repath,
+                    listDirectory )),
+                sorted(expected),
+                regex )
+            self.assertFalse('/' in listed)
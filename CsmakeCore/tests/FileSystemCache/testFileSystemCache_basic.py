@@ -0,0 +1,106 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import glob
+import os
+import os.path
+import shutil
+import tempfile
+import unittest
+from FileSystemCache import FileSystem, FileSystemCache
+
+class testFileSystemCache_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        for path in ['src/a.c', 'src/b.c', 'src/.hidden.c', 'src/sub/c.c',
+                     'src/sub/d.h', 'other/e.c', 'top.txt']:
+            self._touch(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def _path(self, *parts):
+        return os.path.join(self.working, *parts)
+
+    def _touch(self, path):
+        path = self._path(path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        open(path, 'w').close()
+
+    def test_globMatchesGlobModule(self):
+        for cut in [FileSystem(), FileSystemCache()]:
+            for pattern in ['src/*.c', 'src/.*', '*/*.c', 'src/*/*.[ch]',
+                            'src/sub', 'src/sub/', 'nothing/*', 'top.txt',
+                            '*', 's?c/sub/*', 'missing.txt']:
+                pattern = self._path(pattern)
+                self.assertEqual(
+                    sorted(cut.glob(pattern)),
+                    sorted(glob.glob(pattern)),
+                    pattern )
+
+    def test_answersAreKeptUntilInvalidated(self):
+        cut = FileSystemCache()
+        pattern = self._path('src', '*.c')
+        before = sorted(cut.glob(pattern))
+        self.assertFalse(cut.isfile(self._path('src', 'new.c')))
+        self._touch('src/new.c')
+        self.assertEqual(before, sorted(cut.glob(pattern)))
+        self.assertFalse(cut.isfile(self._path('src', 'new.c')))
+        cut.invalidate(self._path('src', 'new.c'))
+        self.assertEqual(
+            sorted(glob.glob(pattern)),
+            sorted(cut.glob(pattern)) )
+        self.assertTrue(cut.isfile(self._path('src', 'new.c')))
+
+    def test_invalidateForgetsSubtree(self):
+        cut = FileSystemCache()
+        self.assertEqual(['c.c', 'd.h'], sorted(cut.listdir(self._path('src', 'sub'))))
+        self.assertFalse(cut.exists(self._path('src', 'sub', 'x.c')))
+        self._touch('src/sub/x.c')
+        cut.invalidate(self._path('src'))
+        self.assertEqual(
+            ['c.c', 'd.h', 'x.c'],
+            sorted(cut.listdir(self._path('src', 'sub'))) )
+        self.assertTrue(cut.exists(self._path('src', 'sub', 'x.c')))
+
+    def test_invalidateSpec(self):
+        cut = FileSystemCache()
+        cut.listdir(self._path('src', 'sub'))
+        cut.listdir(self._path('other'))
+        self._touch('src/sub/y.c')
+        self._touch('other/y.c')
+        cut.invalidateSpec(self._path('src', 'sub', '*.c'))
+        self.assertTrue('y.c' in cut.listdir(self._path('src', 'sub')))
+        self.assertFalse('y.c' in cut.listdir(self._path('other')))
+        self._touch('src/sub/z.c')
+        cut.invalidateSpec(self._path('src', r'sub/z\.c'), True)
+        self.assertTrue('z.c' in cut.listdir(self._path('src', 'sub')))
+        cut.invalidateSpec(self._path('(src|other)', '.*'), True)
+        self.assertTrue('y.c' in cut.listdir(self._path('other')))
+
+    def test_clearForgetsEverything(self):
+        cut = FileSystemCache()
+        self.assertFalse(cut.lexists(self._path('late.txt')))
+        self.assertRaises(OSError, cut.getmtime, self._path('late.txt'))
+        self._touch('late.txt')
+        self.assertFalse(cut.lexists(self._path('late.txt')))
+        cut.clear()
+        self.assertTrue(cut.lexists(self._path('late.txt')))
+        self.assertEqual(
+            os.path.getmtime(self._path('late.txt')),
+            cut.getmtime(self._path('late.txt')) )
@@ -0,0 +1,169 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import os
+import os.path
+import shutil
+import tempfile
+import time
+import unittest
+from CsmakeCore.ModuleIndex import ModuleIndex
+
+class testModuleIndex_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.syspath = os.path.join(self.working, 'site')
+        self.indexFile = os.path.join(self.working, 'cache', 'index.json')
+        self.package = self._package('one')
+        self._module(self.package, 'Alpha')
+        self._module(self.package, 'Beta')
+        with open(os.path.join(self.package, 'notes.txt'), 'w') as notes:
+            notes.write('not a module')
+        os.makedirs(os.path.join(self.syspath, 'plain'))
+        self._settle()
+        self.listed = []
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def _package(self, name):
+        package = os.path.join(self.syspath, name, 'CsmakeModules')
+        os.makedirs(package)
+        return package
+
+    def _module(self, package, name):
+        with open(os.path.join(package, name + '.py'), 'w') as module:
+            module.write('class %s:\n    pass\n' % name)
+
+    def _settle(self, ago=60):
+        #Make every directory look like it changed a while ago
+        when = time.time() - ago
+        for root, dirs, files in os.walk(self.working):
+            os.utime(root, (when, when))
+
+    def _index(self):
+        index = ModuleIndex(self.indexFile)
+        for kind, lister in [
+                ('_searchPath', ModuleIndex._searchPath),
+                ('_packageModules', ModuleIndex._packageModules) ]:
+            def listing(path, kind=kind, lister=lister):
+                self.listed.append((kind, path))
+                return lister(path)
+            setattr(index, kind, listing)
+        return index
+
+    def _listings(self, index):
+        return (
+            index.searchPath(self.syspath),
+            sorted(index.packageModules(self.package)) )
+
+    def test_listsModules(self):
+        index = self._index()
+        self.assertEqual(
+            ([os.path.join(self.syspath, 'one')], ['Alpha', 'Beta']),
+            self._listings(index) )
+        self.assertEqual(2, len(self.listed))
+        self._listings(index)
+        self.assertEqual(2, len(self.listed))
+
+    def test_savedIndexUsedWhenUnchanged(self):
+        index = self._index()
+        expected = self._listings(index)
+        index.save()
+        self.assertTrue(os.path.isfile(self.indexFile))
+        self.listed = []
+        self.assertEqual(expected, self._listings(self._index()))
+        self.assertEqual([], self.listed)
+
+    def test_changedDirectoriesListedAgain(self):
+        index = self._index()
+        self._listings(index)
+        index.save()
+        self._module(self.package, 'Gamma')
+        self._package('two')
+        self._settle(30)
+        self.listed = []
+        index = self._index()
+        self.assertEqual(
+            ([os.path.join(self.syspath, 'one'),
+              os.path.join(self.syspath, 'two')],
+             ['Alpha', 'Beta', 'Gamma']),
+            (sorted(index.searchPath(self.syspath)),
+             sorted(index.packageModules(self.package))) )
+        self.assertEqual(2, len(self.listed))
+
+    def test_recentChangesListedAgain(self):
+        index = self._index()
+        self._module(self.package, 'Gamma')
+        self.assertIn('Gamma', index.packageModules(self.package))
+        index.save()
+        self.listed = []
+        self.assertIn('Gamma', self._index().packageModules(self.package))
+        self.assertEqual(
+            [('_packageModules', self.package)],
+            self.listed )
+
+    def test_forgetChecksAgain(self):
+        index = self._index()
+        self._listings(index)
+        self._module(self.package, 'Gamma')
+        self.assertNotIn('Gamma', index.packageModules(self.package))
+        index.forget()
+        self.assertIn('Gamma', index.packageModules(self.package))
+
+    def test_forcedForgetListsEverythingAgain(self):
+        index = self._index()
+        self._listings(index)
+        index.save()
+        #A new CsmakeModules in an existing subdirectory doesn't change
+        #the mtime of the sys.path entry
+        os.makedirs(os.path.join(self.syspath, 'plain', 'CsmakeModules'))
+        index = self._index()
+        index.forget()
+        self.assertEqual(1, len(index.searchPath(self.syspath)))
+        index.forget(force=True)
+        self.assertIn(
+            os.path.join(self.syspath, 'plain'),
+            index.searchPath(self.syspath) )
+
+    def test_missingDirectories(self):
+        index = self._index()
+        missing = os.path.join(self.working, 'missing')
+        self.assertEqual([], index.searchPath(missing))
+        self.assertEqual([], index.packageModules(missing))
+        index.save()
+        self.assertEqual({}, ModuleIndex(self.indexFile).packages)
+
+    def test_withoutFile(self):
+        index = ModuleIndex(None)
+        self.assertEqual(['Alpha', 'Beta'],
+            sorted(index.packageModules(self.package)) )
+        index.save()
+        self.assertFalse(os.path.exists(os.path.dirname(self.indexFile)))
+
+    def test_defaultPathInCacheDir(self):
+        previous = os.environ.get('XDG_CACHE_HOME')
+        os.environ['XDG_CACHE_HOME'] = self.working
+        try:
+            self.assertEqual(
+                os.path.join(self.working, 'csmake', ModuleIndex.FILENAME),
+                ModuleIndex.defaultPath() )
+        finally:
+            if previous is None:
+                del os.environ['XDG_CACHE_HOME']
+            else:
+                os.environ['XDG_CACHE_HOME'] = previous
@@ -0,0 +1,187 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import io
+import os
+import os.path
+import subprocess
+import sys
+import threading
+import time
+import unittest
+import OutputTee
+
+class testOutputTee_basic(unittest.TestCase):
+
+    class CapturingStream(io.StringIO):
+        def __init__(self):
+            io.StringIO.__init__(self)
+            self.lock = threading.Lock()
+            self.written = threading.Event()
+
+        def write(self, buf):
+            with self.lock:
+                io.StringIO.write(self, buf)
+            self.written.set()
+
+        def contents(self):
+            with self.lock:
+                return self.getvalue()
+
+    def setUp(self):
+        self.actual = testOutputTee_basic.CapturingStream()
+        self.tee = OutputTee.OutputTee.__class__()
+        self.tee.subsumeStream(self.actual)
+
+    def tearDown(self):
+        self.tee.endAll()
+
+    def test_resultOffsets(self):
+        self.tee.write("before\n")
+        self.tee.startResult('result')
+        self.tee.write("during\n")
+        self.tee.endResult('result')
+        self.tee.write("after\n")
+        self.assertEqual(b"during\n", self.tee.getResult('result'))
+        self.assertEqual("before\nduring\nafter\n", self.actual.contents())
+
+    def test_unfinishedResult(self):
+        self.tee.startResult('result')
+        self.tee.write("during\n")
+        self.assertEqual(b"during\n", self.tee.getResult('result'))
+
+    def test_subprocessOutputIsRecorded(self):
+        self.tee.startResult('result')
+        self.tee.write("python\n")
+        subprocess.check_call(
+            [sys.executable, '-c', 'print("child")'],
+            stdout=self.tee )
+        self.tee.write("python again\n")
+        self.tee.endResult('result')
+        self.assertEqual(
+            b"python\nchild\npython again\n",
+            self.tee.getResult('result') )
+
+    def test_subprocessOutputIsNotDelayed(self):
+        self.tee.flush()
+        child = subprocess.Popen(
+            [sys.executable, '-u', '-c',
+             'import time; print("now"); time.sleep(5)'],
+            stdout=self.tee )
+        try:
+            #The child is still running, so the line must be read
+            #  as it is written
+            deadline = time.time() + 4
+            while "now\n" not in self.actual.contents() \
+                and time.time() < deadline:
+                self.actual.written.wait(.5)
+                self.actual.written.clear()
+            self.assertEqual("now\n", self.actual.contents())
+            self.assertIsNone(child.poll())
+        finally:
+            child.kill()
+            child.wait()
+
+    def test_resultsPerThread(self):
+        def writer(name):
+            self.tee.startResult(name)
+            for count in range(100):
+                self.tee.write("%s %d\n" % (name, count))
+            subprocess.check_call(['echo', name], stdout=self.tee)
+            self.tee.endResult(name)
+        threads = [
+            threading.Thread(target=writer, args=("thread%d" % x,))
+            for x in range(8) ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for x in range(8):
+            name = "thread%d" % x
+            expected = "".join(
+                [ "%s %d\n" % (name, count) for count in range(100) ] )
+            expected += "%s\n" % name
+            self.assertEqual(
+                expected.encode('utf8'),
+                self.tee.getResult(name) )
+
+    def test_resultLimitKeepsHeadAndTail(self):
+        self.tee.setResultLimit(20)
+        self.tee.segmentSize = 16
+        self.tee.startResult('result')
+        self.tee.write("0123456789")
+        self.tee.write("x" * 1000)
+        self.tee.write("abcdefghij")
+        self.tee.endResult('result')
+        self.tee.startResult('small')
+        self.tee.write("small")
+        self.tee.endResult('small')
+        self.assertEqual(
+            b"0123456789\n... 1000 bytes of output omitted ...\nabcdefghij",
+            self.tee.getResult('result') )
+        self.assertEqual(b"small", self.tee.getResult('small'))
+        self.assertEqual(1025, len(self.actual.contents()))
+
+    def test_unneededSegmentsAreRemoved(self):
+        self.tee.setResultLimit(100)
+        self.tee.segmentSize = 64
+        self.tee.write("no result")
+        self.tee.startResult('result')
+        for count in range(1000):
+            self.tee.write("line %d\n" % count)
+        subprocess.check_call(
+            [sys.executable, '-c', 'print("x" * 10000)'],
+            stdout=self.tee )
+        channel = self.tee._locals.channel
+        #Head, tail, and the segments either side of them
+        self.assertTrue(len(os.listdir(channel.directory)) <= 6)
+        self.tee.endResult('result')
+        result = self.tee.getResult('result')
+        self.assertTrue(result.startswith(b"line 0\nline 1\n"))
+        self.assertTrue(result.endswith(b"x" * 40 + b"\n"))
+
+    def test_releasedResultsDontKeepSegments(self):
+        self.tee.setResultLimit(100)
+        self.tee.segmentSize = 64
+        self.tee.startResult('failed')
+        self.tee.write("failure output\n")
+        self.tee.endResult('failed')
+        for count in range(500):
+            name = 'small%d' % count
+            self.tee.startResult(name)
+            self.tee.write("step %d\n" % count)
+            self.tee.endResult(name)
+            self.tee.releaseResult(name)
+        channel = self.tee._locals.channel
+        #The failed result's segment and the current one
+        self.assertTrue(len(os.listdir(channel.directory)) <= 3)
+        self.assertEqual(1, len(channel.results))
+        self.assertEqual(b"failure output\n", self.tee.getResult('failed'))
+        with self.assertRaises(KeyError):
+            self.tee.getResult('small0')
+
+    def test_endAllRemovesOutput(self):
+        self.tee.startResult('result')
+        self.tee.write("output")
+        tempdir = self.tee.tempdir
+        self.assertTrue(os.path.isdir(tempdir))
+        self.tee.endAll()
+        self.assertFalse(os.path.exists(tempdir))
+        #endAll closes the stream the output was going to
+        self.tee.subsumeStream(testOutputTee_basic.CapturingStream())
+        self.tee.write("more")
+        self.assertNotEqual(tempdir, self.tee.tempdir)
+        self.assertTrue(os.path.isdir(self.tee.tempdir))
@@ -0,0 +1,225 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+#Packaging benchmark: archives synthetic trees of 1k, 10k and 100k files
+#  through Packager's data archive methods, with the archive directory
+#  bookkeeping as it is now, and looking up every parent directory with
+#  TarFile.getmember (the way it was done before).
+#  The getmember version is quadratic, so it's only run up to
+#  --old-limit files (10000 by default)
+#  It also times the per file aspect dispatch of _executePreppedMapping
+#  for 50k files with a few file-type-dispatch aspects registered, with
+#  the compiled dispatch and mapping overlays, and with a scan of the
+#  registrations and a deep copy of the mapping (the way it was done before).
+#  And it times resolving installmap path keys with several alternatives
+#  each, one key at a time in reference order, and by expanding every key
+#  against every combination of every key's paths (the way it was done before).
+#  Run with: python3 CsmakeCore/tests/Packager/benchPackager.py [--old-limit=N]
+import copy
+import io
+import os
+import os.path
+import sys
+import tarfile
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..') )
+from CsmakeModules.Packager import Packager
+
+class QuietLog:
+    def devdebug(self, *args):
+        pass
+
+class BenchPackager(Packager):
+    def __init__(self, archive):
+        #Only the state the data archive methods use
+        self.log = QuietLog()
+        self.archive = archive
+        self.archiveDirectories = {}
+
+class GetmemberPackager(BenchPackager):
+    def _ensureArchivePath(self, archive, info):
+        path, filename = os.path.split(info.name)
+        dirmode = self._getDirectoryMode(info.mode)
+
+        def pathHelper(curpath):
+            if curpath is None or len(curpath) == 0 or curpath == '/':
+                return
+            try:
+                archive.getmember(curpath)
+                return
+            except KeyError:
+                pathHelper(os.path.split(curpath)[0])
+                dirinfo = tarfile.TarInfo(curpath)
+                dirinfo.type = tarfile.DIRTYPE
+                dirinfo.mode = dirmode
+                archive.addfile(dirinfo)
+        pathHelper(path)
+
+def syntheticTree(files, interleaved):
+    #100 files to a directory, 10 directories to a parent directory
+    #  interleaved spreads consecutive files over all of the directories,
+    #  the way several mappings into the same directories do
+    directories = max(1, files // 100)
+    for number in range(files):
+        if interleaved:
+            directory = number % directories
+        else:
+            directory = number // 100
+        yield "usr/share/bench/d%d/d%d/f%d" % (
+            directory // 10,
+            directory,
+            number )
+
+def run(packagerClass, files, interleaved):
+    content = b'x' * 64
+    with tempfile.TemporaryFile() as archiveFile:
+        archive = tarfile.open(fileobj=archiveFile, mode='w')
+        packager = packagerClass(archive)
+        start = time.time()
+        for name in syntheticTree(files, interleaved):
+            info = tarfile.TarInfo(name)
+            info.mode = 0o644
+            packager._addFileObjToArchive(io.BytesIO(content), info)
+        archive.close()
+        elapsed = time.time() - start
+        archiveFile.seek(0)
+        with tarfile.open(fileobj=archiveFile, mode='r') as check:
+            names = check.getnames()
+        assert len(names) == len(set(names))
+    return elapsed
+
+def scanDispatch(dispatch, sourceIndex):
+    aspects = []
+    for indexes, aspect, aspectOptions in dispatch:
+        if type(indexes) == str:
+            if indexes == '*':
+                aspects.append((aspect, aspectOptions))
+            continue
+        for index in indexes:
+            hit = True
+            for key, value in index.items():
+                if key not in sourceIndex or sourceIndex[key] != value:
+                    hit = False
+                    break
+            if hit:
+                aspects.append((aspect, aspectOptions))
+                break
+    return aspects
+
+def runDispatch(compiled, files):
+    dispatch = [
+        ([{'type' : 'python'}], 'python', {}),
+        ([{'type' : 'python', 'intent' : 'test'}], 'tests', {}),
+        ([{'type' : 'man'}, {'id' : 'docs'}], 'docs', {}),
+        ('*', 'all', {}) ]
+    mapping = {
+        'map' : '<vundle> -(1-1)-> {VUNDLE_ROOT}/[~~file~~]',
+        'permissions' : '644',
+        'owner' : ('root', 0),
+        'group' : ('root', 0),
+        'copyright' : {'license' : 'GPLv3+', 'holders' : ['someone']} }
+    start = time.time()
+    fileTypeDispatch = Packager.FileTypeDispatch(dispatch)
+    for number in range(files):
+        source = {
+            'id' : 'bench',
+            'type' : ['python', 'man', 'data'][number % 3],
+            'intent' : 'lib',
+            'location' : 'f%d' % number }
+        if compiled:
+            aspects = fileTypeDispatch.lookup(source)
+            aspectMapping = Packager.MappingOverlay(mapping)
+        else:
+            aspects = scanDispatch(dispatch, source)
+            aspectMapping = copy.deepcopy(mapping)
+        aspectMapping['permissions']
+        aspectMapping['owner']
+        aspectMapping['copyright']
+    return time.time() - start
+
+def combinationResolve(pathkeymaps):
+    pathkeymaps = dict(pathkeymaps)
+    for count in range(len(pathkeymaps)):
+        lookupCombos = [{}]
+        for key, paths in pathkeymaps.items():
+            lookupCombos = [
+                dict(lookup, **{key : path})
+                for path in paths for lookup in lookupCombos ]
+        repeat = False
+        for key, paths in pathkeymaps.items():
+            resolved = set()
+            try:
+                for combo in lookupCombos:
+                    resolved.update([ path % combo for path in paths ])
+            except KeyError:
+                repeat = True
+            pathkeymaps[key] = list(resolved)
+        if not repeat:
+            break
+    return pathkeymaps
+
+def runPathKeys(combinations, alternatives):
+    pathkeymaps = {'root' : ['.']}
+    for key in ['python-lib', 'doc', 'share', 'etc']:
+        pathkeymaps[key] = [
+            '%%(root)s/usr/%s%d' % (key, alternative)
+            for alternative in range(alternatives) ]
+    start = time.time()
+    if combinations:
+        result = combinationResolve(pathkeymaps)
+    else:
+        packager = BenchPackager(None)
+        result = packager._resolvePathKeys(pathkeymaps)
+    assert len(result['doc']) == alternatives
+    return time.time() - start
+
+def main():
+    oldLimit = 10000
+    for arg in sys.argv[1:]:
+        if arg.startswith('--old-limit='):
+            oldLimit = int(arg.split('=', 1)[1])
+    print("%12s %8s %12s %12s" % ("layout", "files", "getmember s", "set s"))
+    for interleaved in [False, True]:
+        for files in [1000, 10000, 100000]:
+            if files <= oldLimit:
+                old = "%12.3f" % run(GetmemberPackager, files, interleaved)
+            else:
+                old = "%12s" % '-'
+            print("%12s %8d %s %12.3f" % (
+                "interleaved" if interleaved else "grouped",
+                files,
+                old,
+                run(BenchPackager, files, interleaved) ))
+    print("%12s %8s %12s %12s" % ("dispatch", "files", "scan s", "compiled s"))
+    print("%12s %8d %12.3f %12.3f" % (
+        "aspects",
+        50000,
+        runDispatch(False, 50000),
+        runDispatch(True, 50000) ))
+    print("%12s %8s %12s %12s" % ("path keys", "choices", "combined s", "resolved s"))
+    for alternatives in [4, 8, 16]:
+        print("%12s %8d %12.3f %12.3f" % (
+            "5 keys",
+            alternatives,
+            runPathKeys(True, alternatives),
+            runPathKeys(False, alternatives) ))
+
+if __name__ == '__main__':
+    main()
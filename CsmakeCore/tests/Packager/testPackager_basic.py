@@ -0,0 +1,194 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import datetime
+import json
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from CsmakeModules.Packager import Packager
+
+ROOT = os.path.abspath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..' ))
+
+class Opaque:
+    #Has the default repr, with its address in it
+    pass
+
+class NoFiles:
+    def iterspecs(self):
+        return []
+
+class ManifestLog:
+    def __init__(self):
+        self.infos = []
+
+    def info(self, message, *args):
+        self.infos.append(message % args)
+
+class ManifestFileManager:
+    def parseFileMap(self, fileMap):
+        return NoFiles()
+
+class ManifestPackager(Packager):
+    def __init__(self, working, **options):
+        #Only the state the package manifest methods use
+        self.log = ManifestLog()
+        self.aspects = []
+        self.filemanager = ManifestFileManager()
+        self.fullPathToArchive = os.path.join(working, 'test-1.0.tar.gz')
+        self.options = {
+            'format' : 'gzip',
+            'package-version' : '1.0',
+            'incremental' : 'True',
+            'maps' : 'test-installs' }
+        self.options.update(options)
+        self.packageMetadata = {
+            'Package' : 'test',
+            'Version' : '1.0',
+            'Keywords' : set(['one', 'two', 'three', 'four', 'five']),
+            'Built' : datetime.date(2026, 1, 2) }
+        self.readymappings = [{
+            'map' : '<sources> -(1-1)-> usr/share/test/[~~file~~]',
+            'owner' : ('root', 0),
+            'group' : ('root', 0),
+            'permissions' : '644',
+            'copyright' : [{'holder' : 'Autumn Patterson'}] }]
+
+    def manifest(self):
+        return self._packageManifest(self.readymappings)
+
+    def build(self):
+        with open(self.fullPathToArchive, 'w') as archive:
+            archive.write(json.dumps(self.options, default=str))
+        self._savePackageManifest(self.manifest())
+
+def manifestInputs():
+    #What the package manifest's inputs are saved as in this process
+    return json.dumps(
+        ManifestPackager(ROOT, extra=Opaque()).manifest()['inputs'],
+        sort_keys=True )
+
+class testPackager_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def _upToDate(self, **options):
+        cut = ManifestPackager(self.working, **options)
+        return cut._packageUpToDate(cut.manifest())
+
+    def test_inputsSameFromRunToRun(self):
+        runs = []
+        for seed in ['1', '2', '3']:
+            env = dict(os.environ)
+            env['PYTHONHASHSEED'] = seed
+            runs.append(subprocess.check_output(
+                [sys.executable, '-c',
+                 'from CsmakeCore.tests.Packager.testPackager_basic '
+                 'import manifestInputs; print(manifestInputs())'],
+                cwd=ROOT,
+                env=env ).decode().strip())
+        self.assertEqual([manifestInputs()] * 3, runs)
+        self.assertNotIn(' at 0x', runs[0])
+
+    def test_manifestInputs(self):
+        self.assertEqual(
+            {'set' : ['a', 'b', 'c'],
+             'tuple' : ['root', 0],
+             'date' : '2026-01-02',
+             'object' : 'Opaque',
+             '1' : [None, True, 1.5] },
+            Packager._manifestInputs({
+                'set' : set(['c', 'a', 'b']),
+                'tuple' : ('root', 0),
+                'date' : datetime.date(2026, 1, 2),
+                'object' : Opaque(),
+                1 : [None, True, 1.5] }) )
+
+    def test_packagingPassOptionsNotCompared(self):
+        self.assertEqual(
+            ManifestPackager(self.working).manifest()['inputs'],
+            ManifestPackager(
+                self.working,
+                **{'**packaging-pass' : Opaque(),
+                   '**packaging-format' : 'formats-tarball'}
+            ).manifest()['inputs'] )
+
+    def test_upToDateAfterBuild(self):
+        self.assertFalse(self._upToDate())
+        ManifestPackager(self.working).build()
+        self.assertTrue(self._upToDate())
+
+    def test_objectsInOptionsUpToDate(self):
+        built = Opaque()
+        ManifestPackager(self.working, extra=built).build()
+        self.assertTrue(self._upToDate(extra=Opaque()))
+
+    def test_changedOptionNotUpToDate(self):
+        ManifestPackager(self.working).build()
+        cut = ManifestPackager(self.working, level='1')
+        self.assertFalse(cut._packageUpToDate(cut.manifest()))
+        self.assertEqual(["Package manifest 'inputs' changed"], cut.log.infos)
+
+    def test_changedMetadataNotUpToDate(self):
+        ManifestPackager(self.working).build()
+        cut = ManifestPackager(self.working)
+        cut.packageMetadata['Keywords'].add('six')
+        self.assertFalse(cut._packageUpToDate(cut.manifest()))
+
+    def test_changedPackageNotUpToDate(self):
+        ManifestPackager(self.working).build()
+        cut = ManifestPackager(self.working)
+        with open(cut.fullPathToArchive, 'a') as archive:
+            archive.write('changed')
+        self.assertFalse(cut._packageUpToDate(cut.manifest()))
+
+    def test_aspectsTurnOffIncremental(self):
+        cut = ManifestPackager(self.working)
+        self.assertTrue(cut._incrementalPackaging())
+        cut.aspects = [(Opaque(), {})]
+        self.assertFalse(cut._incrementalPackaging())
+        self.assertFalse(
+            ManifestPackager(self.working, incremental='False')._incrementalPackaging() )
+
+    def test_failedBuildLeavesNoManifest(self):
+        ManifestPackager(self.working).build()
+        cut = ManifestPackager(self.working, level='1')
+        for method in ['_doMetadataMappings', '_startFormats',
+                       '_setupPackage', '_doMaps', '_handleControls']:
+            setattr(cut, method, lambda *args: None)
+        cut._prepareMaps = lambda: cut.readymappings
+        cut._finishPackage = lambda: False
+        self.assertFalse(cut._buildPackage([]))
+        self.assertFalse(os.path.exists(cut._packageManifestPath()))
+
+    def test_manifestModeFollowsUmask(self):
+        previous = os.umask(0o022)
+        try:
+            ManifestPackager(self.working).build()
+        finally:
+            os.umask(previous)
+        self.assertEqual(
+            0o644,
+            os.stat(ManifestPackager(self.working)._packageManifestPath()).st_mode & 0o777 )
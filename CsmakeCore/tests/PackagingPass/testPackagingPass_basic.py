@@ -0,0 +1,111 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import hashlib
+import os
+import os.path
+import shutil
+import tempfile
+import unittest
+from PackagingPass import PackagingPass
+
+class testPackagingPass_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.path = os.path.join(self.working, 'data')
+        self._write(self.path, b'first')
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def _write(self, path, contents, mtime=None):
+        with open(path, 'wb') as fileobj:
+            fileobj.write(contents)
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+
+    def _sneakyWrite(self, contents):
+        #Changes the file without changing its size or mtime
+        mtime = os.stat(self.path).st_mtime_ns
+        self._write(self.path, contents, mtime)
+
+    def test_readOnceForEveryPackager(self):
+        cut = PackagingPass(2)
+        data, digests = cut.contents(self.path, [hashlib.md5])
+        self.assertEqual(b'first', data)
+        self.assertEqual([hashlib.md5(b'first').hexdigest()], digests)
+        self._sneakyWrite(b'fresh')
+        data, digests = cut.contents(
+            self.path,
+            [hashlib.sha256, hashlib.md5] )
+        self.assertEqual(b'first', data)
+        self.assertEqual(
+            [hashlib.sha256(b'first').hexdigest(),
+             hashlib.md5(b'first').hexdigest()],
+            digests )
+        #Every packager has read it, so it isn't kept any longer
+        self.assertEqual(0, cut.cached)
+        data, digests = cut.contents(self.path)
+        self.assertEqual(b'fresh', data)
+
+    def test_changedFileIsReadAgain(self):
+        cut = PackagingPass(2)
+        cut.contents(self.path)
+        self._write(self.path, b'changed')
+        data, digests = cut.contents(self.path)
+        self.assertEqual(b'changed', data)
+
+    def test_oldestContentsAreDropped(self):
+        cut = PackagingPass(2)
+        other = os.path.join(self.working, 'other')
+        self._write(other, b'second')
+        cacheSize = PackagingPass.CACHE_SIZE
+        PackagingPass.CACHE_SIZE = len(b'first') + 1
+        try:
+            cut.contents(self.path)
+            cut.contents(other)
+        finally:
+            PackagingPass.CACHE_SIZE = cacheSize
+        self.assertEqual(len(b'second'), cut.cached)
+        self._sneakyWrite(b'fresh')
+        self.assertEqual(b'fresh', cut.contents(self.path)[0])
+
+    def test_bigFilesAreNotKept(self):
+        cut = PackagingPass(2)
+        fileLimit = PackagingPass.FILE_LIMIT
+        PackagingPass.FILE_LIMIT = 2
+        try:
+            self.assertIsNone(cut.contents(self.path))
+        finally:
+            PackagingPass.FILE_LIMIT = fileLimit
+
+    def test_mapsAreLaunchedOnce(self):
+        cut = PackagingPass(3)
+        launched = []
+        def launch(step):
+            launched.append(step)
+            return {'step' : step}
+        self.assertEqual({'step' : 'maps'}, cut.mapDefinitions('maps', launch))
+        self.assertEqual({'step' : 'maps'}, cut.mapDefinitions('maps', launch))
+        self.assertEqual({'step' : 'more'}, cut.mapDefinitions('more', launch))
+        self.assertEqual(['maps', 'more'], launched)
+
+    def test_waitForFormats(self):
+        cut = PackagingPass(3)
+        cut.formatStarted('tarball')
+        cut.formatStarted('rpm')
+        cut.waitForFormats(['rpm', 'tarball'])
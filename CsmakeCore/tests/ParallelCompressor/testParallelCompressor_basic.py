@@ -0,0 +1,101 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import io
+import lzma
+import os
+import os.path
+import random
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zlib
+from ParallelCompressor import ParallelCompressor, CompressedTarFile
+
+class testParallelCompressor_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        generator = random.Random(7)
+        words = [b'csmake ', b'package ', b'data ']
+        self.data = b''.join([
+            generator.choice(words) + bytes([generator.randrange(256)])
+            for count in range(60000) ])
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def _compress(self, compression, threads, blockSize):
+        path = os.path.join(self.working, 'out.%s' % compression)
+        cut = ParallelCompressor.create(
+            path,
+            compression,
+            threads,
+            1,
+            blockSize )
+        for start in range(0, len(self.data), 5000):
+            cut.write(self.data[start:start+5000])
+        cut.close()
+        with open(path, 'rb') as result:
+            return result.read()
+
+    def test_xzIsOneStreamOfBlocks(self):
+        result = self._compress('xz', 3, 16*1024)
+        self.assertEqual(self.data, lzma.decompress(result))
+        #Only one stream header and footer
+        self.assertEqual(1, result.count(b'\xfd7zXZ\x00'))
+        self.assertEqual(b'YZ', result[-2:])
+        self.assertEqual(result, self._compress('xz', 1, 16*1024))
+
+    def test_gzipIsOneMember(self):
+        result = self._compress('gz', 3, 16*1024)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual(self.data, decompressor.decompress(result))
+        self.assertTrue(decompressor.eof)
+        self.assertEqual(b'', decompressor.unused_data)
+        self.assertEqual(result, self._compress('gz', 1, 16*1024))
+
+    def test_emptyInput(self):
+        self.data = b''
+        self.assertEqual(b'', lzma.decompress(self._compress('xz', 2, None)))
+        self.assertEqual(
+            b'',
+            zlib.decompress(self._compress('gz', 2, None), 16 + zlib.MAX_WBITS) )
+
+    def test_compressedTarFileReadsBack(self):
+        path = os.path.join(self.working, 'out.tar.xz')
+        archive = CompressedTarFile.create(
+            path,
+            'xz',
+            2,
+            1,
+            format=tarfile.USTAR_FORMAT )
+        info = tarfile.TarInfo('dir/data')
+        info.size = len(self.data)
+        archive.addfile(info, io.BytesIO(self.data))
+        archive.close()
+        with tarfile.open(path) as check:
+            self.assertEqual(['dir/data'], check.getnames())
+            self.assertEqual(self.data, check.extractfile('dir/data').read())
+
+    def test_unknownCompression(self):
+        self.assertRaises(
+            ValueError,
+            ParallelCompressor.create,
+            os.path.join(self.working, 'out.bz2'),
+            'bz2',
+            2 )
@@ -0,0 +1,189 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import json
+import os
+import os.path
+import runpy
+import shutil
+import tempfile
+import unittest
+import CsmakeCore._vendor.coverage as coverage
+from CsmakeCore.PythonTestImpact import PythonTestImpact
+
+ONE = '''def one():
+    return 1
+'''
+
+TWO = '''def two():
+    return 2
+'''
+
+CONSTANT = '''VALUE = 3
+'''
+
+TESTS = ['t.one', 't.two', 't.both']
+
+class testPythonTestImpact_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.source = os.path.join(self.working, 'source')
+        os.makedirs(self.source)
+        self.files = {}
+        for name, contents in [
+                ('one', ONE), ('two', TWO), ('constant', CONSTANT) ]:
+            self.files[name] = os.path.join(self.source, name + '.py')
+            with open(self.files[name], 'w') as sourceFile:
+                sourceFile.write(contents)
+        self.outside = os.path.join(self.working, 'outside.py')
+        with open(self.outside, 'w') as outsideFile:
+            outsideFile.write(ONE)
+        self.mapFile = os.path.join(self.working, 'map', 'tests.json')
+        self.cover = coverage.Coverage(
+            branch=True,
+            data_file=None,
+            include=[os.path.join(self.working, '*')] )
+
+    def tearDown(self):
+        self.cover.erase()
+        shutil.rmtree(self.working)
+
+    def _measure(self, tests=TESTS):
+        self.cover.start()
+        try:
+            one = runpy.run_path(self.files['one'])['one']
+            two = runpy.run_path(self.files['two'])['two']
+            outside = runpy.run_path(self.outside)['one']
+            runpy.run_path(self.files['constant'])
+            calls = {
+                't.one' : [one, outside],
+                't.two' : [two],
+                't.both' : [one, two] }
+            for test in tests:
+                self.cover.switch_context(test)
+                for call in calls[test]:
+                    call()
+            self.cover.switch_context('')
+        finally:
+            self.cover.stop()
+        return self.cover.get_data()
+
+    def _record(self, failed=[]):
+        impact = PythonTestImpact(self.mapFile, self.source)
+        impact.select(TESTS)
+        impact.record(self._measure(), failed)
+
+    def _select(self, tests=TESTS):
+        return PythonTestImpact(self.mapFile, self.source).select(tests)
+
+    def _change(self, name):
+        with open(self.files[name], 'a') as sourceFile:
+            sourceFile.write('#changed\n')
+
+    def _map(self):
+        with open(self.mapFile) as mapFile:
+            return json.load(mapFile)
+
+    def test_everyTestWithoutMap(self):
+        impact = PythonTestImpact(self.mapFile, self.source)
+        self.assertFalse(impact.hasBaseline())
+        self.assertEqual(set(TESTS), impact.select(TESTS))
+
+    def test_recordKeepsLinesOfSources(self):
+        self._record()
+        tests = self._map()['tests']
+        self.assertEqual([self.files['one']], list(tests['t.one']))
+        self.assertIn(2, tests['t.one'][self.files['one']])
+        self.assertEqual(
+            sorted([self.files['one'], self.files['two']]),
+            sorted(tests['t.both']) )
+        self.assertNotIn(3, tests['t.both'][self.files['two']])
+        self.assertEqual(
+            sorted(self.files.values()),
+            sorted(self._map()['files']) )
+
+    def test_nothingChangedSelectsNothing(self):
+        self._record()
+        self.assertEqual(set(), self._select())
+        self.assertEqual(set(), self._select(TESTS[:1]))
+
+    def test_changedSelectsCoveringTests(self):
+        self._record()
+        self._change('two')
+        self.assertEqual(
+            set(['t.two', 't.both', 't.new']),
+            self._select(TESTS + ['t.new']) )
+
+    def test_failedAreSelectedAgain(self):
+        self._record(['t.one', 't.gone'])
+        self.assertEqual(['t.one'], self._map()['failed'])
+        self.assertEqual(set(['t.one']), self._select())
+
+    def test_unattributedChangeSelectsEverything(self):
+        self._record()
+        self._change('constant')
+        self.assertEqual(set(TESTS), self._select())
+
+    def test_changesOutsideSourcesIgnored(self):
+        self._record()
+        with open(self.outside, 'a') as outsideFile:
+            outsideFile.write('#changed\n')
+        self.assertEqual(set(), self._select())
+
+    def test_recordKeepsTestsNotRun(self):
+        self._record()
+        self._change('one')
+        impact = PythonTestImpact(self.mapFile, self.source)
+        self.assertEqual(set(['t.one']), impact.select(TESTS[:2]))
+        impact.record(self._measure(['t.one']), [])
+        tests = self._map()['tests']
+        self.assertEqual(['t.one', 't.two'], sorted(tests))
+        self.assertEqual([self.files['two']], list(tests['t.two']))
+        self.assertEqual(set(), self._select(TESTS[:2]))
+
+    def test_coverageOfEveryTestKept(self):
+        impact = PythonTestImpact(self.mapFile, self.source)
+        self.assertEqual(None, impact.lastCoverage())
+        impact.select(TESTS)
+        self.assertTrue(impact.selectedEverything())
+        classes = [{'filename' : 'one.py', 'line-rate' : '1'}]
+        impact.record(self._measure(), [], (90.0, classes))
+        self._change('one')
+        impact = PythonTestImpact(self.mapFile, self.source)
+        impact.select(TESTS)
+        self.assertFalse(impact.selectedEverything())
+        impact.record(self._measure(['t.one', 't.both']), [])
+        self.assertEqual(
+            (90.0, classes),
+            PythonTestImpact(self.mapFile, self.source).lastCoverage() )
+
+    def test_filterKeepsSuites(self):
+        class Sample(unittest.TestCase):
+            def runTest(self):
+                pass
+        tests = [ Sample() for x in range(3) ]
+        for index, test in enumerate(tests):
+            test.id = lambda index=index: 'sample%d' % index
+        suite = unittest.TestSuite([
+            unittest.TestSuite(tests[:1]),
+            unittest.TestSuite(tests[1:]) ])
+        testIds = list(PythonTestImpact.allTestIds(suite))
+        self.assertEqual(3, len(testIds))
+        filtered = PythonTestImpact.filter(suite, [tests[2].id()])
+        self.assertEqual(
+            [0, 1],
+            [ test.countTestCases() for test in filtered ] )
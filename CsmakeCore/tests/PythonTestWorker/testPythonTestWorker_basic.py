@@ -0,0 +1,169 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import glob
+import os
+import os.path
+import shutil
+import tempfile
+import unittest
+import CsmakeCore._vendor.coverage as coverage
+from CsmakeCore.PythonTestWorker import PythonTestWorker
+
+SAMPLE = '''
+def answer(value):
+    if value:
+        return 42
+    return 0
+'''
+
+PASSING = '''
+import unittest
+from sample import answer
+
+class testPassing_basic(unittest.TestCase):
+    def test_answer(self):
+        print("passing writes")
+        self.csmake_test.log.warning("passing logs")
+        self.assertEqual(
+            str(answer(True)),
+            self.csmake_test.options['answer'] )
+'''
+
+FAILING = '''
+import unittest
+from sample import answer
+
+class testFailing_basic(unittest.TestCase):
+    def test_answer(self):
+        self.assertEqual(answer(True), 0)
+
+    def test_other(self):
+        pass
+'''
+
+class testPythonTestWorker_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.source = os.path.join(self.working, 'source')
+        self.tests = os.path.join(self.source, 'workertests')
+        os.makedirs(self.tests)
+        for path, contents in [
+                (os.path.join(self.source, 'sample.py'), SAMPLE),
+                (os.path.join(self.tests, '__init__.py'), ''),
+                (os.path.join(self.tests, 'testPassing_basic.py'), PASSING),
+                (os.path.join(self.tests, 'testFailing_basic.py'), FAILING) ]:
+            with open(path, 'w') as sourceFile:
+                sourceFile.write(contents)
+        self.options = {
+            'test-dir' : self.tests,
+            'test' : 'test*_*.py',
+            'source-dir' : self.source,
+            'answer' : '42',
+            '**notastring' : object() }
+        self.settings = dict([
+            (key, False) for key in PythonTestWorker.LOG_SETTINGS ])
+        self.dataFile = os.path.join(self.working, '.coverage')
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def _suite(self, counts):
+        return unittest.TestSuite([
+            unittest.TestSuite([
+                unittest.FunctionTestCase(lambda: None)
+                for test in range(count) ])
+            for count in counts ])
+
+    def test_shardBalancesTests(self):
+        shards = PythonTestWorker.shard(self._suite([5, 1, 3, 1, 2]), 2)
+        self.assertEqual([[0, 1], [2, 3, 4]], shards)
+
+    def test_shardNoMoreThanModules(self):
+        self.assertEqual(
+            [[0], [1]],
+            PythonTestWorker.shard(self._suite([1, 1]), 4) )
+        self.assertEqual([], PythonTestWorker.shard(self._suite([]), 4))
+
+    def test_startRunsShard(self):
+        worker = PythonTestWorker(
+            self.options,
+            self.settings,
+            {'Type' : 'TestPython', 'Id' : 'worker-test'},
+            self.dataFile )
+        #The suites are discovered for the workertests package,
+        #  then testFailing_basic, then testPassing_basic
+        output, run, successful, errors, failures = worker.start(
+            [1],
+            os.path.join(self.working, 'worker0') )
+        self.assertEqual(2, run)
+        self.assertFalse(successful)
+        self.assertEqual([], errors)
+        self.assertEqual(
+            ['workertests.testFailing_basic.testFailing_basic.test_answer'],
+            [ test for test, trace in failures ] )
+        self.assertIn('test_other', output)
+        self.assertNotIn('testPassing', output)
+
+    def test_startGivesContextAndCoverage(self):
+        worker = PythonTestWorker(
+            self.options,
+            self.settings,
+            {'Type' : 'TestPython', 'Id' : 'worker-test'},
+            self.dataFile )
+        output, run, successful, errors, failures = worker.start(
+            [0, 1, 2],
+            os.path.join(self.working, 'worker0') )
+        self.assertEqual(3, run)
+        self.assertIn('passing writes', output)
+        self.assertIn(
+            'TestPython@worker-test: WARNING  : passing logs',
+            output )
+        dataFiles = glob.glob(self.dataFile + '.*')
+        self.assertEqual(1, len(dataFiles))
+        cover = coverage.Coverage(data_file=self.dataFile)
+        self.addCleanup(cover.erase)
+        cover.combine([self.working])
+        sample = os.path.join(self.source, 'sample.py')
+        self.assertEqual(
+            [2, 3, 4],
+            sorted(cover.get_data().lines(sample)) )
+
+    def test_startRunsSelectedInContexts(self):
+        selected = 'workertests.testFailing_basic.testFailing_basic.test_answer'
+        worker = PythonTestWorker(
+            self.options,
+            self.settings,
+            {'Type' : 'TestPython', 'Id' : 'worker-test'},
+            self.dataFile,
+            set([selected]) )
+        output, run, successful, errors, failures = worker.start(
+            [0, 1, 2],
+            os.path.join(self.working, 'worker0') )
+        self.assertEqual(1, run)
+        self.assertNotIn('test_other', output)
+        cover = coverage.Coverage(data_file=self.dataFile)
+        self.addCleanup(cover.erase)
+        cover.combine([self.working])
+        data = cover.get_data()
+        self.assertIn(selected, data.measured_contexts())
+        data.set_query_context(selected)
+        sample = os.path.join(self.source, 'sample.py')
+        self.assertIn(4, data.lines(sample))
+        self.assertNotIn(5, data.lines(sample))
+        data.set_query_context('')
+        self.assertNotIn(4, data.lines(sample))
@@ -0,0 +1,76 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+#Micro-benchmark for the per-step section and aspect lookup cost
+#  against the number of sections in the build specification
+#  Run with: python3 CsmakeCore/tests/SectionIndex/benchSectionIndex.py
+import configparser
+import os.path
+import sys
+import timeit
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..') )
+from SectionIndex import SectionIndex
+
+def scanLookup(buildspec, step):
+    #The lookup done by scanning every section for every step
+    for section in buildspec.sections():
+        if section[0] == '&':
+            continue
+        parts = section.split('@')
+        if len(parts) == 2 and parts[1] == step:
+            break
+    result = []
+    for section in buildspec.sections():
+        if section[0] != '&':
+            continue
+        parts = section.split('@')
+        if len(parts) == 2 and parts[1].split(' ')[0] == step:
+            result.append(section)
+    return result
+
+def indexLookup(index, step):
+    index.lookupSection(step)
+    return index.lookupAspects(step)
+
+def main():
+    lookups = 1000
+    print("%8s %14s %14s" % ("sections", "scan us/step", "index us/step"))
+    for count in [10, 100, 1000, 3000, 10000]:
+        buildspec = configparser.RawConfigParser()
+        buildspec.optionxform = str
+        for number in range(count):
+            buildspec.add_section("Shell@step%d" % number)
+            if number % 10 == 0:
+                buildspec.add_section("&Retry@step%d" % number)
+        index = SectionIndex()
+        index.add(buildspec.sections())
+        steps = [ "step%d" % (x * count // lookups) for x in range(lookups) ]
+        scan = timeit.timeit(
+            lambda: [ scanLookup(buildspec, step) for step in steps ],
+            number=1 )
+        indexed = timeit.timeit(
+            lambda: [ indexLookup(index, step) for step in steps ],
+            number=1 )
+        print("%8d %14.2f %14.2f" % (
+            count,
+            scan * 1000000 / lookups,
+            indexed * 1000000 / lookups ) )
+
+if __name__ == '__main__':
+    main()
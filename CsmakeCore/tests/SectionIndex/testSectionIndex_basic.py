@@ -0,0 +1,65 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import unittest
+from SectionIndex import SectionIndex
+
+class testSectionIndex_basic(unittest.TestCase):
+
+    def test_lookupSectionById(self):
+        index = SectionIndex()
+        index.add(['command@build', 'Shell@compile', '~~phases~~'])
+        self.assertEqual('command@build', index.lookupSection('build'))
+        self.assertEqual('Shell@compile', index.lookupSection('compile'))
+        self.assertIsNone(index.lookupSection('missing'))
+        self.assertIsNone(index.lookupSection('~~phases~~'))
+
+    def test_firstSectionWins(self):
+        index = SectionIndex()
+        index.add(['Shell@step', 'command@step'])
+        index.add(['Shell@step', 'command@step', 'Other@step'])
+        self.assertEqual('Shell@step', index.lookupSection('step'))
+
+    def test_aspectsAreNotSteps(self):
+        index = SectionIndex()
+        index.add(['&Aspect@step', 'Shell@step'])
+        self.assertEqual('Shell@step', index.lookupSection('step'))
+
+    def test_lookupAspects(self):
+        index = SectionIndex()
+        index.add([
+            '&Retry@step',
+            'Shell@step',
+            '&Logger@step myid',
+            '&Logger@other',
+            'Shell@other' ])
+        self.assertEqual(
+            ['&Retry@step', '&Logger@step myid'],
+            index.lookupAspects('step') )
+        self.assertEqual(['&Logger@other'], index.lookupAspects('other'))
+        self.assertEqual([], index.lookupAspects('missing'))
+
+    def test_incrementalAdd(self):
+        index = SectionIndex()
+        index.add(['&Retry@step', 'Shell@step'])
+        index.add(['&Retry@step', 'Shell@step', '&Logger@step'])
+        self.assertEqual(
+            ['&Retry@step', '&Logger@step'],
+            index.lookupAspects('step') )
+        index.add(['command@~~multicommand~~'])
+        self.assertEqual(
+            'command@~~multicommand~~',
+            index.lookupSection('~~multicommand~~') )
@@ -0,0 +1,129 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import os
+import os.path
+import shutil
+import tempfile
+import unittest
+from StepCache import StepCache
+
+class testStepCache_basic(unittest.TestCase):
+
+    class FakeLog:
+        def devdebug(self, *args):
+            pass
+
+        def info(self, *args):
+            pass
+
+    class FakeEnv:
+        def __init__(self, results):
+            self.env = {'RESULTS' : results}
+
+    class FakeFile:
+        def __init__(self, location):
+            self.index = {'location' : location}
+
+    class FakeModule:
+        def __init__(self, results, inputs, outputs):
+            self.log = testStepCache_basic.FakeLog()
+            self.env = testStepCache_basic.FakeEnv(results)
+            self.calledId = 'Fake@step'
+            self.aspects = []
+            self.mapping = None
+            self.newfiles = [
+                testStepCache_basic.FakeFile(x) for x in inputs ]
+            self.yieldsfiles = [ {'location' : x} for x in outputs ]
+
+        def _ensureDirectoryExists(self, path):
+            directory = os.path.dirname(path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.results = os.path.join(self.tempdir, 'target')
+        os.makedirs(self.results)
+        self.cache = StepCache(os.path.join(self.tempdir, 'cache'), '1.0')
+        self.input = os.path.join(self.tempdir, 'input.txt')
+        self.output = os.path.join(self.results, 'output.txt')
+        self._write(self.input, "input")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _write(self, path, content):
+        with open(path, 'w') as fileobj:
+            fileobj.write(content)
+
+    def _read(self, path):
+        with open(path) as fileobj:
+            return fileobj.read()
+
+    def _module(self):
+        return testStepCache_basic.FakeModule(
+            self.results,
+            [self.input],
+            [self.output] )
+
+    def test_keyTracksInputsAndOptions(self):
+        module = self._module()
+        key = self.cache.stepKey(module, 'Fake@step', 'build', {'a':'1'})
+        self.assertIsNotNone(key)
+        self.assertEqual(
+            key,
+            self.cache.stepKey(module, 'Fake@step', 'build', {'a':'1'}) )
+        self.assertNotEqual(
+            key,
+            self.cache.stepKey(module, 'Fake@step', 'build', {'a':'2'}) )
+        self.assertNotEqual(
+            key,
+            self.cache.stepKey(module, 'Fake@step', 'clean', {'a':'1'}) )
+        self._write(self.input, "changed")
+        self.assertNotEqual(
+            key,
+            self.cache.stepKey(module, 'Fake@step', 'build', {'a':'1'}) )
+
+    def test_storeAndRestore(self):
+        module = self._module()
+        key = self.cache.stepKey(module, 'Fake@step', 'build', {})
+        self.assertFalse(self.cache.restore(key, module))
+        self._write(self.output, "output")
+        os.chmod(self.output, 0o755)
+        self.assertTrue(self.cache.store(key, module))
+        os.remove(self.output)
+        self.assertTrue(self.cache.restore(key, module))
+        self.assertEqual("output", self._read(self.output))
+        self.assertEqual(0o755, os.stat(self.output).st_mode & 0o7777)
+
+    def test_missingOutputIsNotStored(self):
+        module = self._module()
+        key = self.cache.stepKey(module, 'Fake@step', 'build', {})
+        self.assertFalse(self.cache.store(key, module))
+        self.assertFalse(self.cache.restore(key, module))
+
+    def test_notCacheable(self):
+        module = self._module()
+        self.assertIsNone(
+            self.cache.stepKey(module, 'Fake@step', 'build', {'**cache':'False'}) )
+        module.aspects = [(None, {})]
+        self.assertIsNone(
+            self.cache.stepKey(module, 'Fake@step', 'build', {}) )
+        module = self._module()
+        module.yieldsfiles = None
+        self.assertIsNone(
+            self.cache.stepKey(module, 'Fake@step', 'build', {}) )
@@ -0,0 +1,174 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import threading
+import time
+import unittest
+from StepScheduler import StepScheduler
+
+class testStepScheduler_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.order = []
+        self.running = 0
+        self.maxRunning = 0
+
+    def _launcher(self, actions={}):
+        def launch(step):
+            with self.lock:
+                self.running += 1
+                self.maxRunning = max(self.running, self.maxRunning)
+            try:
+                if step in actions:
+                    return actions[step]()
+                return True
+            finally:
+                with self.lock:
+                    self.running -= 1
+                    self.order.append(step)
+        return launch
+
+    def _failed(self, step, result):
+        return not result
+
+    def test_dependenciesRunFirst(self):
+        cut = StepScheduler(4)
+        try:
+            results, failure = cut.runGraph(
+                ['a', 'b', 'c', 'd'],
+                [set(), set([0]), set([0]), set([1,2])],
+                self._launcher(),
+                self._failed )
+        finally:
+            cut.shutdown()
+        self.assertFalse(failure)
+        self.assertEqual([True]*4, results)
+        self.assertEqual('a', self.order[0])
+        self.assertEqual('d', self.order[-1])
+
+    def test_dependentStartsBeforeUnrelatedStepFinishes(self):
+        cut = StepScheduler(2)
+        dependentRan = threading.Event()
+        def slow():
+            return dependentRan.wait(10)
+        def dependent():
+            dependentRan.set()
+            return True
+        try:
+            results, failure = cut.runGraph(
+                ['slow', 'fast', 'dependent'],
+                [set(), set(), set([1])],
+                self._launcher({'slow' : slow, 'dependent' : dependent}),
+                self._failed )
+        finally:
+            cut.shutdown()
+        self.assertFalse(failure)
+        self.assertEqual(['fast', 'dependent', 'slow'], self.order)
+
+    def test_poolIsBounded(self):
+        cut = StepScheduler(2)
+        try:
+            results, failure = cut.runGraph(
+                [str(x) for x in range(20)],
+                [set()]*20,
+                self._launcher(),
+                self._failed )
+        finally:
+            cut.shutdown()
+        self.assertFalse(failure)
+        self.assertEqual(20, len(self.order))
+        #The pool plus the thread driving the graph
+        self.assertTrue(self.maxRunning <= 3)
+        self.assertEqual(2, len(cut.workers))
+
+    def test_nestedGraphsDoNotStarvePool(self):
+        cut = StepScheduler(1)
+        launch = self._launcher()
+        def nested():
+            results, failure = cut.runGraph(
+                ['n1', 'n2', 'n3'],
+                [set(), set(), set()],
+                launch,
+                self._failed )
+            return not failure
+        try:
+            results, failure = cut.runGraph(
+                ['outer1', 'outer2'],
+                [set(), set()],
+                self._launcher({'outer1' : nested, 'outer2' : nested}),
+                self._failed )
+        finally:
+            cut.shutdown()
+        self.assertFalse(failure)
+        self.assertEqual(8, len(self.order))
+
+    def test_driverIsNotInAStepWhilePoolRunsItsSteps(self):
+        #Steps run by the pool find their parent through the driving
+        #  thread, which must not be running one of the steps itself
+        cut = StepScheduler(1)
+        driver = threading.currentThread()
+        driverSteps = []
+        overlapped = []
+        def step():
+            if threading.currentThread() is driver:
+                driverSteps.append(True)
+                time.sleep(.05)
+                driverSteps.pop()
+            else:
+                time.sleep(.01)
+                if len(driverSteps):
+                    overlapped.append(True)
+            return True
+        actions = dict([ (str(x), step) for x in range(6) ])
+        try:
+            results, failure = cut.runGraph(
+                [str(x) for x in range(6)],
+                [set()]*6,
+                self._launcher(actions),
+                self._failed )
+        finally:
+            cut.shutdown()
+        self.assertFalse(failure)
+        self.assertEqual([], overlapped)
+
+    def test_failureStopsStartingSteps(self):
+        cut = StepScheduler(2)
+        try:
+            results, failure = cut.runGraph(
+                ['a', 'b', 'c'],
+                [set(), set([0]), set([1])],
+                self._launcher({'a' : lambda: False}),
+                self._failed )
+        finally:
+            cut.shutdown()
+        self.assertTrue(failure)
+        self.assertEqual(['a'], self.order)
+        self.assertEqual([False, None, None], results)
+
+    def test_keepGoingRunsEverything(self):
+        cut = StepScheduler(2)
+        try:
+            results, failure = cut.runGraph(
+                ['a', 'b', 'c'],
+                [set(), set([0]), set([1])],
+                self._launcher({'a' : lambda: False}),
+                self._failed,
+                True )
+        finally:
+            cut.shutdown()
+        self.assertTrue(failure)
+        self.assertEqual(['a', 'b', 'c'], self.order)
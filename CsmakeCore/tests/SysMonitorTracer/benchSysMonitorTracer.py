@@ -0,0 +1,100 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+#Coverage tracer benchmark: times csmake's own unit tests (the 'test'
+#  command, run through TestPython with branch coverage) with the
+#  sys.monitoring tracer, and with the Python trace function (PyTracer,
+#  forced with coverage's timid setting), and checks that both give the
+#  same coverage reports.
+#  The sys.monitoring tracer needs python 3.12 or later, so run with one:
+#  Run with: python3.12 CsmakeCore/tests/SysMonitorTracer/benchSysMonitorTracer.py [--runs=N]
+import os
+import os.path
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..' )
+
+REPORT_RE = re.compile(r'^(\S+\.py|TOTAL)\s+\d+\s+\d+.*$', re.M)
+
+def runTests(rcfile):
+    env = dict(os.environ)
+    env['COVERAGE_RCFILE'] = rcfile
+    start = time.time()
+    result = subprocess.run(
+        [sys.executable, 'csmake', '--no-chatter', '--command=test', 'test'],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT )
+    elapsed = time.time() - start
+    output = result.stdout.decode('utf-8', 'replace')
+    if result.returncode != 0:
+        sys.stderr.write(output)
+        raise RuntimeError("The tests failed")
+    return elapsed, [
+        match.group(0) for match in REPORT_RE.finditer(output) ]
+
+def main():
+    runs = 3
+    for arg in sys.argv[1:]:
+        if arg.startswith('--runs='):
+            runs = int(arg.split('=', 1)[1])
+    if not hasattr(sys, 'monitoring'):
+        print("python %d.%d has no sys.monitoring, only PyTracer can run" % (
+            sys.version_info[0], sys.version_info[1] ))
+    working = tempfile.mkdtemp()
+    tracers = []
+    try:
+        for name, settings in [
+                ('PyTracer', '[run]\ntimid = True\n'),
+                ('SysMonitorTracer', '[run]\n') ]:
+            if name == 'SysMonitorTracer' and not hasattr(sys, 'monitoring'):
+                continue
+            rcfile = os.path.join(working, name + '.rc')
+            with open(rcfile, 'w') as rc:
+                rc.write(settings)
+            tracers.append((name, rcfile))
+        print("%18s %10s %10s" % ("tracer", "best s", "mean s"))
+        reports = {}
+        for name, rcfile in tracers:
+            times = []
+            for run in range(runs):
+                elapsed, reports[name] = runTests(rcfile)
+                times.append(elapsed)
+            print("%18s %10.2f %10.2f" % (
+                name, min(times), sum(times) / len(times) ))
+        if len(reports) == 2:
+            if reports['PyTracer'] == reports['SysMonitorTracer']:
+                print("Coverage reports are the same")
+            else:
+                print("Coverage reports differ:")
+                for old, new in zip(
+                        reports['PyTracer'],
+                        reports['SysMonitorTracer'] ):
+                    if old != new:
+                        print("  PyTracer:         %s" % old)
+                        print("  SysMonitorTracer: %s" % new)
+    finally:
+        shutil.rmtree(working)
+
+if __name__ == '__main__':
+    main()
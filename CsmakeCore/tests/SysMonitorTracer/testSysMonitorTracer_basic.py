@@ -0,0 +1,190 @@
+# <copyright>
+# (c) Copyright 2026 Autumn Patterson
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# </copyright>
+import os
+import os.path
+import runpy
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+import CsmakeCore._vendor.coverage as coverage
+
+SAMPLE = '''
+import os
+
+def loops(count):
+    total = 0
+    for number in range(count):
+        if number % 2:
+            total += number
+            continue
+        total -= 1
+    while count > 0:
+        count -= 1
+    return total
+
+def conditions(first, second):
+    if first and second:
+        return 1
+    elif first:
+        return 2
+    return 3
+
+def skipped(flag):
+    if flag:
+        flag = flag + 1
+    return flag
+
+def handled(fd):
+    try:
+        os.write(fd, b'x')
+    except (OSError, TypeError):
+        pass
+    finally:
+        if fd is None:
+            fd = 0
+    return fd
+
+def generated(count):
+    for number in range(count):
+        yield number * 2
+
+def mixed(content, key):
+    result = bytearray(
+        a ^ b for a, b in zip(content, key))
+    return result
+
+def released(lock, early):
+    try:
+        if early:
+            return None
+    finally:
+        if lock is not None:
+            lock.release()
+    return lock
+
+loops(5)
+conditions(1, 0)
+conditions(0, 0)
+skipped(0)
+handled(None)
+sum(generated(3))
+mixed(b'ab', b'cd')
+lock = threading.Lock()
+lock.acquire()
+released(lock, False)
+released(None, True)
+sum([ number for number in range(4) if number ])
+worker = threading.Thread(target=conditions, args=(1, 1))
+worker.start()
+worker.join()
+'''
+
+@unittest.skipUnless(
+    hasattr(sys, 'monitoring'),
+    "sys.monitoring needs python 3.12 or later" )
+class testSysMonitorTracer_basic(unittest.TestCase):
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.sample = os.path.join(self.working, 'sample.py')
+        with open(self.sample, 'w') as sampleFile:
+            sampleFile.write(SAMPLE)
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def _measure(self, branch, timid):
+        cover = coverage.Coverage(
+            branch=branch,
+            timid=timid,
+            data_file=None,
+            include=[self.sample] )
+        cover.start()
+        try:
+            runpy.run_path(
+                self.sample,
+                init_globals={'threading' : threading} )
+        finally:
+            cover.stop()
+        analysis = cover._analyze(self.sample)
+        return (
+            cover._collector.tracer_name(),
+            sorted(analysis.statements - analysis.missing),
+            dict(analysis.missing_branch_arcs()) )
+
+    def test_sameBranchCoverageAsPyTracer(self):
+        name, lines, branches = self._measure(True, False)
+        self.assertEqual('SysMonitorTracer', name)
+        self.assertEqual(self._measure(True, True)[1:], (lines, branches))
+
+    def test_sameLineCoverageAsPyTracer(self):
+        name, lines, branches = self._measure(False, False)
+        self.assertEqual('SysMonitorTracer', name)
+        self.assertEqual(self._measure(False, True)[1], lines)
+
+    def test_toolIsGivenBack(self):
+        tool = sys.monitoring.get_tool(sys.monitoring.COVERAGE_ID)
+        self._measure(True, False)
+        self.assertEqual(
+            tool,
+            sys.monitoring.get_tool(sys.monitoring.COVERAGE_ID) )
+
+    def test_measuresAgainAfterRestart(self):
+        cover = coverage.Coverage(data_file=None, include=[self.sample])
+        runs = []
+        for run in range(2):
+            cover.start()
+            try:
+                runpy.run_path(
+                    self.sample,
+                    init_globals={'threading' : threading} )
+            finally:
+                cover.stop()
+            analysis = cover._analyze(self.sample)
+            runs.append(sorted(analysis.statements - analysis.missing))
+            cover.erase()
+        self.assertEqual(runs[0], runs[1])
+        self.assertEqual(self._measure(False, True)[1], runs[1])
+
+    def test_switchedContextsMeasuredAgain(self):
+        cover = coverage.Coverage(
+            branch=True,
+            timid=False,
+            data_file=None,
+            include=[self.sample] )
+        cover.start()
+        try:
+            sample = runpy.run_path(
+                self.sample,
+                init_globals={'threading' : threading} )
+            for context in ['first', 'second']:
+                cover.switch_context(context)
+                sample['loops'](5)
+                sample['conditions'](1, 0)
+            cover.switch_context('')
+        finally:
+            cover.stop()
+        self.assertEqual('SysMonitorTracer', cover._collector.tracer_name())
+        data = cover.get_data()
+        runs = []
+        for context in ['first', 'second']:
+            data.set_query_context(context)
+            runs.append(sorted(data.arcs(self.sample)))
+        self.assertNotEqual([], runs[0])
+        self.assertEqual(runs[0], runs[1])
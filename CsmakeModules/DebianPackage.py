@@ -17,14 +17,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # </copyright>
 from CsmakeModules.Packager import Packager
+from CsmakeCore.ArWriter import ArWriter
 import os
 import os.path
 import email.utils  #For RFC 2822 timestamp
 import gzip
 import sys
-import subprocess
 import io
 import tarfile
+import tempfile
 import hashlib
 
 class DebianPackage(Packager):
@@ -54,6 +55,15 @@ class DebianPackage(Packager):
                    http://www.debian.org/doc/debian-policy/ch-archive.html#s-prioritiesalue ))
                signer - (OPTIONAL) Will create a _gpgorigin using the given
                         signer section.
+               threads - (OPTIONAL) Number of threads to compress the
+                         archives with, or 'auto' for one for every cpu
+                         DEFAULT: 1
+               level - (OPTIONAL) xz compression level, 0-9
+                       DEFAULT: 6
+               incremental - (OPTIONAL) When True, the .deb is only
+                             rebuilt when its manifest changes
+                             (See Packager module)
+                             DEFAULT: False
 
        Joinpoints introduced:  See Packager module
 
@@ -324,6 +334,7 @@ can be found in /usr/share/common-licenses/LGPL-2.1 file.""",
     def _addInfoToControl(self, info):
         self._filePlacingInPackage('control',None,info.name,None)
         self.controlfile.addfile(info)
+        self._recordArchiveDirectory(self.controlfile, info)
 
     def _doMetadataMappings(self):
         if 'arch' in self.options:
@@ -402,12 +413,22 @@ can be found in /usr/share/common-licenses/LGPL-2.1 file.""",
             self.filenameFullVersion,
             self.arch )
 
+    def _packageResultPaths(self):
+        return [os.path.join(self.resultdir, self.fullPackageName)]
+
     def _setupArchive(self):
-        self.fullPathToArchive = os.path.join(
-            self.resultdir,
-            'data.tar.xz' )
+        #Other 'formats' may be building packages in the same result
+        #  directory, so each package's data archive has its own name
         self._ensureDirectoryExists(self.resultdir, True)
-        self.archive = tarfile.open(self.fullPathToArchive, 'w:xz', format=tarfile.USTAR_FORMAT)
+        fd, self.fullPathToArchive = tempfile.mkstemp(
+            dir=self.resultdir,
+            prefix='%s.' % self.fullPackageName,
+            suffix='.data.tar.xz' )
+        os.close(fd)
+        self.archive = self._openArchive(
+            self.fullPathToArchive,
+            'xz',
+            format=tarfile.USTAR_FORMAT )
 
     def _filePlacingInPackage(self, archive, sourcePath, archivePath, contents=None):
         Packager._filePlacingInPackage(self, archive, sourcePath, archivePath, contents)
@@ -418,6 +439,9 @@ can be found in /usr/share/common-licenses/LGPL-2.1 file.""",
             if os.path.isdir(sourcePath):
                 self.log.devdebug("Adding directory: %s", sourcePath)
                 return
+            if self.digestingArchive:
+                #_fileArchivedInPackage gets the md5 as the file is archived
+                return
             with open(sourcePath, 'rb') as content:
                 md5sum = self._fileMD5(content)
         elif contents is not None:
@@ -430,6 +454,17 @@ can be found in /usr/share/common-licenses/LGPL-2.1 file.""",
         else:
             self.log.warning("Neither sourcePath or contents were usable")
             return
+        self._addMD5sum(md5sum, archivePath)
+
+    def _archiveDigestMethods(self, archive):
+        if archive != 'data':
+            return []
+        return [hashlib.md5]
+
+    def _fileArchivedInPackage(self, archive, sourcePath, archivePath, digests):
+        self._addMD5sum(digests[0], archivePath)
+
+    def _addMD5sum(self, md5sum, archivePath):
         self.log.devdebug("Adding md5sum: %s   %s", md5sum, archivePath)
         self._packageControl('md5sums')['entries'].append(
             "%s  %s" % (
@@ -441,15 +476,10 @@ can be found in /usr/share/common-licenses/LGPL-2.1 file.""",
         self._ensureDirectoryExists(self.resultdir, True)
         md5sumsControl = self._packageControl('md5sums')
         md5sumsControl['entries'] = []
-        with open(
-            os.path.join(
-                self.resultdir,
-                'debian-binary' ), 'w' ) as dbfile:
-            dbfile.write('2.0\n')
-        self.fullPathToControl = os.path.join(
-            self.resultdir,
-            'control.tar.xz' )
-        self.controlfile = tarfile.open(self.fullPathToControl, 'w:xz')
+        #The control archive is small, it's kept in memory until
+        #  the .deb is written
+        self.controlBuffer = io.BytesIO()
+        self.controlfile = self._openArchive(self.controlBuffer, 'xz')
 
     def _finishPackage(self):
         #Write any remaining information
@@ -458,10 +488,7 @@ can be found in /usr/share/common-licenses/LGPL-2.1 file.""",
         if result:
             #close control archive
             self.controlfile.close()
-            filelist = [
-                'debian-binary',
-                'control.tar.xz',
-                'data.tar.xz' ]
+            digests = []
             if 'signer' in self.options:
                 idname = self.options['signer']
                 phase = self.engine.getPhase()
@@ -469,22 +496,32 @@ can be found in /usr/share/common-licenses/LGPL-2.1 file.""",
                 if signerResult is None or not signerResult._didPass():
                     raise ValueError("%s step failed" % idname)
                 signer = signerResult._getReturnValue(phase)
-                for f in filelist:
-                    with open(os.path.join(self.resultdir, f)) as target:
-                        buf = target.read(10240)
-                        while len(buf) > 0:
-                            signer.update(buf)
-                            buf = target.read(10240)
-                with open(os.path.join(self.resultdir, '_gpgorigin'), 'w') as g:
-                    g.write(signer.digest())
-                filelist.append('_gpgorigin')
-            command = ['ar', 'rcv', self.fullPackageName] + filelist
-            result = subprocess.call(
-                command,
-                stdout=self.log.out(),
-                stderr=self.log.err(),
-                cwd=self.resultdir )
-            result = result == 0
+                digests.append(signer)
+            self._writeDeb(digests)
         return result
 
+    def _writeDeb(self, digests):
+        #Writes the .deb straight from the control archive in memory
+        #  and the data archive, the signer sees the members as they are
+        #  written.  The data archive can't be written straight into the
+        #  .deb, it comes after the control archive, which isn't done
+        #  until all the data is archived
+        debPath = os.path.join(self.resultdir, self.fullPackageName)
+        self.log.info("Writing '%s'", debPath)
+        with open(debPath, 'wb') as debFile:
+            deb = ArWriter(debFile)
+            deb.addMember('debian-binary', b'2.0\n', digests)
+            deb.addMember(
+                'control.tar.xz',
+                self.controlBuffer.getvalue(),
+                digests )
+            with open(self.fullPathToArchive, 'rb') as dataFile:
+                deb.addMember('data.tar.xz', dataFile, digests)
+            if len(digests) > 0:
+                signature = digests[0].digest()
+                if type(signature) is str:
+                    signature = signature.encode('utf-8')
+                deb.addMember('_gpgorigin', signature)
+        os.remove(self.fullPathToArchive)
+
 
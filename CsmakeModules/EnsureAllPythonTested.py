@@ -41,11 +41,12 @@ class EnsureAllPythonTested(CsmakeAspect):
         fullpath = os.path.normpath(os.path.join(
             self.env.env['WORKING'],
             path ))
-        files = os.listdir(
+        fileSystem = self._getFileSystem()
+        files = fileSystem.listdir(
             fullpath)
         for entry in files:
             current = os.path.join(fullpath, entry)
-            if os.path.isdir(current):
+            if fileSystem.isdir(current):
                 result.update(
                     self._generateSourceDirectoryContents(
                         current,
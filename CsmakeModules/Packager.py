@@ -17,13 +17,25 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # </copyright>
 from CsmakeCore.CsmakeModule import CsmakeModule
+from CsmakeCore.PackagingPass import PackagingPass
+from CsmakeCore.ParallelCompressor import CompressedTarFile
 import tarfile
+import collections
 import copy
+import io
+import itertools
+import json
+import os
 import os.path
+import re
 import shutil
+import stat
 import sys
+import tempfile
+import threading
 import time
 import datetime
+import weakref
 
 class Packager(CsmakeModule):
     """Purpose: Implements the packaging framework
@@ -39,6 +51,25 @@ class Packager(CsmakeModule):
            format - bzip2 or gzip (OPTIONAL)
                     (specific packagers may define other formats)
                     Default will be gzip
+           threads - (OPTIONAL) Number of threads to compress the package
+                     with, or 'auto' for one for every cpu.
+                     Used for gzip and xz compression.
+                     DEFAULT: 1
+           level - (OPTIONAL) Compression level, 0-9 (1-9 for bzip2)
+                   DEFAULT: the default of the compression used
+           incremental - (OPTIONAL) When True, a manifest of what went
+                         into the package is kept beside the package,
+                         and the package isn't rebuilt when nothing in
+                         the manifest changed.  Files are compared by
+                         size and mtime (and by digest with
+                         --rebuild-check=digest)
+                         Not used when aspects are attached to the package
+                         DEFAULT: False
+           formats - (OPTIONAL) Other packager sections to build at the
+                     same time as this package, sharing this package's
+                     packaging pass: installmap steps are run once and
+                     files are read and digested once for all of them.
+                     The sections should use the same 'maps'
            package-version - the version for the package
            maps - points to installmap based sections that
                   define how files should be mapped into the package
@@ -218,6 +249,174 @@ class Packager(CsmakeModule):
         def mapmethod(packager):
             return packager._mapAndAppendClassifiers
 
+    class DigestingReader:
+        """Reads a file for an archive and computes digests of what
+           is read as it goes"""
+        def __init__(self, fileobj, methods):
+            self.fileobj = fileobj
+            self.digests = [ method() for method in methods ]
+
+        def read(self, size=-1):
+            block = self.fileobj.read(size)
+            for digest in self.digests:
+                digest.update(block)
+            return block
+
+        def hexdigests(self):
+            return [ digest.hexdigest() for digest in self.digests ]
+
+    class MappingOverlay(collections.ChainMap):
+        """A copy of a mapping for aspects to change while a file is mapped.
+           Values are only copied from the mapping the first time they
+           are looked up, so the mapping given never changes"""
+        def __init__(self, mapping):
+            collections.ChainMap.__init__(self, {}, mapping)
+
+        IMMUTABLE_TYPES = (str, int, float, bool, bytes, type(None))
+
+        @staticmethod
+        def _isImmutable(value):
+            if type(value) is tuple:
+                for part in value:
+                    if type(part) not in Packager.MappingOverlay.IMMUTABLE_TYPES:
+                        return False
+                return True
+            return type(value) in Packager.MappingOverlay.IMMUTABLE_TYPES
+
+        def __getitem__(self, key):
+            changes = self.maps[0]
+            if key in changes:
+                return changes[key]
+            value = self.maps[1][key]
+            if not self._isImmutable(value):
+                value = copy.deepcopy(value)
+                changes[key] = value
+            return value
+
+    class FileTypeDispatch:
+        """The 'file-type-dispatch' aspect registrations compiled into
+           buckets keyed on the (type, intent, id) the registered file
+           indexes ask for.  A registration that doesn't specify an axis
+           is in the wildcard bucket for that axis"""
+        AXES = ('type', 'intent', 'id')
+        WILDCARD = object()
+
+        def __init__(self, dispatch):
+            self.dispatch = dispatch
+            self.length = len(dispatch)
+            self.aspects = []
+            self.buckets = {}
+            self.hasRemainders = False
+            self.lookups = {}
+            for position, (indexes, aspect, aspectOptions) in enumerate(dispatch):
+                self.aspects.append((aspect, aspectOptions))
+                if type(indexes) == str:
+                    if indexes == '*':
+                        self._addToBucket(
+                            (self.WILDCARD,) * len(self.AXES),
+                            position,
+                            {} )
+                    continue
+                for index in indexes:
+                    self._compileIndex(position, index)
+
+        def _addToBucket(self, key, position, remainder):
+            if len(remainder) > 0:
+                self.hasRemainders = True
+            self.buckets.setdefault(key, []).append((position, remainder))
+
+        def _compileIndex(self, position, index):
+            key = []
+            remainder = {}
+            for axis in self.AXES:
+                if axis in index:
+                    key.append(index[axis])
+                else:
+                    key.append(self.WILDCARD)
+            for indexKey, value in index.items():
+                if indexKey not in self.AXES:
+                    remainder[indexKey] = value
+            try:
+                hash(tuple(key))
+            except TypeError:
+                #Can't be looked up, so compare the whole index
+                key = [self.WILDCARD] * len(self.AXES)
+                remainder = index
+            self._addToBucket(tuple(key), position, remainder)
+
+        def isFor(self, dispatch):
+            return dispatch is self.dispatch and len(dispatch) == self.length
+
+        def lookup(self, sourceIndex):
+            values = []
+            for axis in self.AXES:
+                if axis in sourceIndex:
+                    values.append(sourceIndex[axis])
+                else:
+                    values.append(self.WILDCARD)
+            values = tuple(values)
+            if not self.hasRemainders and values in self.lookups:
+                return self.lookups[values]
+            keys = [()]
+            for value in values:
+                nextKeys = [ key + (self.WILDCARD,) for key in keys ]
+                if value is not self.WILDCARD:
+                    nextKeys.extend([ key + (value,) for key in keys ])
+                keys = nextKeys
+            positions = set()
+            for key in keys:
+                try:
+                    entries = self.buckets.get(key, [])
+                except TypeError:
+                    entries = []
+                for position, remainder in entries:
+                    if position in positions:
+                        continue
+                    hit = True
+                    for indexKey, value in remainder.items():
+                        if indexKey not in sourceIndex \
+                            or sourceIndex[indexKey] != value:
+                            hit = False
+                            break
+                    if hit:
+                        positions.add(position)
+            result = [ self.aspects[position] for position in sorted(positions) ]
+            if not self.hasRemainders:
+                try:
+                    self.lookups[values] = result
+                except TypeError:
+                    pass
+            return result
+
+    class FormatThread(threading.Thread):
+        """Builds one of the 'formats' of a package"""
+        def __init__(self, packager, step):
+            threading.Thread.__init__(self)
+            self.packager = packager
+            self.step = step
+            self.result = None
+            self._parent = threading.currentThread()
+
+        def run(self):
+            try:
+                self.result = self.packager.engine.launchStep(
+                    self.step,
+                    self.packager.engine.getPhase(),
+                    {'**packaging-pass' : self.packager.packagingPass,
+                     '**packaging-format' : self.step } )
+            finally:
+                #The step may have failed before the package started
+                self.packager.packagingPass.formatStarted(self.step)
+
+        def failed(self):
+            return self.result is None or not self.result._didPass()
+
+        def parent(self):
+            return self._parent
+
+    #Size of the reads made to copy files into archives
+    ARCHIVE_READ_SIZE=1024*1024
+
     #Structure is:
     # <Metadata tag for format> : <mapped value class> (above)
     METAMAP_METHODS = {
@@ -328,6 +527,16 @@ class Packager(CsmakeModule):
         CsmakeModule.__init__(self, env, log)
         self.classifiers = None
         self.controls = {}
+        #archive -> set of the directories already in the archive
+        self.archiveDirectories = weakref.WeakKeyDictionary()
+        #True when the file being placed is digested as it is archived
+        self.digestingArchive = False
+        #The compiled 'file-type-dispatch' for _lookupFileTypeAspects
+        self.fileTypeDispatch = None
+        #(aspect, joinpoint) -> True if the aspect implements the joinpoint
+        self.aspectJoinpoints = {}
+        #The PackagingPass shared with the 'formats' of the package
+        self.packagingPass = None
 
     @staticmethod
     def _getCurrentPOSIXTime():
@@ -625,7 +834,7 @@ class Packager(CsmakeModule):
             self.filetype = 'gz'
             ext = 'tar.gz'
         elif self.format == 'bzip2':
-            self.filetype = 'bz'
+            self.filetype = 'bz2'
             ext = 'tar.bz2'
         else:
             self.log.warning("'format' '%s' is not understood defaulting to gzip")
@@ -656,7 +865,67 @@ class Packager(CsmakeModule):
            self.fullPathToArchive - which is the full path to the archive file
            """
         self._ensureDirectoryExists(self.fullPathToArchive)
-        self.archive = tarfile.open(self.fullPathToArchive, 'w:%s' % self.filetype)
+        self.archive = self._openArchive(self.fullPathToArchive, self.filetype)
+
+    def _compressionOptions(self, compression):
+        """Returns the (threads, level) to compress archives with
+           compression ('gz', 'bz2', or 'xz')
+           level is None when the compression's default should be used"""
+        threads = 1
+        level = None
+        if 'threads' in self.options:
+            value = self.options['threads'].strip()
+            if value == 'auto':
+                threads = os.cpu_count() or 1
+            else:
+                try:
+                    threads = int(value)
+                except ValueError:
+                    threads = 0
+                if threads < 1:
+                    raise ValueError(
+                        "'threads' must be a positive number or 'auto': %s" % value)
+        if 'level' in self.options:
+            value = self.options['level'].strip()
+            try:
+                level = int(value)
+            except ValueError:
+                level = -1
+            if compression == 'bz2':
+                if level < 1 or level > 9:
+                    raise ValueError(
+                        "'level' must be 1-9 for bzip2: %s" % value)
+            elif level < 0 or level > 9:
+                raise ValueError("'level' must be 0-9: %s" % value)
+        return (threads, level)
+
+    def _openArchive(self, path, compression, **kwargs):
+        """Opens a tar archive at path for writing compressed with
+           compression ('gz', 'bz2', or 'xz') as the 'threads' and 'level'
+           options specify.  Extra keywords are passed to the TarFile
+           path may also be a file object to write the archive to,
+           which is left open when the archive is closed"""
+        threads, level = self._compressionOptions(compression)
+        if type(path) is not str:
+            kwargs['fileobj'] = path
+            path = None
+            threads = 1
+        if threads > 1 and compression in ['gz', 'xz']:
+            archive = CompressedTarFile.create(
+                path,
+                compression,
+                threads,
+                level,
+                **kwargs )
+        else:
+            if level is not None:
+                if compression == 'xz':
+                    kwargs['preset'] = level
+                else:
+                    kwargs['compresslevel'] = level
+            archive = tarfile.open(path, 'w:%s' % compression, **kwargs)
+        archive.copybufsize = Packager.ARCHIVE_READ_SIZE
+        return archive
 
     def _setupPackage(self):
         """Override this for packages that require more than just
@@ -749,19 +1018,82 @@ class Packager(CsmakeModule):
         """The "someone" user definition"""
         groupmaps[value] = ('someone', 64)
 
-    def _generateSubstitutionDictionaries(self, pathkeymaps):
-        lookupCombos = [{}]
-        for key, paths in pathkeymaps.items():
-            if len(paths) == 0:
-                continue
-            newCombos = []
-            for path in paths:
-                for lookup in lookupCombos:
-                    newlookup = dict(lookup)
-                    newlookup.update({key:path})
-                    newCombos.append(newlookup)
-            lookupCombos = newCombos
-        return lookupCombos
+    #Matches the '%(key)s' references in a path definition (and '%%')
+    PATH_REFERENCE_RE = re.compile(r"%(?:%|\((?P<key>[^)]*)\))")
+
+    def _generateSubstitutionDictionaries(self, pathkeymaps, keys=None):
+        """Returns every combination of the paths for the keys in
+           pathkeymaps.  When keys is given, only those keys are
+           combined, and a key without paths is a KeyError"""
+        if keys is None:
+            keys = [ key for key, paths in pathkeymaps.items() if len(paths) > 0 ]
+        else:
+            for key in keys:
+                if key not in pathkeymaps or len(pathkeymaps[key]) == 0:
+                    raise KeyError(key)
+        return [
+            dict(zip(keys, combo))
+            for combo in itertools.product(
+                *[ pathkeymaps[key] for key in keys ] ) ]
+
+    def _pathReferences(self, path):
+        """Returns the keys path refers to with '%(key)s'"""
+        keys = []
+        for match in Packager.PATH_REFERENCE_RE.finditer(path):
+            key = match.group('key')
+            if key is not None and key not in keys:
+                keys.append(key)
+        return keys
+
+    def _expandPathTemplate(self, path, pathkeymaps):
+        """Returns the distinct expansions of path for the combinations
+           of the paths of only the keys it refers to"""
+        expansions = []
+        lookupCombos = self._generateSubstitutionDictionaries(
+            pathkeymaps,
+            self._pathReferences(path) )
+        for combo in lookupCombos:
+            expansion = path % combo
+            if expansion not in expansions:
+                expansions.append(expansion)
+        return expansions
+
+    def _resolvePathKeys(self, pathkeymaps):
+        """Path maps have the option to defer to other path map
+           definitions for part of their definition, e.g., '%(root)s'.
+           Every key is expanded once, after the keys it refers to.
+           Returns the fully expanded paths for every key"""
+        resolved = {}
+
+        def resolve(key, resolving):
+            if key in resolved:
+                return True
+            if key not in pathkeymaps or key in resolving:
+                return False
+            for path in pathkeymaps[key]:
+                for reference in self._pathReferences(path):
+                    if not resolve(reference, resolving + [key]):
+                        return False
+            paths = []
+            try:
+                for path in pathkeymaps[key]:
+                    for expansion in self._expandPathTemplate(path, resolved):
+                        if expansion not in paths:
+                            paths.append(expansion)
+            except KeyError:
+                return False
+            resolved[key] = paths
+            return True
+
+        loops = []
+        for key in pathkeymaps:
+            if not resolve(key, []):
+                self.log.devdebug("key not resolved: '%s'", key)
+                loops.append(key)
+        if len(loops) > 0:
+            self.log.error("Path mappings could not be resolved: %s", str(loops))
+            raise KeyError(str(loops))
+        return resolved
 
     def _doMappingSubstitutions(self, mapping):
         """Performs the mapping calculations based on
@@ -815,41 +1147,15 @@ class Packager(CsmakeModule):
         #Path maps have the option to defer to other path map definitions
         #for part of their definition (in implementation) to ensure
         #consistency.  This has to get untangled before we can proceed.
-        #Unless there is a definition loop we should be able to resolve
-        #  all references in N passes where N is the number of definitions
-        loops = []
-        for i in range(0,len(pathkeymaps)):
-            repeat = False
-            loops = []
-
-            #Generate the lookup table
-            lookupCombos = self._generateSubstitutionDictionaries(pathkeymaps)
-            self.log.devdebug("lookupCombos are '%s'", lookupCombos)
-            for key, paths in pathkeymaps.items():
-                newpathkeymap = set()
-                try:
-                    for combo in lookupCombos:
-                        newpathkeymap.update(
-                            [path % combo for path in paths])
-                except KeyError:
-                    repeat = True
-                    loops.append(key)
-                    self.log.devdebug("key not resolved: '%s'", key)
-                pathkeymaps[key] = list(newpathkeymap)
-            if not repeat:
-                break
-        else:
-            self.log.error("Path mappings could not be resolved: %s", str(loops))
-            raise KeyError(str(loops))
-
-        lookupCombos = self._generateSubstitutionDictionaries(pathkeymaps)
-        self.log.devdebug("All final lookup combos are: %s", str(lookupCombos))
+        pathkeymaps = self._resolvePathKeys(pathkeymaps)
+        self.log.devdebug("Resolved pathkeymaps are: %s", str(pathkeymaps))
         for value, paths in virtualmaps.items():
-            realPathmaps = set()
-            for combo in lookupCombos:
-                realPathmaps.update(
-                    [path % combo for path in paths])
-            pathmaps[value] = list(realPathmaps)
+            realPathmaps = []
+            for path in paths:
+                for expansion in self._expandPathTemplate(path, pathkeymaps):
+                    if expansion not in realPathmaps:
+                        realPathmaps.append(expansion)
+            pathmaps[value] = realPathmaps
         self.log.devdebug("All pathmaps are: %s", str(pathmaps))
 
         ownermaps = {}
@@ -894,14 +1200,20 @@ class Packager(CsmakeModule):
 
         copymaps = {}
         results = []
-        lookupCombos = self._generateSubstitutionDictionaries(
-                           pathmaps)
-        self.log.devdebug("pathmaps substitutions: %s", lookupCombos)
         for key, value in mapping['map'].items():
             installmap = {}
             try:
                 for mappart, target in value.items():
                     if mappart == 'map':
+                        #Only combine the pathmaps the map refers to
+                        references = []
+                        for match in CsmakeModule.BRACKET_RE.finditer(target):
+                            if match.group('sub') not in references:
+                                references.append(match.group('sub'))
+                        lookupCombos = self._generateSubstitutionDictionaries(
+                            pathmaps,
+                            references )
+                        self.log.devdebug("pathmaps substitutions: %s", lookupCombos)
                         filemap = list(
                             set([self._parseBrackets(target, combo) for combo in lookupCombos]) )
                         filemap = ' && '.join(filemap)
@@ -975,27 +1287,36 @@ class Packager(CsmakeModule):
             return []
         if 'file-type-dispatch' not in self.options[partName]:
             return []
-        aspects = []
         dispatch = self.options[partName]['file-type-dispatch']
-        self.log.devdebug("file type aspects lookup source (%s) ===== against (%s)", str(sourceIndex), str(dispatch))
-        for indexes, aspect, aspectOptions in dispatch:
-            if type(indexes) == str:
-                if indexes == '*':
-                    aspects.append((aspect, aspectOptions))
-                    continue
-            match = False
-            for index in indexes:
-                hit = True
-                for key, value in index.items():
-                    if key not in sourceIndex or sourceIndex[key] != value:
-                        hit = False
-                        break
-                if hit:
-                    match = True
-                    break
-            if match:
-                aspects.append((aspect, aspectOptions))
-        return aspects
+        if self.fileTypeDispatch is None \
+            or not self.fileTypeDispatch.isFor(dispatch):
+            self.log.devdebug("file type aspects compiled from (%s)", str(dispatch))
+            self.fileTypeDispatch = Packager.FileTypeDispatch(dispatch)
+        return self.fileTypeDispatch.lookup(sourceIndex)
+
+    def _aspectsImplementing(self, aspects, joinpoint):
+        """Returns the aspects from aspects that have a method
+           for joinpoint, in any phase
+           The other aspects are skipped as launchAspects would"""
+        result = []
+        for aspect, aspectOptions in aspects:
+            key = (id(aspect), joinpoint)
+            if key not in self.aspectJoinpoints:
+                phaseJoinpoint = '%s__' % joinpoint
+                implemented = hasattr(aspect, joinpoint)
+                if not implemented:
+                    for name in dir(aspect):
+                        if name.startswith(phaseJoinpoint):
+                            implemented = True
+                            break
+                self.aspectJoinpoints[key] = implemented
+            if self.aspectJoinpoints[key]:
+                result.append((aspect, aspectOptions))
+            else:
+                aspect.log.skipped()
+                aspect._dontValidateFiles()
+                aspect._absorbNewMappedFiles()
+        return result
 
     def _addFileObjToArchive(self, fileobj, info):
         self._ensureArchivePath(self.archive, info)
@@ -1004,34 +1325,50 @@ class Packager(CsmakeModule):
         self._filePlacingInPackage('data', None, info.name, fileobj)
         self.archive.addfile(info, fileobj)
 
+    def _archiveDirectoriesFor(self, archive):
+        """Returns the set of directory names already in the archive.
+           The set is kept up to date by _recordArchiveDirectory, so
+           the archive's members don't need to be searched
+           (TarFile.getmember looks through every member)"""
+        if archive not in self.archiveDirectories:
+            self.archiveDirectories[archive] = set([
+                member.name.rstrip('/') for member in archive.getmembers()
+                if member.isdir() ])
+        return self.archiveDirectories[archive]
+
+    def _recordArchiveDirectory(self, archive, info):
+        if info.isdir():
+            self._archiveDirectoriesFor(archive).add(info.name.rstrip('/'))
+
     def _ensureArchivePath(self, archive, info):
         path, filename = os.path.split(info.name)
         dirmode = self._getDirectoryMode(info.mode)
+        directories = self._archiveDirectoriesFor(archive)
 
         def pathHelper(curpath):
             if curpath is None or len(curpath) == 0 or curpath == '/':
                 return
-            try:
-                archive.getmember(curpath)
+            if curpath in directories:
                 return
-            except KeyError:
-                pathHelper(os.path.split(curpath)[0])
-                dirinfo = tarfile.TarInfo(curpath)
-                dirinfo.mtime = self._getCurrentPOSIXTime()
-                dirinfo.uid = info.uid
-                dirinfo.uname = info.uname
-                dirinfo.gid = info.gid
-                dirinfo.gname = info.gname
-                dirinfo.type = tarfile.DIRTYPE
-                dirinfo.mode = dirmode
-                #Don't call _filePlacingInPackage on directories
-                archive.addfile(dirinfo)
+            pathHelper(os.path.split(curpath)[0])
+            dirinfo = tarfile.TarInfo(curpath)
+            dirinfo.mtime = self._getCurrentPOSIXTime()
+            dirinfo.uid = info.uid
+            dirinfo.uname = info.uname
+            dirinfo.gid = info.gid
+            dirinfo.gname = info.gname
+            dirinfo.type = tarfile.DIRTYPE
+            dirinfo.mode = dirmode
+            #Don't call _filePlacingInPackage on directories
+            archive.addfile(dirinfo)
+            directories.add(curpath)
         pathHelper(path)
 
     def _addInfoToArchive(self, info):
         self._ensureArchivePath(self.archive, info)
         self._filePlacingInPackage('data',None,info.name,None)
         self.archive.addfile(info)
+        self._recordArchiveDirectory(self.archive, info)
 
     @staticmethod
     def _getDirectoryMode(mode):
@@ -1039,6 +1376,8 @@ class Packager(CsmakeModule):
         return ((mode >> 2) & 0o111) | mode
 
     def _doArchiveFileAspects(self, mapping, sourcePath, archivePath, aspects, info=None):
+        if aspects is not None:
+            aspects = self._aspectsImplementing(aspects, 'archive_file')
         if aspects is not None and len(aspects) > 0:
             self.flowcontrol.initFlowControlIssue(
                 "doNotMapFile",
@@ -1054,7 +1393,7 @@ class Packager(CsmakeModule):
                  'mapping': mapping,
                  'info': info } )
             if self.flowcontrol.advice("doNotMapFile"):
-                self.log.info("Not archiving file '%s' on advice of aspects", str(source) )
+                self.log.info("Not archiving file '%s' on advice of aspects", str(sourcePath) )
                 return False
         return True
 
@@ -1080,10 +1419,76 @@ class Packager(CsmakeModule):
                 sourcePath,
                 archivePath )
 
+    def _archiveDigestMethods(self, archive):
+        """Override this to return the hashlib methods (e.g., hashlib.md5)
+           to compute for every file _placeFileInArchive puts in the
+           'archive' archive.  The file is read once for both the archive
+           and the digests, which are given to _fileArchivedInPackage.
+           self.digestingArchive is True when _filePlacingInPackage is
+           called for a file that will be digested this way, so it
+           doesn't need to read the file itself"""
+        return []
+
+    def _fileArchivedInPackage(self, archive, sourcePath, archivePath, digests):
+        """Called after the contents of sourcePath are in the archive
+           with the hex digests of the contents, in the order given by
+           _archiveDigestMethods"""
+        pass
+
+    def _addToArchive(self, archive, sourcePath, archivePath, addFilter, methods, placed):
+        #TarFile.add, reading regular files through a DigestingReader
+        #  placed is set by addFilter to the (source, archive) paths placed
+        if archive.name is not None \
+            and os.path.abspath(sourcePath) == archive.name:
+            return
+        info = archive.gettarinfo(sourcePath, archivePath)
+        if info is None:
+            self.log.info("'%s' is not a type of file that can be archived", sourcePath)
+            return
+        info = addFilter(info)
+        if info is None:
+            return
+        if info.isreg():
+            contents = None
+            if self.packagingPass is not None:
+                contents = self.packagingPass.contents(sourcePath, methods)
+            if contents is not None and len(contents[0]) == info.size:
+                archive.addfile(info, io.BytesIO(contents[0]))
+                digests = contents[1]
+            else:
+                with open(sourcePath, 'rb', Packager.ARCHIVE_READ_SIZE) as fileobj:
+                    reader = Packager.DigestingReader(fileobj, methods)
+                    archive.addfile(info, reader)
+                digests = reader.hexdigests()
+            placedSource, placedArchive = placed[0]
+            self._fileArchivedInPackage(
+                'data',
+                placedSource,
+                placedArchive,
+                digests )
+        elif info.isdir():
+            archive.addfile(info)
+            if self.packagingPass is not None:
+                names = self.packagingPass.fileSystem.listdir(sourcePath)
+            else:
+                names = os.listdir(sourcePath)
+            for name in sorted(names):
+                self._addToArchive(
+                    archive,
+                    os.path.join(sourcePath, name),
+                    os.path.join(archivePath, name),
+                    addFilter,
+                    methods,
+                    placed )
+        else:
+            archive.addfile(info)
+
     def _placeFileInArchive(self, mapping, sourcePath, archivePath, aspects):
         """Override this method if the data archive is not represented by
            a TarFile object, or an object that doesn't respond in
            a similar fashion to TarFile's 'add' method"""
+        methods = self._archiveDigestMethods('data')
+        placed = [None]
         def addFilter(info):
             info.mode = self._modeInt(mapping['permissions'])
             #Directories usually need execution rights if they have read rights
@@ -1113,13 +1518,39 @@ class Packager(CsmakeModule):
                 return None
             #self.log.devdebug("addFilter info: %s", str(info.__dict__))
             self._ensureArchivePath(self.archive, info)
+            placed[0] = (actualSourcePath, actualArchivePath)
+            self.digestingArchive = len(methods) > 0 and info.isreg()
             self._filePlacingInPackage(
                 'data',
                 actualSourcePath,
                 actualArchivePath )
+            #tarfile adds the info returned from the filter
+            self._recordArchiveDirectory(self.archive, info)
             return info
 
-        info = self.archive.add(sourcePath, archivePath, filter=addFilter)
+        if len(methods) == 0 and self.packagingPass is None:
+            self.archive.add(sourcePath, archivePath, filter=addFilter)
+            return
+        try:
+            self._addToArchive(
+                self.archive,
+                sourcePath,
+                archivePath,
+                addFilter,
+                methods,
+                placed )
+        finally:
+            self.digestingArchive = False
+
+    def _mappedArchivePath(self, source, result, resultsAreDirectories):
+        """Returns the directory and the path in the archive
+           that source is mapped to for result"""
+        if resultsAreDirectories:
+            pathpart = result['relLocation']
+            _, filepart = os.path.split(source['location'])
+        else:
+            pathpart, filepart = os.path.split(result['relLocation'])
+        return (pathpart, os.path.join(pathpart, filepart))
 
     def _executePreppedMapping(self, mapping):
         """This method performs the action of taking files specified
@@ -1137,12 +1568,18 @@ class Packager(CsmakeModule):
                 #Allow the aspect to alter the mapping without
                 #changing the rest of the behavior
                 if len(fileAspects) > 0:
+                    aspectMapping = Packager.MappingOverlay(mapping)
+                else:
+                    aspectMapping = mapping
+                beginAspects = self._aspectsImplementing(
+                    fileAspects,
+                    'begin_map' )
+                if len(beginAspects) > 0:
                     self.flowcontrol.initFlowControlIssue(
                         "doNotMapFile",
                         "Tells packager to avoid archiving a file" )
-                    aspectMapping = copy.deepcopy(mapping)
                     self.engine.launchAspects(
-                        fileAspects,
+                        beginAspects,
                         'begin_map',
                         self.engine.getPhase(),
                         self,
@@ -1151,22 +1588,17 @@ class Packager(CsmakeModule):
                     if self.flowcontrol.advice("doNotMapFile"):
                         self.log.info("Not archiving file '%s' on advice of aspects", str(source) )
                         continue
-                else:
-                    aspectMapping = mapping
                 for result in tos:
                     #Create tarinfo here.
-                    if resultsAreDirectories:
-                        pathpart = result['relLocation']
-                        _, filepart = os.path.split(source['location'])
-                    else:
-                        pathpart, filepart = os.path.split(result['relLocation'])
+                    pathpart, archivePath = self._mappedArchivePath(
+                        source,
+                        result,
+                        resultsAreDirectories )
 
                     self._placeFileInArchive(
                         aspectMapping,
                         source['location'],
-                        os.path.join(
-                            pathpart,
-                            filepart ),
+                        archivePath,
                         fileAspects )
 
                     #TODO: This will only save off the directory for
@@ -1174,21 +1606,30 @@ class Packager(CsmakeModule):
                     #      if a single directory in the archive happens
                     #      to have varying copyrights, this will not be correct.
                     copyrightControl['files'][pathpart] = aspectMapping['copyright']
-                if len(fileAspects) > 0:
+                endAspects = self._aspectsImplementing(fileAspects, 'end_map')
+                if len(endAspects) > 0:
                     self.engine.launchAspects(
-                        fileAspects,
+                        endAspects,
                         'end_map',
                         self.engine.getPhase(),
                         self,
                         self.options,
                         {'from' : source, 'tos' : tos, 'mapping': aspectMapping} )
 
-    def _doMaps(self):
-        """This is the high level method that performs the
-           actions specified by the installmap sections given in
-           'maps'.   This executes all the map sections,
-           does _doMappingSubstitutions with them and then
-           performs _executePreppedMapping on each section."""
+    def _launchMap(self, part):
+        result = self.engine.launchStep(
+            part,
+            'package' )
+        if result is None or not result._didPass():
+            self.log.error("%s step failed", part)
+            self.log.failed()
+            raise ValueError("Mappings for Packager failed")
+        return result._getReturnValue('package')
+
+    def _prepareMaps(self):
+        """Executes the installmap sections given in 'maps' and
+           does _doMappingSubstitutions with them.
+           Returns the mappings ready for _executePreppedMapping"""
         mappings = self.options['maps']
         self.filemanager = self.metadata._getFileManager()
         mappingParts = mappings.split('\n')
@@ -1196,21 +1637,29 @@ class Packager(CsmakeModule):
         mappingParts = mappings.split(',')
         allmaps = []
         for part in mappingParts:
-            result = self.engine.launchStep(
-                part.strip(),
-                'package' )
-            if result is None or not result._didPass():
-                self.log.error("%s step failed", part)
-                self.log.failed()
-                raise ValueError("Mappings for Packager failed")
-            mapDefinitions = result._getReturnValue('package')
+            if self.packagingPass is not None:
+                mapDefinitions = self.packagingPass.mapDefinitions(
+                    part.strip(),
+                    self._launchMap )
+            else:
+                mapDefinitions = self._launchMap(part.strip())
             allmaps.append(mapDefinitions)
         #Grok the definitions and do substitutions in the map entries
+        readymappings = []
         for mapping in allmaps:
-            readymappings = self._doMappingSubstitutions(mapping)
-            for ready in readymappings:
-                self.log.devdebug("readymapping: %s", str(ready))
-                self._executePreppedMapping(ready)
+            readymappings.extend(self._doMappingSubstitutions(mapping))
+        return readymappings
+
+    def _doMaps(self, readymappings=None):
+        """This is the high level method that performs the
+           actions specified by the installmap sections given in
+           'maps'.   This performs _executePreppedMapping on each
+           of the mappings from _prepareMaps."""
+        if readymappings is None:
+            readymappings = self._prepareMaps()
+        for ready in readymappings:
+            self.log.devdebug("readymapping: %s", str(ready))
+            self._executePreppedMapping(ready)
         self.engine.launchAspects(
             self.aspects,
             'mapping_complete',
@@ -1218,6 +1667,203 @@ class Packager(CsmakeModule):
             self,
             self.options )
 
+    ##############################
+    # Package manifests for the 'incremental' option
+
+    #Version of the manifest written beside the package
+    MANIFEST_VERSION=1
+
+    def _incrementalPackaging(self):
+        """Returns True when the package should only be rebuilt when
+           its manifest changes"""
+        if 'incremental' not in self.options \
+            or self.options['incremental'].strip() != 'True':
+            return False
+        if len(self.aspects) > 0:
+            #Aspects can change anything about the package as it's built
+            self.log.info("Aspects are attached to the package: 'incremental' is not used")
+            return False
+        return True
+
+    def _packageResultPaths(self):
+        """Override this to return the files the package is made of
+           when it is not the archive at self.fullPathToArchive"""
+        return [self.fullPathToArchive]
+
+    def _packageManifestPath(self):
+        path, name = os.path.split(self._packageResultPaths()[0])
+        return os.path.join(path, '.%s.csmake-manifest' % name)
+
+    def _addManifestEntries(self, mapping, sourcePath, archivePath, entries):
+        #Adds the entries for what _placeFileInArchive will archive
+        #  from sourcePath, including what is in a directory
+        #Entries are:
+        #  [archive path, source path, type, size, mtime, digest,
+        #   permissions, owner, group]
+        entry = [
+            archivePath,
+            sourcePath,
+            'missing',
+            None,
+            None,
+            None,
+            mapping['permissions'],
+            list(mapping['owner']),
+            list(mapping['group']) ]
+        try:
+            fileStat = os.lstat(sourcePath)
+        except (IOError, OSError):
+            entries.append(entry)
+            return
+        entry[3] = fileStat.st_size
+        entry[4] = fileStat.st_mtime_ns
+        if stat.S_ISDIR(fileStat.st_mode):
+            entry[2] = 'directory'
+            entry[3] = 0
+            entries.append(entry)
+            for name in sorted(os.listdir(sourcePath)):
+                self._addManifestEntries(
+                    mapping,
+                    os.path.join(sourcePath, name),
+                    os.path.join(archivePath, name),
+                    entries )
+            return
+        if stat.S_ISLNK(fileStat.st_mode):
+            entry[2] = 'link'
+            entry[5] = os.readlink(sourcePath)
+        elif stat.S_ISREG(fileStat.st_mode):
+            entry[2] = 'file'
+            database = self._getDigestDatabase()
+            if database is not None:
+                entry[5] = self._rebuildDigest(
+                    database,
+                    self._getFileSystem(),
+                    sourcePath )
+        else:
+            entry[2] = 'other'
+        entries.append(entry)
+
+    def _packageManifest(self, readymappings):
+        """Returns the manifest of the package that would be built
+           from the mappings from _prepareMaps"""
+        entries = []
+        for mapping in readymappings:
+            filemappings = self.filemanager.parseFileMap(mapping['map'])
+            for froms, tos in filemappings.iterspecs():
+                resultsAreDirectories = len(froms) > 1
+                for source in froms:
+                    for result in tos:
+                        _, archivePath = self._mappedArchivePath(
+                            source,
+                            result,
+                            resultsAreDirectories )
+                        self._addManifestEntries(
+                            mapping,
+                            source['location'],
+                            archivePath,
+                            entries )
+        #The file manager doesn't find files in any particular order
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        options = dict([
+            (key, value) for key, value in self.options.items()
+            if not key.startswith('**packaging-') ])
+        inputs = Packager._manifestInputs(
+            {'options' : options,
+             'metadata' : self.packageMetadata,
+             'mappings' : readymappings } )
+        return {
+            'version' : Packager.MANIFEST_VERSION,
+            'packager' : self.__class__.__name__,
+            'inputs' : inputs,
+            'files' : entries,
+            'results' : [] }
+
+    @staticmethod
+    def _manifestInputs(value):
+        """Returns value as it will be saved in and loaded back from
+           a package manifest, the same from one run to the next"""
+        if value is None or isinstance(value, (str, bool, int, float)):
+            return value
+        if isinstance(value, dict):
+            return dict([
+                (str(key), Packager._manifestInputs(item))
+                for key, item in value.items() ])
+        if isinstance(value, (list, tuple)):
+            return [ Packager._manifestInputs(item) for item in value ]
+        if isinstance(value, (set, frozenset)):
+            #A set's order changes with the hash seed
+            items = [ Packager._manifestInputs(item) for item in value ]
+            return sorted(
+                items,
+                key=lambda item: json.dumps(item, sort_keys=True) )
+        if type(value).__repr__ is object.__repr__ \
+            and type(value).__str__ is object.__str__:
+            #The default repr has the object's address in it
+            return type(value).__name__
+        return str(value)
+
+    def _manifestEntryMatches(self, previous, entry):
+        if previous[:4] != entry[:4] or previous[6:] != entry[6:]:
+            return False
+        if previous[4] == entry[4]:
+            return True
+        #A file that was touched, but not changed, is still the same
+        return entry[2] == 'file' and entry[5] is not None \
+            and previous[5] == entry[5]
+
+    def _packageUpToDate(self, manifest):
+        """Returns True when the package was built from what manifest
+           describes and hasn't been changed since"""
+        try:
+            with open(self._packageManifestPath()) as manifestFile:
+                previous = json.load(manifestFile)
+        except (IOError, OSError, ValueError):
+            return False
+        for key in ['version', 'packager', 'inputs']:
+            if previous.get(key) != manifest[key]:
+                self.log.info("Package manifest '%s' changed", key)
+                return False
+        resultPaths = [ result[0] for result in previous['results'] ]
+        if resultPaths != self._packageResultPaths():
+            return False
+        for path, size, mtime in previous['results']:
+            try:
+                resultStat = os.stat(path)
+            except (IOError, OSError):
+                return False
+            if resultStat.st_size != size or resultStat.st_mtime_ns != mtime:
+                self.log.info("'%s' changed since it was packaged", path)
+                return False
+        if len(previous['files']) != len(manifest['files']):
+            self.log.info("Files were added to or removed from the package")
+            return False
+        for previousEntry, entry in zip(previous['files'], manifest['files']):
+            if not self._manifestEntryMatches(previousEntry, entry):
+                self.log.info("'%s' changed since it was packaged", entry[1])
+                return False
+        return True
+
+    def _removePackageManifest(self):
+        try:
+            os.remove(self._packageManifestPath())
+        except (IOError, OSError):
+            pass
+
+    def _savePackageManifest(self, manifest):
+        for path in self._packageResultPaths():
+            resultStat = os.stat(path)
+            manifest['results'].append(
+                [path, resultStat.st_size, resultStat.st_mtime_ns])
+        manifestPath = self._packageManifestPath()
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(manifestPath))
+        with os.fdopen(fd, 'w') as manifestFile:
+            json.dump(manifest, manifestFile)
+        #Readable by whoever can read the package
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp, 0o666 & ~umask)
+        os.rename(temp, manifestPath)
+
     def _handleControls(self):
         """Handle controls will dispatch _control_<control name>
            methods for each section it finds as well as do any
@@ -1245,29 +1891,77 @@ class Packager(CsmakeModule):
                 continue
             getattr(self, '_control_%s' % key)(value)
 
-    def package(self, options):
-        self.options = options
-
+    def _startFormats(self, formatThreads):
+        """Starts building the other 'formats' of the package"""
+        if 'formats' not in self.options \
+            or '**packaging-pass' in self.options:
+            return
+        for step in self._parseCommaAndNewlineList(self.options['formats']):
+            formatThreads.append(Packager.FormatThread(self, step))
+            formatThreads[-1].start()
+        #Children of this step have to wait until the formats
+        #  are started, they find this step as their parent until then
+        self.packagingPass.waitForFormats(
+            [ thread.step for thread in formatThreads ] )
+
+    def _buildPackage(self, formatThreads):
+        """Builds the package, returns True if it was built"""
         #Figure out how the product metadata corresponds to
         #the package being created.
         self._doMetadataMappings()
 
+        #Run the installmaps given in 'maps'
+        readymappings = self._prepareMaps()
+        self._startFormats(formatThreads)
+
+        manifest = None
+        if self._incrementalPackaging():
+            manifest = self._packageManifest(readymappings)
+            if self._packageUpToDate(manifest):
+                self.log.info("Package is up to date with its manifest")
+                return True
+            self._removePackageManifest()
+
         #Set up the package structure and parts for filling out.
         self._setupPackage()
 
         #Move in mapped files
-        self._doMaps()
+        self._doMaps(readymappings)
 
         #Handle the control metadata
         self._handleControls()
 
         #produce debian directory and files
-        if self._finishPackage():
+        if not self._finishPackage():
+            return False
+        if manifest is not None:
+            self._savePackageManifest(manifest)
+        return True
+
+    def package(self, options):
+        self.options = options
+        if '**packaging-pass' in options:
+            #This is one of the 'formats' of another package
+            self.packagingPass = options['**packaging-pass']
+            self.packagingPass.formatStarted(options['**packaging-format'])
+        elif 'formats' in options:
+            self.packagingPass = PackagingPass(
+                len(self._parseCommaAndNewlineList(options['formats'])) + 1 )
+        formatThreads = []
+        try:
+            result = self._buildPackage(formatThreads)
+        finally:
+            for thread in formatThreads:
+                thread.join()
+        for thread in formatThreads:
+            if thread.failed():
+                self.log.error("Package format '%s' failed", thread.step)
+                result = False
+        if result:
             self.log.passed()
-            return True
         else:
             self.log.failed()
-            return False
+        return result
 
     def clean(self, options):
         self._cleaningFiles()
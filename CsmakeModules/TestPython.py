@@ -16,13 +16,18 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # </copyright>
 from CsmakeCore.CsmakeModule import CsmakeModule
+from CsmakeCore.PythonTestImpact import PythonTestImpact
+from CsmakeCore.PythonTestWorker import PythonTestWorker
 import unittest
 try:
     import CsmakeCore._vendor.coverage as coverage
 except ImportError:
     coverage = None
+import concurrent.futures
+import os
 import os.path
-import xml.parsers.expat
+import shutil
+import tempfile
 
 class TestPython(CsmakeModule):
     """Purpose: Running python unit testing (using unittest test definitions)
@@ -45,6 +50,15 @@ class TestPython(CsmakeModule):
            html-report - (OPTIONAL) When specified, will output an html report
                                     to the file provided
                                     - relative paths will be under %(RESULTS)s
+           workers - (OPTIONAL) Number of processes to run the tests in,
+                                or 'auto' for one per cpu
+                                Default is 1, running the tests in csmake
+           select - (OPTIONAL) 'all' runs every test, recording the source
+                               lines each test covers
+                               'changed' runs only the tests affected by
+                               changes to the sources since the last run
+                               Default is to run every test without
+                               recording what each test covers
            * - any options you wan to pass through to the tests
        Notes:
           The tests must reside under the implementation under test
@@ -57,6 +71,27 @@ class TestPython(CsmakeModule):
           The csmake runtime will add a "csmake_test" member to
             the TestCase object which is a pointer back to this module
             the "options" passed to the section are at csmake_test.options.
+          With more than one worker, the test modules are split between
+            the workers, and each worker measures coverage separately.
+            The coverage is combined before it is reported.
+            The output of each worker is written to the log in turn.
+            In a worker, csmake_test only has the "options" and a "log".
+          The parsing of the sources for the coverage reports is kept
+            in %(RESULTS)s/coverage-parse-cache, so sources that haven't
+            changed aren't parsed again on later runs.
+          With 'select', each test is measured in a coverage context of
+            its id, and the lines each test covered are kept by the id of
+            the section in %(RESULTS)s/coverage-test-map with a hash of
+            the contents of each file measured under the 'source-dir'.
+            With 'changed', a test is run if it covered a file that
+            changed, if it is new, or if it didn't pass the last time.
+            Every test is run when a file changed that was only run
+            outside of the tests (e.g., when it was imported),
+            or when there is no map from an earlier run.
+            When only some of the tests run, the coverage report in the
+            log is for the tests that were run, but the total percentage
+            and the classes given to aspects (e.g., CheckPythonCoverage)
+            are from the last time every test ran.
        Requires:
            coverage (>= 4.0 preferred)
                (apt-get install python-coverage
@@ -65,13 +100,13 @@ class TestPython(CsmakeModule):
 
     REQUIRED_OPTIONS = ['test', 'test-dir', 'source-dir']
 
-    def _xmlStartElementHandler(self, name, attrs):
-        if name == 'class':
-            self.classList.append(attrs)
-    def _xmlEndElementHandler(self, name):
-        pass
-    def _xmlCharacterData(self, data):
-        pass
+    #Where the parsing of the sources for coverage reports is kept
+    #  (under %(RESULTS)s) so unchanged sources aren't parsed again
+    PARSE_CACHE = 'coverage-parse-cache'
+
+    #Where the lines each test covered are kept (under %(RESULTS)s)
+    #  for the 'select' option
+    TEST_MAP = 'coverage-test-map'
 
     def _giveTestsCsmakeContext(self, tests):
         for test in tests:
@@ -80,18 +115,55 @@ class TestPython(CsmakeModule):
             else:
                 test.csmake_test = self
 
-    def test(self, options):
-        ignorefileList = []
-        self.classList = []
-        if 'ignore-files' in options:
-            ignorefileList = ','.join(options['ignore-files'].split('\n')).split(',')
-            ignorefileList = [
-                x.strip() for x in ignorefileList if len(x.strip()) > 0 ]
-        self.percentCovered = 0
-        self.coverageResults = None
-        self.olderCoverageResults = None
+    def _workerCount(self):
+        if 'workers' not in self.options:
+            return 1
+        value = self.options['workers'].strip()
+        if value == 'auto':
+            return os.cpu_count() or 1
+        try:
+            workers = int(value)
+        except ValueError:
+            workers = 0
+        if workers < 1:
+            raise ValueError(
+                "'workers' must be a positive number or 'auto': %s" % value)
+        return workers
+
+    def _testImpact(self):
+        """Returns the PythonTestImpact for the 'select' option
+           or None when the option isn't given"""
+        if 'select' not in self.options:
+            return None
+        value = self.options['select'].strip()
+        if value not in ['all', 'changed']:
+            raise ValueError(
+                "'select' must be 'all' or 'changed': %s" % value)
+        return PythonTestImpact(
+            os.path.join(
+                self.env.env['RESULTS'],
+                TestPython.TEST_MAP,
+                "%s.json" % self.log.params['Id'] ),
+            self.options['source-dir'] )
+
+    def _selectTests(self, tests, impact):
+        """Returns tests with only the tests selected by impact"""
+        testIds = list(PythonTestImpact.allTestIds(tests))
+        everything = self.options['select'].strip() == 'all'
+        if not everything and not impact.hasBaseline():
+            self.log.info("No test map from an earlier run - running every test")
+        selected = impact.select(testIds, everything)
+        if not everything:
+            self.log.info(
+                "Running %d of %d tests affected by changes since the last run",
+                len(selected),
+                len(testIds) )
+        return PythonTestImpact.filter(tests, selected)
+
+    def _runTests(self, impact):
+        """Runs the tests in csmake, returns
+           (coverage, successful, errors, failures)"""
         loader = unittest.TestLoader()
-        self.options = options
         cover = coverage.coverage(branch=True) if coverage is not None else None
         if cover is not None:
             cover.start()
@@ -102,40 +174,172 @@ class TestPython(CsmakeModule):
         for test in tests:
             self._giveTestsCsmakeContext(test)
         testRunner = unittest.TextTestRunner(self.log.out(), True, 3)
+        if impact is not None:
+            tests = self._selectTests(tests, impact)
+            if cover is not None:
+                testRunner.resultclass = \
+                    PythonTestWorker.contextResultClass(cover)
         result = testRunner.run(tests)
+        if cover is not None:
+            cover.stop()
+        return (cover, result.wasSuccessful(), result.errors, result.failures)
+
+    def _runWorkers(self, workers, dataFile, impact):
+        """Runs the tests in workers python processes, returns
+           (coverage, successful, errors, failures)
+           coverage is None when no tests were run"""
+        tests = PythonTestWorker.discover(self.options)
+        selected = None
+        if impact is not None:
+            tests = self._selectTests(tests, impact)
+            selected = impact.selected
+        shards = PythonTestWorker.shard(tests, workers)
+        worker = PythonTestWorker(
+            self.options,
+            self.settings,
+            { 'Type' : self.log.params['Type'],
+              'Id' : self.log.params['Id'] },
+            dataFile if coverage is not None else None,
+            selected )
+        successful = True
+        errors = []
+        failures = []
+        testsRun = 0
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(len(shards), 1) ) as pool:
+            futures = [
+                pool.submit(
+                    worker.start,
+                    shard,
+                    os.path.join(
+                        os.path.dirname(dataFile),
+                        "worker%d" % index ) )
+                for index, shard in enumerate(shards) ]
+            #Output goes to the log in shard order as the workers finish
+            for index, future in enumerate(futures):
+                self.log.out().write(
+                    "%s  Worker %d of %d  %s\n" % (
+                        '-'*10, index + 1, len(futures), '-'*10 ) )
+                try:
+                    output, run, passed, failed, broken = future.result()
+                except:
+                    self.log.exception("Worker %d failed", index + 1)
+                    successful = False
+                    #Every test in the worker's shard is an error
+                    suites = list(tests)
+                    errors.extend([
+                        (testId, "Worker %d failed" % (index + 1))
+                        for suite in shards[index]
+                        for testId in PythonTestImpact.allTestIds(
+                            suites[suite] ) ])
+                    continue
+                self.log.out().write(output)
+                testsRun = testsRun + run
+                successful = successful and passed
+                errors.extend(failed)
+                failures.extend(broken)
+        self.log.out().write("Ran %d tests in %d workers\n" % (
+            testsRun, len(shards) ) )
+        cover = None
+        if coverage is not None and len(shards) > 0:
+            cover = coverage.coverage(branch=True, data_file=dataFile)
+            cover.combine([os.path.dirname(dataFile)])
+        return (cover, successful, errors, failures)
+
+    def test(self, options):
+        ignorefileList = []
+        if 'ignore-files' in options:
+            ignorefileList = ','.join(options['ignore-files'].split('\n')).split(',')
+            ignorefileList = [
+                x.strip() for x in ignorefileList if len(x.strip()) > 0 ]
+        self.percentCovered = 0
+        self.coverageResults = None
+        self.olderCoverageResults = []
+        self.options = options
+        workers = self._workerCount()
+        impact = self._testImpact()
+        dataDir = None
+        try:
+            if workers > 1:
+                dataDir = tempfile.mkdtemp(prefix='csmake-coverage')
+                cover, successful, errors, failures = self._runWorkers(
+                    workers,
+                    os.path.join(dataDir, '.coverage'),
+                    impact )
+            else:
+                cover, successful, errors, failures = self._runTests(impact)
+            if impact is None:
+                self._reportCoverage(cover, ignorefileList)
+            else:
+                self._reportSelected(
+                    cover,
+                    impact,
+                    errors + failures,
+                    ignorefileList )
+            if cover is not None:
+                cover.erase()
+        finally:
+            if dataDir is not None:
+                shutil.rmtree(dataDir, ignore_errors=True)
+        if successful:
+            self.log.passed()
+            return True
+        else:
+            self.log.error("Testing failed")
+            self.log.failed()
+            self.log.error(errors)
+            self.log.error(failures)
+            return False
+
+    def _reportSelected(self, cover, impact, failed, ignorefileList):
+        """Reports the coverage of the tests selected by impact and
+           records the test map.  When not every test ran, the coverage
+           of the last run of every test is the coverage of this step"""
+        if len(impact.selected) == 0:
+            self.log.info("No tests were affected by changes - skipping coverage reporting")
+        else:
+            self._reportCoverage(cover, ignorefileList)
+            if cover is None:
+                self.log.info("coverage not available - the test map is not recorded")
+            else:
+                everything = None
+                if impact.selectedEverything():
+                    everything = (
+                        self.percentCovered,
+                        self.olderCoverageResults )
+                impact.record(
+                    cover.get_data(),
+                    [ test if type(test) is str else test.id()
+                      for test, trace in failed ],
+                    everything )
+        if impact.selectedEverything():
+            return
+        lastCoverage = impact.lastCoverage()
+        if lastCoverage is None:
+            self.log.info("There is no coverage from a run of every test - using the coverage of the tests run")
+        else:
+            self.percentCovered, self.olderCoverageResults = lastCoverage
+            self.log.info(
+                "Using the coverage of the last run of every test: %.2f%%",
+                self.percentCovered )
+
+    def _reportCoverage(self, cover, ignorefileList):
+        options = self.options
         if cover is None:
             self.log.info("coverage not available - skipping coverage reporting")
         else:
-            cover.stop()
             omits = [self.options['test-dir']+'/*'] + ignorefileList
+            cover.set_option(
+                'report:parse_cache',
+                os.path.join(
+                    self.env.env['RESULTS'],
+                    TestPython.PARSE_CACHE ) )
+            #Each file is analyzed once for all of the reports below
             self.percentCovered = cover.report(
                 file=self.log.out(),
                 omit=omits )
-            coverageXMLFile = os.path.join(
-                self.env.env['RESULTS'],
-                "coverage.out.xml" )
-            cover.xml_report(
-                outfile=coverageXMLFile,
+            self.olderCoverageResults = cover.xml_class_attributes(
                 omit=omits )
-            #TODO: add more comprehensive parsing
-            lines = []
-            try:
-                with open(coverageXMLFile, 'rb') as coverageFile:
-                    parser = xml.parsers.expat.ParserCreate()
-                    parser.StartElementHandler = self._xmlStartElementHandler
-                    parser.EndElementHandler = self._xmlEndElementHandler
-                    parser.CharacterDataHandler = self._xmlCharacterData
-                    parser.ParseFile(coverageFile)
-            except:
-                self.log.exception("Failed to read xml coverage file")
-            finally:
-                try:
-                    os.remove(coverageXMLFile)
-                except:
-                    self.log.exception("Failed to remove the xml coverage file")
-
-            if len(self.classList) > 0:
-                self.olderCoverageResults = self.classList
 
             if 'xml-report' in options:
                 cover.xml_report(
@@ -146,7 +350,7 @@ class TestPython(CsmakeModule):
 
             if 'html-report' in options:
                 cover.html_report(
-                    outfile=os.path.join(
+                    directory=os.path.join(
                         self.env.env['RESULTS'],
                         options['html-report'] ),
                     omit=omits )
@@ -154,14 +358,3 @@ class TestPython(CsmakeModule):
                 self.coverageResults = cover.get_data()
             except AttributeError as e:
                 self.log.info("coverage >= v4.0 required to get new coverage results - some dependent modules may not work properly")
-
-            cover.erase()
-        if result.wasSuccessful():
-            self.log.passed()
-            return True
-        else:
-            self.log.error("Testing failed")
-            self.log.failed()
-            self.log.error(result.errors)
-            self.log.error(result.failures)
-            return False
@@ -29,6 +29,12 @@ class command(CsmakeModuleAllPhase):
                  & - denotes steps that can be run in parallel
            description - Provides a description of the command that
                          csmake will use for --list-commands.
+       Scheduling: When csmake is run with --jobs=N, the steps are
+           run on a pool of N threads as a dependency graph.  Each step
+           depends on all the steps before it unless the step's section
+           specifies **after, a comma separated list of the steps
+           (from earlier in the command) that it actually depends on.
+           A step starts as soon as everything it depends on is done.
        Example:
            [command@build-pond]
            description = "This will build a small pond"
@@ -43,6 +49,11 @@ class command(CsmakeModuleAllPhase):
            Then repo4 would execute
            Then createPond would execute
            Finally, stockFish would execute
+
+           With --jobs=2, if [Shell@repo4] specified **after = repo1
+           then repo4 would start as soon as repo1 finished, even if repo2
+           and repo3 were still executing - and only two of repo1, repo2,
+           repo3 and repo4 would ever be executing at the same time.
     """
 
     RESERVED_FLAGS = ['description']
@@ -70,6 +81,71 @@ class command(CsmakeModuleAllPhase):
         self.log.devdebug("The command structure is %s", str(result))
         return result
 
+    def _stepDependencies(self, steps):
+        #Turns the command structure into a dependency graph
+        #  Returns the flat list of steps and the set of indexes of the
+        #  steps each step depends on
+        flat = []
+        dependencies = []
+        #The frontier is the set of steps that together (with everything
+        #  they depend on) account for every step seen so far
+        frontier = set()
+        for parallelpart in steps:
+            groupStart = len(flat)
+            hasBarrier = False
+            for step in parallelpart:
+                step = step.strip()
+                index = len(flat)
+                flat.append(step)
+                after = None
+                section = self.engine.lookupSection(step)
+                if section is not None:
+                    after = self.engine.getSectionOption(section, '**after')
+                if after is None:
+                    hasBarrier = True
+                    dependencies.append(set(frontier))
+                    continue
+                deps = set()
+                for name in self._parseCommaAndNewlineList(after):
+                    earlier = [ x for x in range(groupStart) if flat[x] == name ]
+                    if len(earlier) == 0:
+                        self.log.warning(
+                            "Step '%s' is **after '%s', but '%s' isn't an earlier step in this command: ignoring",
+                            step, name, name )
+                    deps.update(earlier)
+                dependencies.append(deps)
+            group = set(range(groupStart, len(flat)))
+            if hasBarrier:
+                frontier = group
+            else:
+                frontier.update(group)
+        self.log.devdebug("The command dependencies are %s", str(dependencies))
+        return flat, dependencies
+
+    def _scheduleCommand(self, scheduler, steps):
+        flat, dependencies = self._stepDependencies(steps)
+        def launch(step):
+            return self.engine.launchStep(
+                step,
+                self.engine.getPhase())
+        def failed(step, result):
+            if result is None or not result._didPass():
+                self.log.error("XXXXXX Step '%s' FAILED XXXXXX" % step)
+                self.log.failed()
+                return True
+            return False
+        results, failure = scheduler.runGraph(
+            flat,
+            dependencies,
+            launch,
+            failed,
+            self.engine.settings['keep-going'] )
+        if failure and not self.engine.settings['keep-going']:
+            return None
+        if not failure:
+            self.log.passed()
+        return steps
+
     def default(self, options):
         class CommandThread(threading.Thread):
             def __init__(innerself, parallelpart):
@@ -92,6 +168,9 @@ class command(CsmakeModuleAllPhase):
                 return innerself._parent
 
         steps = self._prepareCommand(options)
+        scheduler = self.engine.getStepScheduler()
+        if scheduler is not None:
+            return self._scheduleCommand(scheduler, steps)
         failure = False
         for step in steps:
             threads = []
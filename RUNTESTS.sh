@@ -165,6 +165,20 @@ fi
 #This reports the coverage in a sane way
 dounit test-filetracker
 dounit test-csmakemodule
+dounit test-stepscheduler
+dounit test-stepcache
+dounit test-sectionindex
+dounit test-outputtee
+dounit test-filesystemcache
+dounit test-parallelcompressor
+dounit test-arwriter
+dounit test-packagingpass
+dounit test-sysmonitortracer
+dounit test-pythontestworker
+dounit test-coveragereports
+dounit test-pythontestimpact
+dounit test-moduleindex
+dounit test-packager
 
 python3 -m CsmakeCore._vendor.coverage erase
 
@@ -180,6 +194,10 @@ dotest multicommand test.csmake test,all,another build
 
 dotest parallel test.csmake parallel build
 dotest nested-parallel test.csmake nested-parallel build
+dotest parallel-jobs test.csmake parallel "--jobs=2 build"
+dotest nested-parallel-jobs test.csmake nested-parallel "--jobs=1 build"
+dotest jobs-after test.csmake jobs-after "--jobs=2 build"
+dotest-fail jobs-failing test.csmake jobs-failing "--jobs=2 build"
 
 #Test shell sections
 dotest-default shell-hello test-shell.csmake build
@@ -258,6 +276,11 @@ dotest-fail test-TestPython-failure test-TestPython.csmake show-failure test
 dotest-fail test-TestPython-coverage test-TestPython.csmake show-bad-coverage test
 dotest-fail test-TestPython-file-coverage test-TestPython.csmake show-bad-file-coverage test
 dotest-fail test-TestPython-insufficient test-TestPython.csmake show-unsufficient test
+dotest test-TestPython-workers test-TestPython.csmake workers test
+dotest-fail test-TestPython-failure-workers test-TestPython.csmake show-failure-workers test
+dotest test-TestPython-select test-TestPython.csmake select test
+#Nothing changed, so no tests run: the aspects check the last full run
+dotest test-TestPython-select-again test-TestPython.csmake select test
 
 #Test **phases
 dotest-cmp test-phase-shift test.csmake test-phase-shift build "phase: special"
@@ -295,6 +318,16 @@ CSMAKE_TEST_OBF_CRED=$CSMAKE_TEST_OBF_CRED dotest-cmp secrets-obfuscated test-se
 dotest-fail secrets-missing-key test-secrets.csmake missing-key build
 dotest-fail secrets-missing-namespace test-secrets.csmake missing-namespace build
 
+#Test packaging several formats into one result directory
+dotest test-packaging-formats test-packaging.csmake default "clean package"
+
+#Test incremental packaging: built once, untouched when nothing changed,
+#  and rebuilt for a changed source or option, or when aspects are attached
+dotest test-packaging-incremental test-packaging.csmake incremental "clean package"
+dotest test-packaging-incremental-unchanged test-packaging.csmake incremental-unchanged package
+dotest test-packaging-incremental-changed test-packaging.csmake incremental-changed package
+dotest test-packaging-incremental-aspects test-packaging.csmake incremental-aspects package
+
 #####################################
 # Testing footer
 echo ""